@@ -0,0 +1,5 @@
+"""
+Performance benchmarks for the Urban Oasis backend.
+
+Run from the backend directory, e.g. `python -m benchmarks.invoice_render`.
+"""
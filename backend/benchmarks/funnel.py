@@ -0,0 +1,374 @@
+#!/usr/bin/env python
+"""
+Load test for the booking funnel.
+
+Each simulated guest walks the funnel the site's frontend drives, over HTTP
+against a running server:
+
+    GET  /api/pricing/                     pricing_list
+    GET  /api/bookings/availability/       availability
+    POST /api/pricing/calculate/           calculate
+    POST /api/checkout/                    checkout (booking + PaymentIntent)
+    POST /api/stripe-webhook/              webhook (signed payment_intent.succeeded; recorded only,
+                                           process_stripe_events applies it)
+
+`--concurrency` guests run at once until `--funnels` funnels are done, and
+p50/p95/p99 latency and throughput are reported per endpoint.
+
+By default the benchmark starts its own server (`manage.py runserver` on a
+free port, or uvicorn with `--asgi`) with a fresh SQLite database, the console email backend and
+benchmarks/stripe_stub.py standing in for Stripe. Pass `--url` to load an
+already running server instead; it must use the same STRIPE_WEBHOOK_SECRET
+(`--webhook-secret`) and have at least one active pricing rule.
+
+Baselines are JSON files; `--save-baseline` records one and `--compare` fails
+(exit status 1) when an endpoint's p95 is more than `--tolerance` slower than
+the baseline.
+
+    python -m benchmarks.funnel --funnels 200 --concurrency 8
+    python -m benchmarks.funnel --save-baseline
+    python -m benchmarks.funnel --compare
+"""
+import argparse
+import hashlib
+import hmac
+import http.client
+import itertools
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+from benchmarks import stripe_stub
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = Path(__file__).resolve().parent / 'baselines' / 'funnel.json'
+
+ENDPOINTS = ['pricing_list', 'availability', 'calculate', 'checkout', 'webhook']
+
+WEBHOOK_SECRET = 'whsec_benchmark'
+
+# p95 regressions smaller than this are treated as noise
+MIN_REGRESSION_MS = 5.0
+
+SEED_SCRIPT = """
+from decimal import Decimal
+from rentals.models import PricingRule
+if not PricingRule.objects.filter(is_active=True).exists():
+    PricingRule.objects.create(
+        name='Benchmark Nightly', season='regular', base_price_per_night=Decimal('150.00'),
+        weekly_discount_percent=Decimal('10'), monthly_discount_percent=Decimal('20'),
+        cleaning_fee=Decimal('75.00'), service_fee_percent=Decimal('5'),
+        display_price=Decimal('150.00'), is_active=True,
+    )
+"""
+
+
+class Client:
+    """One keep-alive HTTP connection per simulated guest"""
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if isinstance(body, dict):
+            body = json.dumps(body)
+            headers.setdefault('Content-Type', 'application/json')
+        headers.setdefault('Accept', 'application/json')
+        for attempt in range(2):
+            try:
+                self.connection.request(method, path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                content = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionError):
+                # The server closed an idle keep-alive connection; retry once
+                self.connection.close()
+                if attempt:
+                    raise
+        if response.will_close:
+            self.connection.close()
+        return response.status, content
+
+    def close(self):
+        self.connection.close()
+
+
+def webhook_signature(payload, secret):
+    timestamp = int(time.time())
+    signed = hmac.new(secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signed}"
+
+
+def run_funnel(client, rule_id, check_in, secret, record):
+    """Walk one guest through the funnel, passing (endpoint, seconds, status) to `record`"""
+    check_out = check_in + timedelta(days=2)
+
+    def call(name, method, path, body=None, headers=None, expect=(200,)):
+        started = time.perf_counter()
+        try:
+            status, content = client.request(method, path, body, headers)
+        except Exception:
+            record(name, time.perf_counter() - started, 'error')
+            return None
+        record(name, time.perf_counter() - started, status if status in expect else f'error {status}')
+        return json.loads(content) if status in expect and content else None
+
+    call('pricing_list', 'GET', '/api/pricing/')
+    call('availability', 'GET', '/api/bookings/availability/?' + urlencode({
+        'check_in': check_in.isoformat(), 'check_out': check_out.isoformat(),
+    }))
+    call('calculate', 'POST', '/api/pricing/calculate/', {
+        'pricing_rule_id': rule_id, 'num_nights': 2, 'num_guests': 2,
+    })
+    checkout = call('checkout', 'POST', '/api/checkout/', {
+        'first_name': 'Load', 'last_name': 'Test', 'email': 'load@example.com', 'phone': '555-0100',
+        'check_in': check_in.isoformat(), 'check_out': check_out.isoformat(),
+        'num_guests': 2, 'pricing_rule_id': rule_id,
+    }, expect=(201,))
+    if checkout is None:
+        return
+
+    booking = checkout['booking']
+    payload = json.dumps({
+        'id': f"evt_bench_{booking['id']}",
+        'object': 'event',
+        'type': 'payment_intent.succeeded',
+        'data': {'object': {
+            'id': checkout['payment']['payment_intent_id'],
+            'object': 'payment_intent',
+            'metadata': {'booking_id': str(booking['id'])},
+        }},
+    })
+    call('webhook', 'POST', '/api/stripe-webhook/', payload, {
+        'Content-Type': 'application/json',
+        'Stripe-Signature': webhook_signature(payload, secret),
+    })
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def load(base_url, funnels, concurrency, warmup, start_date, secret):
+    probe = Client(base_url)
+    status, content = probe.request('GET', '/api/pricing/')
+    probe.close()
+    if status != 200:
+        raise SystemExit(f"GET /api/pricing/ returned {status}")
+    rules = json.loads(content)
+    rules = rules.get('results', rules) if isinstance(rules, dict) else rules
+    if not rules:
+        raise SystemExit("The server has no active pricing rules")
+    rule_id = rules[0]['id']
+
+    # Every funnel books its own nights so bookings never conflict
+    stays = (start_date + timedelta(days=3 * n) for n in itertools.count())
+    stays_lock = threading.Lock()
+    samples = {name: [] for name in ENDPOINTS}
+    errors = {name: 0 for name in ENDPOINTS}
+    recording = threading.Event()
+    remaining = itertools.count()
+
+    def record(name, seconds, status):
+        if not recording.is_set():
+            return
+        if isinstance(status, int):
+            samples[name].append(seconds)
+        else:
+            errors[name] += 1
+
+    def guest(total):
+        client = Client(base_url)
+        try:
+            while next(remaining) < total:
+                with stays_lock:
+                    check_in = next(stays)
+                run_funnel(client, rule_id, check_in, secret, record)
+        finally:
+            client.close()
+
+    if warmup:
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(guest, [warmup] * concurrency))
+    remaining = itertools.count()
+    recording.set()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(guest, [funnels] * concurrency))
+    elapsed = time.perf_counter() - started
+
+    results = {}
+    for name in ENDPOINTS:
+        values = sorted(samples[name])
+        results[name] = {
+            'requests': len(values),
+            'errors': errors[name],
+            'p50_ms': round(percentile(values, 50) * 1000, 2),
+            'p95_ms': round(percentile(values, 95) * 1000, 2),
+            'p99_ms': round(percentile(values, 99) * 1000, 2),
+            'mean_ms': round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+            'rps': round(len(values) / elapsed, 1),
+        }
+    return {
+        'meta': {
+            'funnels': funnels,
+            'concurrency': concurrency,
+            'seconds': round(elapsed, 2),
+            'funnels_per_second': round(funnels / elapsed, 2),
+            'python': platform.python_version(),
+            'machine': f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPU",
+        },
+        'endpoints': results,
+    }
+
+
+def report(results):
+    meta = results['meta']
+    print(f"{meta['funnels']} funnels at concurrency {meta['concurrency']} in {meta['seconds']:.2f}s "
+          f"({meta['funnels_per_second']:.2f} funnels/s)")
+    print(f"{'endpoint':<16}{'reqs':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}")
+    for name, row in results['endpoints'].items():
+        print(f"{name:<16}{row['requests']:>7}{row['errors']:>8}{row['p50_ms']:>10.1f}"
+              f"{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['rps']:>9.1f}")
+
+
+def compare(results, baseline, tolerance):
+    """Endpoints whose p95 regressed beyond `tolerance`, as printable lines"""
+    regressions = []
+    for name, row in results['endpoints'].items():
+        before = baseline['endpoints'].get(name)
+        if not before or not before['p95_ms']:
+            continue
+        limit = max(before['p95_ms'] * (1 + tolerance), before['p95_ms'] + MIN_REGRESSION_MS)
+        if row['p95_ms'] > limit or row['errors'] > before.get('errors', 0):
+            regressions.append(
+                f"{name}: p95 {before['p95_ms']:.1f} -> {row['p95_ms']:.1f} ms, "
+                f"errors {before.get('errors', 0)} -> {row['errors']}"
+            )
+    return regressions
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(stripe_latency, workdir, asgi=False):
+    """Migrate a scratch database and start a server against the Stripe stub"""
+    stub = stripe_stub.start(latency=stripe_latency)
+    port = free_port()
+    env = dict(
+        os.environ,
+        SQLITE_PATH=str(Path(workdir) / 'funnel.sqlite3'),
+        EMAIL_BACKEND='django.core.mail.backends.console.EmailBackend',
+        STRIPE_SECRET_KEY='sk_test_benchmark',
+        STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET,
+        STRIPE_API_BASE=f"http://127.0.0.1:{stub.server_address[1]}",
+    )
+    env.pop('DATABASE_URL', None)
+    manage = [sys.executable, str(BACKEND_DIR / 'manage.py')]
+    subprocess.run(manage + ['migrate', '--noinput', '-v', '0'], env=env, check=True)
+    subprocess.run(manage + ['shell', '-c', SEED_SCRIPT], env=env, check=True)
+    if asgi:
+        command = [sys.executable, '-m', 'uvicorn', 'urban_oasis.asgi:application',
+                   '--host', '127.0.0.1', '--port', str(port), '--no-access-log']
+    else:
+        command = manage + ['runserver', '--noreload', f'127.0.0.1:{port}']
+    server = subprocess.Popen(
+        command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return base_url, server, stub
+        except OSError:
+            if server.poll() is not None:
+                raise SystemExit("The server exited during startup")
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit("The server did not start within 30s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', help='Load this running server instead of starting one')
+    parser.add_argument('--funnels', type=int, default=100, help='Funnels to measure')
+    parser.add_argument('--concurrency', type=int, default=4, help='Guests running at once')
+    parser.add_argument('--warmup', type=int, default=10, help='Unmeasured funnels run first')
+    parser.add_argument('--asgi', action='store_true', help='Serve with uvicorn instead of runserver')
+    parser.add_argument('--stripe-latency-ms', type=float, default=0,
+                        help='Delay added by the Stripe stub (started servers only)')
+    parser.add_argument('--start-date', type=date.fromisoformat,
+                        help='First check-in date (default: ten years from today)')
+    parser.add_argument('--webhook-secret', default=WEBHOOK_SECRET,
+                        help='STRIPE_WEBHOOK_SECRET of the server under --url')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    parser.add_argument('--save-baseline', nargs='?', const=DEFAULT_BASELINE, type=Path, metavar='PATH')
+    parser.add_argument('--compare', nargs='?', const=DEFAULT_BASELINE, type=Path, metavar='PATH')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed p95 slowdown against the baseline (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    start_date = args.start_date or date.today() + timedelta(days=3650)
+    server = stub = None
+    with tempfile.TemporaryDirectory(prefix='funnel-bench-') as workdir:
+        try:
+            if args.url:
+                base_url = args.url.rstrip('/')
+            else:
+                base_url, server, stub = start_server(args.stripe_latency_ms / 1000, workdir, asgi=args.asgi)
+            results = load(base_url, args.funnels, args.concurrency, args.warmup,
+                           start_date, args.webhook_secret)
+        finally:
+            if server:
+                server.terminate()
+                server.wait()
+            if stub:
+                stub.shutdown()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        report(results)
+
+    if args.save_baseline:
+        args.save_baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.save_baseline.write_text(json.dumps(results, indent=2) + '\n')
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        if any(baseline['meta'][key] != results['meta'][key] for key in ('funnels', 'concurrency', 'machine')):
+            print("Warning: baseline was recorded with different funnels/concurrency/machine")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("Regressions against", args.compare)
+            for line in regressions:
+                print("  " + line)
+            raise SystemExit(1)
+        print(f"No regressions against {args.compare}")
+
+
+if __name__ == '__main__':
+    main()
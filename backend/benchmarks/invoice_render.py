@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark for invoice PDF rendering.
+
+Compares rendering with the per-process InvoiceTemplate cache ("warm") against
+rebuilding the style sheet and static flowables for every invoice ("cold",
+which is what generate_invoice_pdf did before the template was introduced).
+
+    python -m benchmarks.invoice_render --count 200
+"""
+import argparse
+import os
+import time
+from datetime import date
+from decimal import Decimal
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'urban_oasis.settings')
+django.setup()
+
+from rentals.models import Booking
+from rentals.invoice_generator import generate_invoice_pdf, _build_invoice_template
+
+
+def sample_booking(n):
+    return Booking(
+        id=n,
+        first_name='Bench',
+        last_name=f'Guest {n}',
+        email=f'guest{n}@example.com',
+        phone='555-0100',
+        check_in=date(2026, 6, 1),
+        check_out=date(2026, 6, 8),
+        num_guests=2,
+        total_price=Decimal('1400.00'),
+        status='confirmed',
+        payment_method='debitcard',
+        special_requests='Late check-in',
+    )
+
+
+def run(count, cold):
+    bookings = [sample_booking(n) for n in range(1, count + 1)]
+    start = time.perf_counter()
+    for booking in bookings:
+        if cold:
+            _build_invoice_template.cache_clear()
+        generate_invoice_pdf(booking)
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--count', type=int, default=200, help='Invoices rendered per run')
+    args = parser.parse_args()
+
+    # Warm up imports and font metrics before timing
+    run(5, cold=False)
+
+    cold = run(args.count, cold=True)
+    warm = run(args.count, cold=False)
+
+    print(f"Rendered {args.count} invoices per run")
+    print(f"  before (template rebuilt per invoice): {cold:8.1f} invoices/sec")
+    print(f"  after  (cached InvoiceTemplate):        {warm:8.1f} invoices/sec")
+    print(f"  speedup: {warm / cold:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark for quote-grid pricing.
+
+Compares calling PricingRule.calculate_total once per (rule, nights) pair
+("scalar") against pricing the whole grid with PriceGrid ("grid"), and checks
+that both produce identical totals.
+
+    python -m benchmarks.pricing_grid --rules 12 --nights 365 --repeat 20
+"""
+import argparse
+import os
+import time
+from decimal import Decimal
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'urban_oasis.settings')
+django.setup()
+
+from rentals.models import PricingRule
+from rentals.pricing import PriceGrid
+
+
+def sample_rules(count):
+    return [
+        PricingRule(
+            id=n,
+            name=f'Rule {n}',
+            base_price_per_night=Decimal('99.99') + n * Decimal('13.37'),
+            weekly_discount_percent=Decimal('7.5') + n,
+            monthly_discount_percent=Decimal('15.25') + n,
+            cleaning_fee=Decimal('45.00') + n,
+            service_fee_percent=Decimal('3.33'),
+            display_price=Decimal('100.00'),
+        )
+        for n in range(1, count + 1)
+    ]
+
+
+def scalar(rules, nights):
+    return [[rule.calculate_total(n) for n in nights] for rule in rules]
+
+
+def grid(rules, nights):
+    return PriceGrid(rules).totals(nights)
+
+
+def timed(fn, rules, nights, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(rules, nights)
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rules', type=int, default=12, help='Pricing rules in the grid')
+    parser.add_argument('--nights', type=int, default=365, help='Longest stay length (grid covers 1..N)')
+    parser.add_argument('--repeat', type=int, default=20, help='Runs averaged per path')
+    args = parser.parse_args()
+
+    rules = sample_rules(args.rules)
+    nights = list(range(1, args.nights + 1))
+
+    scalar_time, expected = timed(scalar, rules, nights, args.repeat)
+    grid_time, actual = timed(grid, rules, nights, args.repeat)
+    if actual != expected:
+        raise SystemExit("PriceGrid totals differ from calculate_total")
+
+    cells = args.rules * args.nights
+    print(f"Priced {args.rules} rules x {args.nights} stay lengths ({cells} totals), identical results")
+    print(f"  scalar (calculate_total per cell): {scalar_time * 1000:8.2f} ms")
+    print(f"  grid   (PriceGrid):                {grid_time * 1000:8.2f} ms")
+    print(f"  speedup: {scalar_time / grid_time:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""
+Minimal stand-in for the Stripe API, for benchmarks.
+
+Answers POST /v1/payment_intents (and /v1/payment_intents/<id>/cancel) with a
+plausible PaymentIntent after an optional artificial delay (to model network latency), so the booking funnel
+can be load-tested without touching Stripe. Point the backend at it with
+STRIPE_API_BASE=http://127.0.0.1:<port>.
+
+    python -m benchmarks.stripe_stub --port 12111 --latency-ms 80
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+
+def _parse_form(body):
+    """Decode Stripe's form encoding (metadata[booking_id]=7) into a dict"""
+    data = {}
+    for key, value in parse_qsl(body, keep_blank_values=True):
+        if '[' in key and key.endswith(']'):
+            outer, inner = key[:-1].split('[', 1)
+            data.setdefault(outer, {})[inner] = value
+        else:
+            data[key] = value
+    return data
+
+
+def make_handler(latency):
+    counter = itertools.count(1)
+
+    class StripeStubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            form = _parse_form(self.rfile.read(length).decode())
+            if latency:
+                time.sleep(latency)
+            path = self.path.split('?')[0]
+            if path.startswith('/v1/payment_intents/') and path.endswith('/cancel'):
+                intent_id = path.split('/')[3]
+                self.server.cancelled_intents.append(intent_id)
+                return self._send(200, {'id': intent_id, 'object': 'payment_intent', 'status': 'canceled'})
+            if path != '/v1/payment_intents':
+                return self._send(404, {'error': {'type': 'invalid_request_error', 'message': 'Unknown path'}})
+
+            intent_id = f"pi_stub_{next(counter)}"
+            self._send(200, {
+                'id': intent_id,
+                'object': 'payment_intent',
+                'amount': int(form.get('amount', 0)),
+                'currency': form.get('currency', 'usd'),
+                'metadata': form.get('metadata', {}),
+                'status': 'requires_payment_method',
+                'client_secret': f"{intent_id}_secret_stub",
+                'livemode': False,
+            })
+
+    return StripeStubHandler
+
+
+def make_server(port, latency):
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(latency))
+    # Ids of the intents cancelled so far
+    server.cancelled_intents = []
+    return server
+
+
+def start(port=0, latency=0.0):
+    """Serve the stub in a daemon thread; returns the server (see server_address)"""
+    server = make_server(port, latency)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--port', type=int, default=12111)
+    parser.add_argument('--latency-ms', type=float, default=0, help='Delay added to every response')
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.latency_ms / 1000)
+    print(f"Stripe stub listening on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
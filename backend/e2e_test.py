@@ -60,9 +60,9 @@ if response.status_code in [200, 201, 202]:
         response_data = json.loads(response.content)
         print(f"   ✓ Response: {json.dumps(response_data, indent=2)}")
         
-        # Check if email was sent
-        if 'email_sent' in response_data:
-            print(f"\n3. Email Sent Status: {response_data.get('email_sent')}")
+        # Check that the confirmation email was queued
+        if 'email_job_id' in response_data:
+            print(f"\n3. Email Job Queued: #{response_data.get('email_job_id')} (run `python manage.py process_outbox --once` to send)")
         if 'id' in response_data:
             booking_id = response_data['id']
             print(f"   Booking ID: {booking_id}")
@@ -1,9 +1,14 @@
 from django.contrib import admin
+from django.db import transaction
+from django.utils import timezone
 from django.utils.html import format_html
 from .models import (
     PricingRule, GalleryImage, Amenity, 
-    Booking, Review, SiteSettings
+    Booking, Review, SiteSettings, EmailJob, StripeEvent
 )
+from . import caching, exports, occupancy, stripe_events
+from .invoice_cache import invoice_fingerprint, prune_invoices
+from .outbox import enqueue_booking_emails
 
 
 @admin.register(PricingRule)
@@ -141,7 +146,7 @@ class BookingAdmin(admin.ModelAdmin):
     ]
     list_filter = ['status', 'check_in', 'created_at']
     search_fields = ['first_name', 'last_name', 'email', 'phone']
-    readonly_fields = ['num_nights_display', 'created_at', 'updated_at']
+    readonly_fields = ['num_nights_display', 'payment_intent_id', 'hold_expires_at', 'created_at', 'updated_at']
     date_hierarchy = 'check_in'
     
     fieldsets = (
@@ -158,7 +163,7 @@ class BookingAdmin(admin.ModelAdmin):
             'fields': ('pricing_rule', 'total_price')
         }),
         ('Status', {
-            'fields': ('status',)
+            'fields': ('status', 'payment_intent_id', 'hold_expires_at')
         }),
         ('Metadata', {
             'fields': ('created_at', 'updated_at'),
@@ -170,19 +175,43 @@ class BookingAdmin(admin.ModelAdmin):
         return obj.num_nights
     num_nights_display.short_description = 'Nights'
     
-    actions = ['mark_confirmed', 'mark_cancelled', 'mark_completed']
+    actions = ['mark_confirmed', 'mark_cancelled', 'mark_completed', 'export_csv', 'export_ndjson']
+    
+    def _set_status(self, queryset, status):
+        # Ids first: the selection may be filtered on the status being changed
+        ids = list(queryset.exclude(status=status).values_list('id', flat=True))
+        with transaction.atomic():
+            Booking.objects.filter(id__in=ids).update(status=status, updated_at=timezone.now())
+            changed = list(Booking.objects.filter(id__in=ids))
+            # update() skips the Booking signals, so refresh the occupancy
+            # calendar here (and the cached invoices below)
+            occupancy.resync_bookings(changed)
+            if status == 'confirmed':
+                # Same emails as a card payment confirming the booking
+                for booking in changed:
+                    enqueue_booking_emails(booking)
+        for booking in changed:
+            prune_invoices(booking.id, keep=f"{invoice_fingerprint(booking)}.pdf")
     
     def mark_confirmed(self, request, queryset):
-        queryset.update(status='confirmed')
+        self._set_status(queryset, 'confirmed')
     mark_confirmed.short_description = 'Mark selected as Confirmed'
     
     def mark_cancelled(self, request, queryset):
-        queryset.update(status='cancelled')
+        self._set_status(queryset, 'cancelled')
     mark_cancelled.short_description = 'Mark selected as Cancelled'
     
     def mark_completed(self, request, queryset):
-        queryset.update(status='completed')
+        self._set_status(queryset, 'completed')
     mark_completed.short_description = 'Mark selected as Completed'
+    
+    def export_csv(self, request, queryset):
+        return exports.export_response(queryset.order_by('created_at', 'id'), 'csv')
+    export_csv.short_description = 'Export selected as CSV'
+    
+    def export_ndjson(self, request, queryset):
+        return exports.export_response(queryset.order_by('created_at', 'id'), 'ndjson')
+    export_ndjson.short_description = 'Export selected as NDJSON'
 
 
 @admin.register(Review)
@@ -222,10 +251,13 @@ class ReviewAdmin(admin.ModelAdmin):
     
     def approve_reviews(self, request, queryset):
         queryset.update(is_approved=True)
+        # update() skips the save signals that retire cached API responses
+        caching.bump_model_version(Review)
     approve_reviews.short_description = 'Approve selected reviews'
     
     def unapprove_reviews(self, request, queryset):
         queryset.update(is_approved=False)
+        caching.bump_model_version(Review)
     unapprove_reviews.short_description = 'Unapprove selected reviews'
 
 
@@ -258,6 +290,46 @@ class SiteSettingsAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(EmailJob)
+class EmailJobAdmin(admin.ModelAdmin):
+    list_display = [
+        'id', 'kind', 'booking', 'status', 'attempts',
+        'run_after', 'sent_at', 'created_at'
+    ]
+    list_filter = ['kind', 'status', 'created_at']
+    search_fields = ['booking__email', 'booking__last_name', 'last_error']
+    readonly_fields = ['created_at', 'updated_at', 'sent_at', 'last_error']
+    raw_id_fields = ['booking']
+    
+    actions = ['retry_now']
+    
+    def retry_now(self, request, queryset):
+        queryset.exclude(status='sent').update(
+            status='pending', attempts=0, run_after=timezone.now()
+        )
+    retry_now.short_description = 'Retry selected jobs now'
+
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = [
+        'event_id', 'event_type', 'booking_id', 'status',
+        'attempts', 'received_at', 'processed_at'
+    ]
+    list_filter = ['status', 'event_type', 'livemode', 'received_at']
+    search_fields = ['event_id', 'last_error']
+    readonly_fields = [
+        'event_id', 'event_type', 'booking_id', 'payload', 'livemode', 'stripe_created',
+        'claim', 'attempts', 'last_error', 'received_at', 'updated_at', 'processed_at'
+    ]
+    
+    actions = ['replay']
+    
+    def replay(self, request, queryset):
+        stripe_events.requeue(queryset)
+    replay.short_description = 'Replay selected events'
+
+
 # Customize admin site header
 admin.site.site_header = "Urban Oasis Administration"
 admin.site.site_title = "Urban Oasis Admin"
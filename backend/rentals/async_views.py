@@ -0,0 +1,218 @@
+"""
+Async views for the latency-bound public endpoints.
+
+These run natively under ASGI (urban_oasis/asgi.py): while a view awaits
+Stripe or the database, the worker's event loop serves other requests, so
+one worker can keep hundreds of slow Stripe calls in flight instead of
+tying up a thread per call. Under WSGI Django runs them in a per-request
+event loop, so they keep working there too, with Stripe called through its
+blocking client (see create_payment_intent_for).
+
+DRF 3.14 has no async views, so these are plain Django views returning
+JsonResponse with the same payloads as the DRF endpoints they replace.
+"""
+import json
+import weakref
+from asyncio import get_running_loop
+from datetime import date
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+import stripe
+from . import checkout as checkouts, metrics, occupancy
+from .pricing import get_rule
+from .serializers import PricingRuleSerializer
+from .stripe_events import stripe_client
+
+
+def _stripe_settings():
+    return settings.STRIPE_SECRET_KEY, settings.STRIPE_API_BASE, settings.STRIPE_TIMEOUT
+
+
+# {event loop: (settings, StripeClient, HTTPXClient)}; an httpx pool belongs
+# to the loop that opened it
+_async_clients = weakref.WeakKeyDictionary()
+_sync_client = None
+
+
+def get_async_stripe_client():
+    """
+    StripeClient using stripe's httpx transport, one per event loop.
+
+    Only for ASGI, where a worker's loop (and so its connection pool) lives
+    as long as the process. Building a StripeClient and its SSL context costs
+    tens of milliseconds, so it is made once per loop, not per request.
+    """
+    loop = get_running_loop()
+    entry = _async_clients.get(loop)
+    if entry is None or entry[0] != _stripe_settings():
+        if entry is not None:
+            # Settings changed: close the old pool instead of leaving it open
+            loop.create_task(entry[2].close_async())
+        http_client = stripe.HTTPXClient(timeout=settings.STRIPE_TIMEOUT)
+        entry = _async_clients[loop] = (_stripe_settings(), stripe_client(http_client), http_client)
+    return entry[1]
+
+
+def get_stripe_client():
+    """Process-wide StripeClient using stripe's default blocking transport"""
+    global _sync_client
+    if _sync_client is None or _sync_client[0] != _stripe_settings():
+        _sync_client = (
+            _stripe_settings(), stripe_client(stripe.RequestsClient(timeout=settings.STRIPE_TIMEOUT))
+        )
+    return _sync_client[1]
+
+
+async def create_payment_intent_for(request, params, options=None):
+    """
+    Create a PaymentIntent with the transport that suits the server.
+
+    Under ASGI the call is awaited on the loop's pooled httpx client. Under
+    WSGI Django runs each async view in a throwaway event loop, which would
+    leave a pooled client's sockets open when it ends, so the call runs in a
+    thread on the blocking client instead.
+    """
+    options = options or {}
+    if isinstance(request, ASGIRequest):
+        return await get_async_stripe_client().v1.payment_intents.create_async(params=params, options=options)
+    return await sync_to_async(get_stripe_client().v1.payment_intents.create)(params=params, options=options)
+
+
+def _request_data(request):
+    """JSON or form-encoded request body as a dict (like DRF's request.data)"""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+    return request.POST.dict()
+
+
+@require_GET
+async def stripe_config(request):
+    """Return Stripe publishable key to the frontend"""
+    return JsonResponse({'publishableKey': settings.STRIPE_PUBLISHABLE_KEY})
+
+
+@csrf_exempt
+@require_POST
+async def checkout(request):
+    """
+    Reserve a stay and create its PaymentIntent in one call
+    Expected payload: booking fields as for POST /api/bookings/ (without
+    total_price) plus an optional pricing_rule_id
+    """
+    data = _request_data(request)
+    if data is None:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+
+    try:
+        booking, quote = await sync_to_async(checkouts.reserve)(data)
+    except checkouts.CheckoutError as e:
+        error = {'error': str(e)}
+        if e.fields:
+            error['fields'] = e.fields
+        return JsonResponse(error, status=e.status)
+
+    amount = checkouts.amount_cents(booking.total_price)
+    try:
+        with metrics.span('stripe'):
+            intent = await create_payment_intent_for(
+                request,
+                {
+                    'amount': amount,
+                    'currency': checkouts.CURRENCY,
+                    'receipt_email': booking.email,
+                    'metadata': {'booking_id': str(booking.id)},
+                },
+                # A retried request for the same booking gets the same intent
+                options={'idempotency_key': f"checkout-booking-{booking.id}"},
+            )
+    except Exception as e:
+        await sync_to_async(checkouts.abandon)(booking)
+        return JsonResponse({'error': str(e)}, status=502)
+
+    await sync_to_async(checkouts.attach_intent)(booking, intent.id)
+    return JsonResponse({
+        'booking': checkouts.booking_payload(booking),
+        'pricing': quote,
+        'payment': {
+            'payment_intent_id': intent.id,
+            'client_secret': intent.client_secret,
+            'amount_cents': amount,
+            'currency': checkouts.CURRENCY,
+            'hold_expires_at': booking.hold_expires_at,
+        },
+        'publishableKey': settings.STRIPE_PUBLISHABLE_KEY,
+    }, status=201)
+
+
+@require_GET
+async def availability(request):
+    """
+    Check availability for given date range
+    Query params: check_in, check_out
+    """
+    check_in = request.GET.get('check_in')
+    check_out = request.GET.get('check_out')
+
+    if not check_in or not check_out:
+        return JsonResponse({'error': 'Both check_in and check_out dates are required'}, status=400)
+
+    try:
+        check_in = date.fromisoformat(check_in)
+        check_out = date.fromisoformat(check_out)
+    except ValueError:
+        return JsonResponse({'error': 'Dates must be in YYYY-MM-DD format'}, status=400)
+
+    # Single range scan over the occupancy calendar
+    overlapping = await occupancy.aoverlapping_booking_ids(check_in, check_out)
+
+    return JsonResponse({
+        'available': not overlapping,
+        'overlapping_bookings': len(overlapping)
+    })
+
+
+@csrf_exempt
+@require_POST
+async def calculate_price(request):
+    """
+    Calculate total price for a stay
+    Expected payload: {
+        "pricing_rule_id": 1,
+        "num_nights": 7,
+        "num_guests": 2
+    }
+    """
+    data = _request_data(request)
+    if data is None:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+    pricing_rule_id = data.get('pricing_rule_id')
+    num_nights = data.get('num_nights')
+    num_guests = data.get('num_guests', 1)
+
+    # The rule comes from the cached pricing catalog (no query when warm)
+    pricing_rule = await sync_to_async(get_rule)(pricing_rule_id)
+    if pricing_rule is None:
+        return JsonResponse({'error': 'Pricing rule not found'}, status=404)
+
+    try:
+        total = pricing_rule.calculate_total(num_nights, num_guests)
+
+        return JsonResponse({
+            'pricing_rule': PricingRuleSerializer(pricing_rule).data,
+            'num_nights': num_nights,
+            'num_guests': num_guests,
+            'base_total': float(pricing_rule.base_price_per_night) * num_nights,
+            'cleaning_fee': float(pricing_rule.cleaning_fee),
+            'service_fee': float(pricing_rule.service_fee_percent),
+            'total_price': total
+        })
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
@@ -0,0 +1,194 @@
+"""
+Two-level cache for small, read-mostly data such as the pricing catalog.
+
+Values are kept in a per-process dict and in the shared Django cache, both
+tagged with a version stored in the shared cache under a namespace. Model
+signals call bump_version() when the underlying rows change, so every process
+drops its copy on its next read. A warm read costs one cache lookup for the
+version and no database queries.
+
+CachedResponseMixin applies the same versioning to whole API responses.
+
+Serialized data holds absolute URLs built from the request's scheme and host.
+Cached values store ORIGIN_MARKER in their place (see without_origin) and get
+the current request's origin back on the way out, so one copy serves every
+host instead of one per Host header a client cares to send.
+"""
+import hashlib
+import uuid
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+
+VERSION_KEY = 'rentals:version:{}'
+VALUE_KEY = 'rentals:cached:{}:{}:{}'
+
+# Old versions are never read again; let the shared cache expire them
+SHARED_TIMEOUT = 60 * 60 * 24
+
+_MISSING = object()
+
+# Stands in for the request origin in cached values. Rendered JSON escapes
+# control characters, so a raw NUL never occurs in it otherwise
+ORIGIN_MARKER = '\x00'
+
+# {(namespace, key): (version, value)} for this process
+_local = {}
+
+
+def get_version(namespace):
+    """Current version of a namespace, creating one if the cache has none"""
+    key = VERSION_KEY.format(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def _bump(namespace):
+    cache.set(VERSION_KEY.format(namespace), uuid.uuid4().hex, None)
+    for local_key in list(_local):
+        if local_key[0] == namespace:
+            _local.pop(local_key, None)
+
+
+def bump_version(namespace):
+    """
+    Invalidate everything cached under a namespace, in every process.
+
+    Inside a transaction the version is bumped again on commit, since another
+    process may have rebuilt the value from the old rows in the meantime.
+    """
+    _bump(namespace)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _bump(namespace))
+
+
+def get_or_build(namespace, key, build):
+    """
+    Return the cached value for `key`, calling `build()` on a miss.
+
+    Args:
+        namespace: invalidation group (see bump_version)
+        key: name of the value within the namespace (no spaces)
+        build: zero-argument callable producing the value; it must be picklable
+    """
+    version = get_version(namespace)
+    local = _local.get((namespace, key))
+    if local is not None and local[0] == version:
+        return local[1]
+
+    shared_key = VALUE_KEY.format(namespace, version, key)
+    value = cache.get(shared_key, _MISSING)
+    if value is _MISSING:
+        value = build()
+        cache.set(shared_key, value, SHARED_TIMEOUT)
+    _local[(namespace, key)] = (version, value)
+    return value
+
+
+def request_origin(request):
+    """Scheme and host absolute URLs in a response start with"""
+    return f"{request.scheme}://{request.get_host()}"
+
+
+def _replace_in(value, old, new):
+    if isinstance(value, str):
+        return value.replace(old, new)
+    if isinstance(value, dict):
+        return {key: _replace_in(item, old, new) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_replace_in(item, old, new) for item in value]
+    return value
+
+
+def without_origin(value, origin):
+    """Copy of serialized data (dicts, lists, strings) with `origin` replaced by ORIGIN_MARKER"""
+    return _replace_in(value, origin, ORIGIN_MARKER)
+
+
+def with_origin(value, origin):
+    """Inverse of without_origin() for the current request's origin"""
+    return _replace_in(value, ORIGIN_MARKER, origin)
+
+
+def model_namespace(model):
+    return model._meta.label_lower
+
+
+def bump_model_version(model):
+    """Invalidate cached responses built from `model` (for QuerySet.update() callers)"""
+    bump_version(model_namespace(model))
+
+
+class CachedResponseMixin:
+    """
+    Viewset mixin that caches rendered JSON for list and retrieve.
+
+    Entries are keyed by view, URL kwargs, query parameters and the versions
+    of `cache_models`, so any save or delete of those models (see signals.py)
+    retires them. The request origin is swapped for ORIGIN_MARKER in the
+    stored content, so the number of entries does not grow with the Host
+    headers clients send. Responses carry a strong ETag and Cache-Control;
+    a matching If-None-Match is answered with 304 straight from the cache,
+    without touching the ORM or the serializer. Non-JSON renderers (the
+    browsable API) are not cached.
+    """
+    cache_models = ()
+    cache_max_age = 60
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CachedResponseMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CachedResponseMixin, self).retrieve(request, *args, **kwargs))
+
+    def response_cache_key(self, request):
+        parts = [
+            type(self).__name__,
+            self.action,
+            sorted(self.kwargs.items()),
+            sorted(request.query_params.lists()),
+            [get_version(model_namespace(model)) for model in self.cache_models],
+        ]
+        digest = hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()
+        return f"rentals:response:{digest}"
+
+    def cached_response(self, request, build):
+        """
+        Serve `build()`'s response from the cache when possible.
+
+        Args:
+            build: callable returning the uncached DRF Response
+        """
+        renderer = request.accepted_renderer
+        if request.method != 'GET' or renderer.format != 'json':
+            return build()
+
+        key = self.response_cache_key(request)
+        entry = cache.get(key)
+        if entry is None:
+            response = build()
+            if response.status_code != 200:
+                return response
+            content = renderer.render(
+                response.data, request.accepted_media_type,
+                {'request': request, 'response': response, 'view': self}
+            )
+            template = content.replace(request_origin(request).encode('utf-8'), ORIGIN_MARKER.encode())
+            entry = (template, hashlib.sha256(template).hexdigest())
+            cache.set(key, entry, SHARED_TIMEOUT)
+
+        template, digest = entry
+        origin = request_origin(request)
+        content = template.replace(ORIGIN_MARKER.encode(), origin.encode('utf-8'))
+        # The same template under another origin is a different representation
+        etag = quote_etag(hashlib.sha256(f"{digest}:{origin}".encode('utf-8')).hexdigest())
+        response = HttpResponse(content, content_type=renderer.media_type)
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, max_age=self.cache_max_age)
+        patch_vary_headers(response, ['Accept'])
+        return get_conditional_response(request, etag=etag, response=response)
@@ -0,0 +1,155 @@
+"""
+Single-call card checkout.
+
+POST /api/checkout/ (async_views.checkout) replaces the stripe-config ->
+create-payment-intent -> bookings sequence the booking pages used to run:
+
+1. reserve() validates the stay, prices it with price_stay() and saves a
+   pending debit card booking holding its nights for CHECKOUT_HOLD_MINUTES.
+2. The view creates the PaymentIntent for that price, with the booking id in
+   its metadata, and attach_intent() records it; abandon() cancels the
+   booking (freeing its nights) if Stripe refused the intent.
+3. The payment_intent.succeeded webhook confirms the booking and queues the
+   confirmation email and payment receipt (see stripe_events).
+
+Stripe sends nothing for an intent that is simply never confirmed, so the
+Stripe event worker calls expire_holds() to cancel checkouts left unpaid
+past their hold, together with their intents.
+
+The amount always comes from the server-side price, never from the client.
+"""
+import logging
+from datetime import timedelta
+import stripe
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import Booking
+from .pricing import get_rule, price_stay, PricingUnavailable
+from .serializers import BookingSerializer, CheckoutSerializer
+from .stripe_events import stripe_client
+from . import occupancy
+
+logger = logging.getLogger(__name__)
+
+CURRENCY = 'usd'
+
+
+class CheckoutError(Exception):
+    """Raised when a checkout request cannot be priced or reserved"""
+
+    def __init__(self, message, status=400, fields=None):
+        super().__init__(message)
+        self.status = status
+        self.fields = fields
+
+
+def amount_cents(total_price):
+    """Stripe amount (integer cents) for a total in dollars"""
+    return int(round(float(total_price) * 100))
+
+
+def reserve(data):
+    """
+    Validate a checkout request, price the stay and save a pending booking
+    holding its nights until CHECKOUT_HOLD_MINUTES from now.
+
+    Args:
+        data: booking fields (as for POST /api/bookings/) plus an optional
+            pricing_rule_id; total_price and status are ignored
+
+    Returns:
+        tuple: (booking, quote) where quote is the price_stay() breakdown
+
+    Raises:
+        CheckoutError: invalid data (400), unknown pricing rule (404),
+            dates taken (409)
+    """
+    serializer = CheckoutSerializer(data=data)
+    if not serializer.is_valid():
+        raise CheckoutError('Invalid booking details', fields=serializer.errors)
+
+    rule_id = serializer.validated_data.pop('pricing_rule_id', None)
+    rule = get_rule(rule_id) if rule_id else None
+    if rule_id and rule is None:
+        raise CheckoutError('Pricing rule not found', status=404)
+
+    check_in = serializer.validated_data['check_in']
+    check_out = serializer.validated_data['check_out']
+    try:
+        quote = price_stay(check_in, check_out, default_rule=rule)
+    except PricingUnavailable as e:
+        raise CheckoutError(str(e))
+
+    try:
+        with transaction.atomic():
+            booking = serializer.save(
+                total_price=quote['total_price'],
+                pricing_rule=rule,
+                payment_method='debitcard',
+                hold_expires_at=timezone.now() + timedelta(minutes=settings.CHECKOUT_HOLD_MINUTES),
+            )
+            occupancy.ensure_reserved(booking)
+    except occupancy.DatesUnavailable:
+        raise CheckoutError('The selected dates are no longer available', status=409)
+
+    return booking, quote
+
+
+def attach_intent(booking, payment_intent_id):
+    """Record the PaymentIntent created for a checkout booking"""
+    booking.payment_intent_id = payment_intent_id
+    booking.save(update_fields=['payment_intent_id', 'updated_at'])
+
+
+def abandon(booking):
+    """Cancel a checkout booking whose PaymentIntent could not be created"""
+    booking.status = 'cancelled'
+    # save() (not update()) so the signals free the booking's nights
+    booking.save(update_fields=['status', 'updated_at'])
+
+
+def expire_holds(client=None):
+    """
+    Cancel pending card checkouts whose hold has run out, and their
+    PaymentIntents, so their nights can be booked again.
+
+    A hold whose intent cannot be cancelled (it succeeded or is processing a
+    payment, or Stripe is unreachable) is left alone: the webhook settles it,
+    or the next run tries again.
+
+    Args:
+        client: StripeClient to cancel intents with (default: a new one)
+
+    Returns:
+        int: number of bookings cancelled
+    """
+    expired = list(Booking.objects.filter(
+        status='pending', payment_method='debitcard', hold_expires_at__lt=timezone.now()
+    ))
+    if not expired:
+        return 0
+    client = client or stripe_client()
+
+    cancelled = 0
+    for booking in expired:
+        if booking.payment_intent_id:
+            try:
+                client.v1.payment_intents.cancel(booking.payment_intent_id)
+            except stripe.StripeError as e:
+                logger.warning("Could not cancel %s for booking %s: %s", booking.payment_intent_id, booking.id, e)
+                continue
+        with transaction.atomic():
+            # The succeeded webhook may have confirmed it in the meantime
+            booking = Booking.objects.select_for_update().filter(id=booking.id, status='pending').first()
+            if booking is not None:
+                abandon(booking)
+                cancelled += 1
+    if cancelled:
+        logger.info("Cancelled %s unpaid checkout(s)", cancelled)
+    return cancelled
+
+
+def booking_payload(booking):
+    """Checkout response representation of a booking"""
+    return BookingSerializer(booking).data
@@ -0,0 +1,14 @@
+"""
+Template context processors for the rentals app
+"""
+from django.utils.functional import SimpleLazyObject
+from .models import SiteSettings
+
+
+def site_settings(request):
+    """
+    Expose the site settings to templates as `site_settings`.
+
+    Lazy, so templates that never use it do not even hit the cache.
+    """
+    return {'site_settings': SimpleLazyObject(SiteSettings.cached)}
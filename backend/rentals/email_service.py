@@ -4,12 +4,19 @@ Email templates and sending utilities for Urban Oasis bookings
 import logging
 from django.core.mail import EmailMultiAlternatives
 from django.conf import settings
-from .invoice_generator import generate_invoice_pdf
+from .invoice_cache import get_invoice_pdf
+from .models import SiteSettings
+from .mail_pool import send_messages
 import os
 
 logger = logging.getLogger(__name__)
 
 
+def _format_time(value):
+    """15:00 -> '3:00 PM'"""
+    return value.strftime('%I:%M %p').lstrip('0')
+
+
 def send_booking_confirmation_email(booking):
     """
     Send booking confirmation email with invoice PDF attachment (if available).
@@ -26,7 +33,7 @@ def send_booking_confirmation_email(booking):
         invoice_bytes = None
         pdf_filename = None
         try:
-            invoice_pdf = generate_invoice_pdf(booking)
+            invoice_pdf = get_invoice_pdf(booking)
             invoice_bytes = invoice_pdf.read()
             pdf_filename = f"invoice_URB{booking.id:06d}.pdf"
             logger.info("Invoice PDF generated successfully for booking id %s", booking.id)
@@ -35,6 +42,9 @@ def send_booking_confirmation_email(booking):
             # Continue without PDF—don't fail the entire email
         
         # Email content
+        site = SiteSettings.cached()
+        check_in_time = _format_time(site.check_in_time)
+        check_out_time = _format_time(site.check_out_time)
         subject = f"Booking Confirmation - Reference #{booking.id:06d}"
         
         from_email = settings.DEFAULT_FROM_EMAIL
@@ -57,8 +67,8 @@ Status: {booking.status.upper()}
 Your invoice and booking details are attached to this email.
 
 IMPORTANT INFORMATION:
-- Please arrive between 3:00 PM - 9:00 PM on your check-in date
-- Check-out time is 11:00 AM
+- Please arrive between {check_in_time} - 9:00 PM on your check-in date
+- Check-out time is {check_out_time}
 - Your booking is confirmed and reserved under your name
 
 If you have any questions or need to make changes to your reservation, 
@@ -121,8 +131,8 @@ Urban Oasis Apartment Rental Team
         <div style="background-color: #fff3cd; padding: 15px; border-left: 4px solid #ffc107; margin: 20px 0;">
             <h3 style="color: #856404; margin-top: 0;">IMPORTANT INFORMATION:</h3>
             <ul style="color: #856404; margin: 10px 0;">
-                <li>Please arrive between <strong>3:00 PM - 9:00 PM</strong> on your check-in date</li>
-                <li>Check-out time is <strong>11:00 AM</strong></li>
+                <li>Please arrive between <strong>{check_in_time} - 9:00 PM</strong> on your check-in date</li>
+                <li>Check-out time is <strong>{check_out_time}</strong></li>
                 <li>Your booking is confirmed and reserved under your name</li>
             </ul>
         </div>
@@ -163,8 +173,8 @@ Urban Oasis Apartment Rental Team
         if invoice_bytes and pdf_filename:
             msg.attach(pdf_filename, invoice_bytes, "application/pdf")
         
-        # Send email
-        msg.send(fail_silently=False)
+        # Send email over a pooled SMTP session
+        send_messages([msg])
         logger.info("Confirmation email sent to %s", booking.email)
 
         # Also notify admin/business email with booking details and copy of invoice
@@ -212,7 +222,7 @@ This message contains the full booking form information and invoice attachment.
             admin_msg.attach_alternative(admin_html, 'text/html')
             if invoice_bytes and pdf_filename:
                 admin_msg.attach(pdf_filename, invoice_bytes, 'application/pdf')
-            admin_msg.send(fail_silently=False)
+            send_messages([admin_msg])
             logger.info("Admin notification sent to %s", settings.BUSINESS_EMAIL)
         except Exception as e:
             logger.exception("Error sending admin notification")
@@ -360,7 +370,7 @@ Urban Oasis Apartment Rental Team
         
         msg = EmailMultiAlternatives(subject, text_content, from_email, to_email)
         msg.attach_alternative(html_content, "text/html")
-        msg.send(fail_silently=False)
+        send_messages([msg])
         logger.info("Receipt email sent to %s", booking.email)
         return True
 
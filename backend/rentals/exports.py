@@ -0,0 +1,175 @@
+"""
+Streaming CSV and NDJSON exports of bookings.
+
+Rows are read with QuerySet.values().iterator(), so only `chunk_size` rows
+are held in memory at a time and no model instances are built, and written
+straight into a StreamingHttpResponse. A full-history export therefore runs
+in constant memory and starts sending bytes before the last row is read.
+The final row carries the totals for the export.
+"""
+import csv
+import json
+from datetime import date
+from decimal import Decimal
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from .models import Booking
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Column order of the export; num_nights and nightly_rate are computed
+EXPORT_FIELDS = [
+    'id', 'created_at', 'status', 'first_name', 'last_name', 'email', 'phone',
+    'check_in', 'check_out', 'num_nights', 'num_guests', 'pricing_rule',
+    'payment_method', 'total_price', 'nightly_rate',
+]
+
+_QUERY_FIELDS = [
+    'id', 'created_at', 'status', 'first_name', 'last_name', 'email', 'phone',
+    'check_in', 'check_out', 'num_guests', 'pricing_rule__name',
+    'payment_method', 'total_price',
+]
+
+
+# Free text typed in by guests. Spreadsheets run cells starting with one of
+# FORMULA_PREFIXES as formulas, so the CSV export quotes them with a leading '
+GUEST_TEXT_FIELDS = ('first_name', 'last_name', 'email', 'phone')
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class ExportError(ValueError):
+    """Invalid export filters"""
+
+
+def export_queryset(status=None, start=None, end=None):
+    """
+    Bookings to export, oldest first.
+
+    Args:
+        status: comma-separated statuses to include (all when empty)
+        start: first check-in date to include (date or YYYY-MM-DD)
+        end: last check-in date to include (date or YYYY-MM-DD)
+
+    Raises:
+        ExportError: for an unknown status or a malformed date
+    """
+    queryset = Booking.objects.all()
+
+    if status:
+        statuses = [s.strip() for s in status.split(',') if s.strip()]
+        valid = {choice for choice, _ in Booking.STATUS_CHOICES}
+        unknown = sorted(set(statuses) - valid)
+        if unknown:
+            raise ExportError(f"Unknown status: {', '.join(unknown)}")
+        queryset = queryset.filter(status__in=statuses)
+
+    try:
+        if start:
+            queryset = queryset.filter(check_in__gte=start if isinstance(start, date) else date.fromisoformat(start))
+        if end:
+            queryset = queryset.filter(check_in__lte=end if isinstance(end, date) else date.fromisoformat(end))
+    except ValueError:
+        raise ExportError("Dates must be in YYYY-MM-DD format")
+
+    return queryset.order_by('created_at', 'id')
+
+
+def booking_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield one dict per booking (keys in EXPORT_FIELDS order), then a summary
+    dict with the booking, night and revenue totals.
+    """
+    count = nights_total = 0
+    revenue = Decimal('0.00')
+
+    for values in queryset.values(*_QUERY_FIELDS).iterator(chunk_size=chunk_size):
+        nights = max((values['check_out'] - values['check_in']).days, 0)
+        total = values['total_price']
+        count += 1
+        nights_total += nights
+        revenue += total
+        yield {
+            'id': values['id'],
+            'created_at': timezone.localtime(values['created_at']).isoformat(),
+            'status': values['status'],
+            'first_name': values['first_name'],
+            'last_name': values['last_name'],
+            'email': values['email'],
+            'phone': values['phone'],
+            'check_in': values['check_in'].isoformat(),
+            'check_out': values['check_out'].isoformat(),
+            'num_nights': nights,
+            'num_guests': values['num_guests'],
+            'pricing_rule': values['pricing_rule__name'] or '',
+            'payment_method': values['payment_method'] or '',
+            'total_price': str(total),
+            'nightly_rate': str((total / nights).quantize(Decimal('0.01'))) if nights else '',
+        }
+
+    yield {
+        'summary': True,
+        'bookings': count,
+        'num_nights': nights_total,
+        'total_price': str(revenue),
+        'average_nightly_rate': str((revenue / nights_total).quantize(Decimal('0.01'))) if nights_total else '',
+    }
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller"""
+    def write(self, value):
+        return value
+
+
+def csv_safe(value):
+    """`value` with a leading ' if a spreadsheet would read it as a formula"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        if row.get('summary'):
+            summary = dict.fromkeys(EXPORT_FIELDS, '')
+            summary.update(
+                id='TOTAL',
+                status=f"{row['bookings']} bookings",
+                num_nights=row['num_nights'],
+                total_price=row['total_price'],
+                nightly_rate=row['average_nightly_rate'],
+            )
+            row = summary
+        else:
+            row = {**row, **{field: csv_safe(row[field]) for field in GUEST_TEXT_FIELDS}}
+        yield writer.writerow([row[field] for field in EXPORT_FIELDS])
+
+
+def iter_ndjson(rows):
+    for row in rows:
+        if row.pop('summary', False):
+            row = {'summary': row}
+        yield json.dumps(row) + '\n'
+
+
+def export_response(queryset, fmt='csv', chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    StreamingHttpResponse with `queryset` as a CSV or NDJSON attachment.
+
+    Args:
+        fmt: a key of EXPORT_FORMATS
+    """
+    rows = booking_rows(queryset, chunk_size=chunk_size)
+    content = iter_csv(rows) if fmt == 'csv' else iter_ndjson(rows)
+    response = StreamingHttpResponse(content, content_type=EXPORT_FORMATS[fmt])
+    filename = f"bookings-{timezone.localdate().isoformat()}.{fmt}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Cache-Control'] = 'no-store'
+    return response
@@ -0,0 +1,216 @@
+"""
+Bulk import of gallery photos from a directory or zip archive.
+
+Decoding, resizing and rendition encoding run in a process pool (the slow
+part of an upload); the parent inserts the finished GalleryImage rows with
+bulk_create. Categories and titles are inferred from photo-shoot filenames
+such as BEDROOM1B.jpg or LR2.jpg.
+"""
+import logging
+import os
+import re
+import time
+import zipfile
+from functools import partial
+from io import BytesIO
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from .images import build_renditions, load_image
+from .parallel import iter_ordered
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.avif')
+
+# Filename prefix -> (category, title)
+PREFIXES = {
+    'LR': ('living', 'Living Room'),
+    'LIVING': ('living', 'Living Room'),
+    'LIVINGROOM': ('living', 'Living Room'),
+    'BR': ('bedroom', 'Bedroom'),
+    'BEDROOM': ('bedroom', 'Bedroom'),
+    'KITCHEN': ('kitchen', 'Kitchen'),
+    'BATH': ('bathroom', 'Bathroom'),
+    'BATHROOM': ('bathroom', 'Bathroom'),
+    'DINING': ('dining', 'Dining Area'),
+    'EXTERIOR': ('exterior', 'Exterior'),
+    'OUTSIDE': ('exterior', 'Exterior'),
+    'LAUNDRY': ('amenities', 'Laundry'),
+    'POOL': ('amenities', 'Pool'),
+    'GYM': ('amenities', 'Gym'),
+}
+
+BATCH_SIZE = 100
+
+
+def infer_category(filename):
+    """
+    Category and title for a photo, from its filename prefix.
+
+    BEDROOM1B.jpg -> ('bedroom', 'Bedroom 1B'); unknown prefixes give 'other'
+    and a title made from the filename.
+    """
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    match = re.match(r'([A-Za-z]+)[-_ ]*(.*)$', stem)
+    if match and match.group(1).upper() in PREFIXES:
+        category, label = PREFIXES[match.group(1).upper()]
+        return category, f"{label} {match.group(2)}".strip()
+    return 'other', re.sub(r'[-_]+', ' ', stem).strip()
+
+
+def find_photos(path):
+    """
+    List the photos in a directory or zip archive.
+
+    When the same photo exists in several formats in one folder
+    (BEDROOM3.jpg and BEDROOM3.avif) only the first format in
+    IMAGE_EXTENSIONS is kept; same-named photos in different folders are all
+    kept.
+
+    Returns:
+        list: [(archive path or None, file path or member name), ...] sorted by name
+    """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            names = [(path, name, name) for name in archive.namelist() if not name.endswith('/')]
+    else:
+        names = [
+            (None, os.path.join(root, name), os.path.relpath(os.path.join(root, name), path))
+            for root, _, files in os.walk(path) for name in files
+        ]
+
+    chosen = {}
+    for archive, name, relative in names:
+        stem, ext = os.path.splitext(os.path.basename(name))
+        if ext.lower() not in IMAGE_EXTENSIONS or stem.startswith('.'):
+            continue
+        key = (os.path.dirname(relative), stem.lower())
+        if key not in chosen or IMAGE_EXTENSIONS.index(ext.lower()) < IMAGE_EXTENSIONS.index(
+                os.path.splitext(chosen[key][1])[1].lower()):
+            chosen[key] = (archive, name)
+    return sorted(chosen.values(), key=lambda photo: os.path.basename(photo[1]).lower())
+
+
+def _process_photo(photo, max_width):
+    """
+    Store one photo (downscaled to `max_width` if wider) and its renditions.
+
+    Runs in a worker process. Returns a dict of GalleryImage field values plus
+    `bytes_read`, or `error`.
+    """
+    from .models import GalleryImage
+
+    archive, name = photo
+    try:
+        if archive:
+            with zipfile.ZipFile(archive) as zf:
+                data = zf.read(name)
+        else:
+            with open(name, 'rb') as f:
+                data = f.read()
+
+        image = load_image(BytesIO(data))
+        filename = os.path.basename(name)
+        if max_width and image.width > max_width:
+            height = max(1, round(image.height * max_width / image.width))
+            image = image.resize((max_width, height))
+            buffer = BytesIO()
+            if image.mode == 'RGBA':
+                filename = os.path.splitext(filename)[0] + '.png'
+                image.save(buffer, 'PNG', optimize=True)
+            else:
+                filename = os.path.splitext(filename)[0] + '.jpg'
+                image.save(buffer, 'JPEG', quality=85, optimize=True, progressive=True)
+            stored = buffer.getvalue()
+        else:
+            stored = data
+
+        upload_name = GalleryImage._meta.get_field('image').generate_filename(None, filename)
+        saved_as = default_storage.save(upload_name, ContentFile(stored))
+        return {
+            'image': saved_as,
+            'renditions': build_renditions(saved_as, default_storage, image=image),
+            'bytes_read': len(data),
+        }
+    except Exception as e:
+        return {'error': f"{e.__class__.__name__}: {e}", 'bytes_read': 0}
+
+
+def iter_processed_photos(photos, workers=None, max_width=None, window=None):
+    """
+    Process photos in worker processes, yielding (photo, result) in order.
+
+    Only `window` photos are in flight at once.
+    """
+    return iter_ordered(partial(_process_photo, max_width=max_width), photos, workers=workers, window=window)
+
+
+def import_gallery(path, workers=None, max_width=None, category=None, skip_existing=False,
+                   is_active=True, on_error=None):
+    """
+    Import every photo under `path` (directory or zip) as a GalleryImage.
+
+    Args:
+        category: use this category instead of inferring one from filenames
+        skip_existing: skip photos whose inferred title is already in the gallery
+        on_error: optional callable(filename, message) for photos that failed
+
+    Returns:
+        dict: imported, skipped and failed counts, bytes_read and seconds
+    """
+    from .models import GalleryImage
+    from . import caching
+
+    started = time.perf_counter()
+    photos = find_photos(path)
+    skipped = 0
+    if skip_existing:
+        existing = set(GalleryImage.objects.values_list('title', flat=True))
+        kept = [photo for photo in photos if infer_category(photo[1])[1] not in existing]
+        skipped = len(photos) - len(kept)
+        photos = kept
+
+    next_order = (GalleryImage.objects.order_by('-order').values_list('order', flat=True).first() or 0) + 1
+    imported = failed = bytes_read = 0
+    batch = []
+
+    def flush():
+        GalleryImage.objects.bulk_create(batch)
+        batch.clear()
+
+    for photo, result in iter_processed_photos(photos, workers=workers, max_width=max_width):
+        bytes_read += result['bytes_read']
+        if 'error' in result:
+            failed += 1
+            logger.warning("Could not import %s: %s", photo[1], result['error'])
+            if on_error:
+                on_error(photo[1], result['error'])
+            continue
+
+        inferred_category, title = infer_category(photo[1])
+        batch.append(GalleryImage(
+            title=title,
+            image=result['image'],
+            renditions=result['renditions'],
+            category=category or inferred_category,
+            alt_text=title,
+            order=next_order + imported,
+            is_active=is_active,
+        ))
+        imported += 1
+        if len(batch) >= BATCH_SIZE:
+            flush()
+    if batch:
+        flush()
+
+    if imported:
+        # bulk_create skips the signals that retire cached gallery responses
+        caching.bump_model_version(GalleryImage)
+
+    return {
+        'imported': imported,
+        'skipped': skipped,
+        'failed': failed,
+        'bytes_read': bytes_read,
+        'seconds': time.perf_counter() - started,
+    }
@@ -0,0 +1,205 @@
+"""
+Idempotency-Key handling for write requests.
+
+A client that may retry a POST sends the same `Idempotency-Key` header (any
+unique string, e.g. a UUID, up to 255 characters) with every attempt. The
+first attempt claims the key by inserting an IdempotencyRecord, runs the
+view and stores its response; later attempts get that response back with an
+`Idempotent-Replayed: true` header instead of running the view again. Stored
+responses are also kept in the Django cache, so a retry usually costs one
+cache lookup and no queries.
+
+Keys are scoped to the request path. Reusing a key for a different request
+(body, query string or caller) is refused with 422; a retry that arrives
+while the first attempt is still running gets 409 and should try again.
+Only successful (2xx/3xx) responses are stored. Errors (a validation error,
+dates already taken, Stripe being down), streaming responses and requests
+that raise release the key, so the request can be fixed or retried with it.
+
+IdempotencyMiddleware (middleware.py) calls begin() and finish() around the
+view.
+"""
+import hashlib
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from .models import IdempotencyRecord
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+CACHE_KEY = 'rentals:idempotency:{}'
+
+# Response headers kept with the stored response
+STORED_HEADERS = ('Content-Type', 'Location')
+
+
+def applies(request):
+    """Whether a request carries an Idempotency-Key the middleware should honour"""
+    return (
+        settings.IDEMPOTENCY_ENABLED
+        and request.method == 'POST'
+        and HEADER in request.headers
+        and request.path.startswith(tuple(settings.IDEMPOTENCY_PATH_PREFIXES))
+    )
+
+
+def fingerprint(request):
+    """SHA-256 of everything that makes two requests "the same" request"""
+    user = getattr(request, 'user', None)
+    caller = [
+        str(user.pk) if user is not None and user.is_authenticated else '',
+        request.headers.get('Authorization', ''),
+    ]
+    digest = hashlib.sha256()
+    for part in [request.method, request.path, request.META.get('QUERY_STRING', '')] + caller:
+        digest.update(part.encode())
+        digest.update(b'\n')
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def _cache_key(key, path):
+    return CACHE_KEY.format(hashlib.sha256(f"{path}\n{key}".encode()).hexdigest())
+
+
+def _error(message, status):
+    return JsonResponse({'error': message}, status=status)
+
+
+def _in_progress():
+    response = _error('A request with this key is still being processed, retry shortly', 409)
+    response['Retry-After'] = '1'
+    return response
+
+
+def _ttl_left(record):
+    return max(1, int((record.expires_at - timezone.now()).total_seconds()))
+
+
+def _replay(stored, digest):
+    """The stored response, or 422 if the key was used for another request"""
+    if stored['fingerprint'] != digest:
+        return _error(f'{HEADER} was already used for a different request', 422)
+    response = HttpResponse(stored['body'], status=stored['status'])
+    for name, value in stored['headers'].items():
+        response[name] = value
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def _stored(record):
+    return {
+        'fingerprint': record.fingerprint,
+        'status': record.response_status,
+        'headers': record.response_headers,
+        'body': bytes(record.response_body),
+    }
+
+
+def begin(request):
+    """
+    Claim the request's Idempotency-Key, or answer the request without
+    running the view.
+
+    Returns:
+        tuple: (record, response). If `response` is not None send it as is
+        (a replayed or error response); otherwise run the view and pass
+        `record` to finish().
+    """
+    key = request.headers[HEADER].strip()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return None, _error(f'{HEADER} must be 1 to {MAX_KEY_LENGTH} characters', 400)
+
+    digest = fingerprint(request)
+    stored = cache.get(_cache_key(key, request.path))
+    if stored is not None:
+        return None, _replay(stored, digest)
+
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=settings.IDEMPOTENCY_TTL)
+    try:
+        # The unique (key, path) constraint lets exactly one of several
+        # concurrent attempts claim the key
+        with transaction.atomic():
+            record = IdempotencyRecord.objects.create(
+                key=key, path=request.path, fingerprint=digest, locked_at=now, expires_at=expires_at
+            )
+        return record, None
+    except IntegrityError:
+        pass
+
+    record = IdempotencyRecord.objects.filter(key=key, path=request.path).first()
+    if record is None:
+        # Pruned between the insert and the read
+        return None, _in_progress()
+
+    lock_expired = record.locked_at < now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT)
+    if record.expires_at <= now or (record.status == 'processing' and lock_expired):
+        # Expired, or left behind by a worker that died mid-request: take it
+        # over unless another attempt just did
+        taken = IdempotencyRecord.objects.filter(pk=record.pk, locked_at=record.locked_at).update(
+            status='processing', fingerprint=digest, response_status=None, response_headers={},
+            response_body=b'', locked_at=now, expires_at=expires_at,
+        )
+        if taken:
+            record.fingerprint, record.locked_at, record.expires_at = digest, now, expires_at
+            return record, None
+        return None, _in_progress()
+
+    if record.status == 'processing':
+        if record.fingerprint != digest:
+            return None, _error(f'{HEADER} was already used for a different request', 422)
+        return None, _in_progress()
+
+    stored = _stored(record)
+    cache.set(_cache_key(key, request.path), stored, _ttl_left(record))
+    return None, _replay(stored, digest)
+
+
+def finish(record, response):
+    """
+    Store the view's response for replay (or release the key if the response
+    should not be replayed).
+
+    Returns:
+        HttpResponse: `response`, unchanged
+    """
+    if response.streaming or response.status_code >= 400:
+        release(record)
+        return response
+
+    stored = {
+        'fingerprint': record.fingerprint,
+        'status': response.status_code,
+        'headers': {name: response[name] for name in STORED_HEADERS if response.has_header(name)},
+        'body': response.content,
+    }
+    IdempotencyRecord.objects.filter(pk=record.pk, locked_at=record.locked_at).update(
+        status='completed',
+        response_status=stored['status'],
+        response_headers=stored['headers'],
+        response_body=stored['body'],
+    )
+    cache.set(_cache_key(record.key, record.path), stored, _ttl_left(record))
+    return response
+
+
+def release(record):
+    """Forget a claimed key so the request can be retried with it"""
+    IdempotencyRecord.objects.filter(pk=record.pk, locked_at=record.locked_at).delete()
+
+
+def prune_expired():
+    """
+    Delete expired records (their cache entries expire on their own).
+
+    Returns:
+        int: number of records deleted
+    """
+    deleted, _ = IdempotencyRecord.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
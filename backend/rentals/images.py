@@ -0,0 +1,173 @@
+"""
+Responsive renditions for uploaded images.
+
+When a GalleryImage or PricingRule image is uploaded, the original is resized
+to each width in RENDITION_WIDTHS (never upscaled) and encoded as WebP, plus
+AVIF when Pillow supports it. The files are stored next to the original as
+`<name>-<width>w.<format>`. A tiny blurred WebP placeholder is kept inline as
+a data URI. Everything is recorded in the model's `renditions` JSON field:
+
+    {
+        "source": "gallery/2026/02/living.jpg",
+        "width": 4032, "height": 3024,
+        "placeholder": "data:image/webp;base64,...",
+        "sources": {"avif": [["gallery/2026/02/living-320w.avif", 320], ...],
+                    "webp": [...]}
+    }
+
+Serializers turn this into `srcset` strings with srcset_for().
+"""
+import base64
+import logging
+import os
+from io import BytesIO
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageFilter, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+RENDITION_WIDTHS = (320, 640, 960, 1280, 1920)
+
+PLACEHOLDER_WIDTH = 16
+
+# Encoder options per format
+ENCODERS = {
+    'avif': {'quality': 50, 'speed': 8},
+    'webp': {'quality': 75, 'method': 4},
+}
+
+
+def rendition_formats():
+    """Formats this Pillow build can encode, best compression first"""
+    return [fmt for fmt in ('avif', 'webp') if features.check(fmt)]
+
+
+def rendition_name(source, width, fmt):
+    stem, _ = os.path.splitext(source)
+    return f"{stem}-{width}w.{fmt}"
+
+
+def _placeholder(image):
+    height = max(1, round(image.height * PLACEHOLDER_WIDTH / image.width))
+    tiny = image.resize((PLACEHOLDER_WIDTH, height), Image.LANCZOS).filter(ImageFilter.GaussianBlur(1))
+    buffer = BytesIO()
+    tiny.save(buffer, 'WEBP', quality=30)
+    return "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def load_image(fileobj):
+    """Decode an image, apply its EXIF orientation and normalise the mode"""
+    image = Image.open(fileobj)
+    image = ImageOps.exif_transpose(image)
+    return image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+
+def build_renditions(source, storage=None, image=None):
+    """
+    Generate renditions for a stored image.
+
+    Args:
+        source: storage name of the original (e.g. gallery_image.image.name)
+        image: the decoded original, if the caller already has it
+
+    Returns:
+        dict: data for the model's `renditions` field
+    """
+    storage = storage or default_storage
+    if image is None:
+        with storage.open(source, 'rb') as f:
+            image = load_image(f)
+
+    widths = [w for w in RENDITION_WIDTHS if w < image.width] or [image.width]
+    sources = {}
+    for fmt in rendition_formats():
+        sources[fmt] = []
+        for width in widths:
+            height = max(1, round(image.height * width / image.width))
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            buffer = BytesIO()
+            resized.save(buffer, fmt.upper(), **ENCODERS[fmt])
+            name = rendition_name(source, width, fmt)
+            if storage.exists(name):
+                storage.delete(name)
+            sources[fmt].append([storage.save(name, ContentFile(buffer.getvalue())), width])
+
+    return {
+        'source': source,
+        'width': image.width,
+        'height': image.height,
+        'placeholder': _placeholder(image),
+        'sources': sources,
+    }
+
+
+def delete_renditions(renditions, storage=None):
+    """Remove the files listed in a `renditions` value"""
+    storage = storage or default_storage
+    for entries in (renditions or {}).get('sources', {}).values():
+        for name, _ in entries:
+            try:
+                storage.delete(name)
+            except Exception:
+                logger.warning("Could not delete rendition %s", name, exc_info=True)
+
+
+def refresh_renditions(instance, field_name='image', force=False):
+    """
+    Rebuild `instance.renditions` if its image changed since they were made
+    (or always, with `force`).
+
+    Saves only the `renditions` field, so the usual post_save receivers (cache
+    invalidation) still run. Failures are logged and leave the original image
+    in use.
+
+    Returns:
+        bool: True if renditions were rebuilt or cleared
+    """
+    field_file = getattr(instance, field_name)
+    current = instance.renditions or {}
+    if not force and (field_file.name or None) == current.get('source'):
+        return False
+
+    try:
+        renditions = build_renditions(field_file.name, field_file.storage) if field_file else {}
+    except Exception:
+        logger.exception("Could not build renditions for %s %s", type(instance).__name__, instance.pk)
+        return False
+
+    # A forced rebuild rewrites the same names; only delete what was replaced
+    kept = {name for entries in renditions.get('sources', {}).values() for name, _ in entries}
+    stale = {
+        fmt: [entry for entry in entries if entry[0] not in kept]
+        for fmt, entries in current.get('sources', {}).items()
+    }
+    delete_renditions({'sources': stale}, field_file.storage)
+    instance.renditions = renditions
+    instance.save(update_fields=['renditions'])
+    return True
+
+
+def srcset_for(renditions, url_for):
+    """
+    Serializer representation of a `renditions` value.
+
+    Args:
+        url_for: callable turning a storage name into a URL
+
+    Returns:
+        dict with a srcset string per format, placeholder and intrinsic size,
+        or None when there are no renditions
+    """
+    if not renditions or not renditions.get('sources'):
+        return None
+    data = {
+        fmt: ", ".join(f"{url_for(name)} {width}w" for name, width in entries)
+        for fmt, entries in renditions['sources'].items()
+    }
+    data.update(
+        placeholder=renditions.get('placeholder'),
+        width=renditions.get('width'),
+        height=renditions.get('height'),
+    )
+    return data
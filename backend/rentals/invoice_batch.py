@@ -0,0 +1,154 @@
+"""
+Batch invoice rendering for month-end reprints.
+
+Spreads ReportLab rendering over a process pool and streams the finished PDFs
+into a zip archive or a single merged PDF. Only a bounded window of invoices is
+in flight at once, so zip output uses constant memory whatever the number of
+bookings. A merged PDF is held in memory until it is written, so it is capped
+at MAX_MERGED_INVOICES bookings.
+"""
+import logging
+import os
+import zipfile
+from io import BytesIO
+from django.db.models import QuerySet
+from .invoice_cache import get_invoice_pdf
+from .parallel import iter_ordered
+
+logger = logging.getLogger(__name__)
+
+# A merged PDF is built in memory (see render_invoices_pdf); zip output has no limit
+MAX_MERGED_INVOICES = 1000
+
+
+def _render_invoice(booking):
+    return get_invoice_pdf(booking).getvalue()
+
+
+def bookings_for_period(start=None, end=None, status=None):
+    """
+    Bookings checking in between `start` and `end` (inclusive), oldest first.
+
+    Args:
+        start, end: optional dates
+        status: optional status or list of statuses
+    """
+    from .models import Booking
+
+    bookings = Booking.objects.all()
+    if start:
+        bookings = bookings.filter(check_in__gte=start)
+    if end:
+        bookings = bookings.filter(check_in__lte=end)
+    if status:
+        statuses = [status] if isinstance(status, str) else list(status)
+        bookings = bookings.filter(status__in=statuses)
+    return bookings.order_by('check_in', 'id')
+
+
+def iter_rendered_invoices(bookings, workers=None, window=None):
+    """
+    Render invoices in worker processes, yielding (booking, pdf_bytes) in order.
+
+    Args:
+        bookings: queryset or iterable of Booking instances
+        workers: number of processes (defaults to the CPU count)
+        window: maximum invoices rendered but not yet consumed
+    """
+    workers = workers or os.cpu_count() or 1
+    if hasattr(bookings, 'iterator'):
+        bookings = bookings.iterator(chunk_size=500)
+    return iter_ordered(_render_invoice, bookings, workers=workers, window=window or workers * 4)
+
+
+def invoice_filename(booking):
+    return f"invoice_URB{booking.id:06d}.pdf"
+
+
+def render_invoices_zip(bookings, fileobj, workers=None):
+    """
+    Write one PDF per booking into a zip archive.
+
+    Returns:
+        int: number of invoices written
+    """
+    count = 0
+    with zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for booking, pdf in iter_rendered_invoices(bookings, workers=workers):
+            archive.writestr(invoice_filename(booking), pdf)
+            count += 1
+    return count
+
+
+def render_invoices_pdf(bookings, fileobj, workers=None, limit=MAX_MERGED_INVOICES):
+    """
+    Merge all invoices into a single PDF.
+
+    Each rendered buffer is released once its pages are copied, but pypdf's
+    PdfWriter keeps every copied page until the document is written, so
+    memory grows with the number of invoices. Runs of more than `limit`
+    bookings are refused before anything is rendered; use zip output (which
+    streams in constant memory) for those. Requires pypdf.
+
+    Returns:
+        int: number of invoices merged
+
+    Raises:
+        RuntimeError: pypdf is missing, or there are more than `limit` bookings
+    """
+    try:
+        from pypdf import PdfReader, PdfWriter
+    except ImportError:
+        raise RuntimeError("Merged PDF output requires pypdf (pip install pypdf)")
+
+    if isinstance(bookings, QuerySet):
+        total = bookings.count()
+    else:
+        bookings = list(bookings)
+        total = len(bookings)
+    if limit and total > limit:
+        raise RuntimeError(
+            f"A merged PDF is limited to {limit} invoices ({total} requested); "
+            f"use zip output or a shorter date range"
+        )
+
+    writer = PdfWriter()
+    count = 0
+    for booking, pdf in iter_rendered_invoices(bookings, workers=workers):
+        writer.append(PdfReader(BytesIO(pdf)), outline_item=f"URB{booking.id:06d}")
+        count += 1
+    if count:
+        writer.write(fileobj)
+    return count
+
+
+def render_invoices(bookings, fileobj, output_format='zip', workers=None):
+    """Render invoices for `bookings` into `fileobj` as 'zip' or 'pdf'"""
+    if output_format == 'zip':
+        return render_invoices_zip(bookings, fileobj, workers=workers)
+    if output_format == 'pdf':
+        return render_invoices_pdf(bookings, fileobj, workers=workers)
+    raise ValueError(f"Unknown invoice output format: {output_format}")
+
+
+def render_invoices_to_path(bookings, path, output_format='zip', workers=None):
+    """
+    Render invoices into the file at `path`, replacing it only on success.
+
+    The output is written to a temporary file next to `path` and renamed into
+    place, so a failed or interrupted run never leaves a partial archive (or
+    clobbers the previous one).
+
+    Returns:
+        int: number of invoices written
+    """
+    temp_path = f"{path}.{os.getpid()}.part"
+    try:
+        with open(temp_path, 'wb') as fileobj:
+            count = render_invoices(bookings, fileobj, output_format, workers=workers)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return count
@@ -0,0 +1,98 @@
+"""
+Content-addressed store for rendered invoice PDFs.
+
+Invoices are saved in the media storage backend under
+`invoices/<booking id>/<hash>.pdf`, where the hash covers every booking field
+that appears on the invoice. Repeat requests for an unchanged booking serve the
+stored bytes; any change to those fields produces a new hash, and stale files
+are pruned by the Booking signals in signals.py.
+"""
+import hashlib
+import json
+import logging
+from io import BytesIO
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from .invoice_generator import generate_invoice_pdf
+
+logger = logging.getLogger(__name__)
+
+# Bump when the invoice layout changes so previously cached PDFs are not served
+INVOICE_LAYOUT_VERSION = 1
+
+# Booking fields rendered on the invoice
+INVOICE_FIELDS = [
+    'id', 'first_name', 'last_name', 'email', 'phone',
+    'check_in', 'check_out', 'num_guests', 'total_price',
+    'status', 'payment_method', 'special_requests',
+]
+
+
+def invoice_fingerprint(booking):
+    """Return a hex digest of everything that determines the invoice content"""
+    content = {field: getattr(booking, field) for field in INVOICE_FIELDS}
+    content['_business'] = [
+        settings.BUSINESS_NAME, settings.BUSINESS_ADDRESS,
+        settings.BUSINESS_EMAIL, settings.BUSINESS_PHONE,
+    ]
+    content['_layout'] = INVOICE_LAYOUT_VERSION
+    encoded = json.dumps(content, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def invoice_dir(booking_id):
+    return f"{settings.INVOICE_CACHE_DIR}/{booking_id}"
+
+
+def invoice_path(booking, fingerprint=None):
+    return f"{invoice_dir(booking.id)}/{fingerprint or invoice_fingerprint(booking)}.pdf"
+
+
+def get_invoice_pdf(booking):
+    """
+    Return the invoice PDF for a booking, rendering it only on a cache miss.
+
+    Returns:
+        BytesIO object containing the PDF (same contract as generate_invoice_pdf)
+    """
+    path = invoice_path(booking)
+
+    try:
+        if default_storage.exists(path):
+            with default_storage.open(path, 'rb') as f:
+                return BytesIO(f.read())
+    except Exception:
+        logger.warning("Could not read cached invoice %s", path, exc_info=True)
+
+    pdf = generate_invoice_pdf(booking)
+    try:
+        saved_as = default_storage.save(path, ContentFile(pdf.getvalue()))
+        if saved_as != path:
+            # Another process stored the same invoice first
+            default_storage.delete(saved_as)
+    except Exception:
+        logger.warning("Could not cache invoice for booking id %s", booking.id, exc_info=True)
+    pdf.seek(0)
+    return pdf
+
+
+def prune_invoices(booking_id, keep=None):
+    """
+    Delete cached invoices for a booking, except the file named `keep`.
+
+    Returns:
+        int: number of files deleted
+    """
+    directory = invoice_dir(booking_id)
+    try:
+        _, files = default_storage.listdir(directory)
+    except (FileNotFoundError, NotImplementedError):
+        return 0
+
+    deleted = 0
+    for name in files:
+        if name != keep:
+            default_storage.delete(f"{directory}/{name}")
+            deleted += 1
+    return deleted
@@ -1,6 +1,8 @@
 """
 Invoice generation utility for Urban Oasis bookings - Ultra-simple text-based approach
 """
+import copy
+from functools import lru_cache
 from io import BytesIO
 from datetime import datetime
 from reportlab.lib.pagesizes import letter
@@ -10,31 +12,24 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 from django.conf import settings
+from . import metrics
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-def generate_invoice_pdf(booking):
+class InvoiceTemplate:
     """
-    Generate a PDF invoice for a booking - simplified text-only approach.
-    
-    Args:
-        booking: Booking instance from models.py
-        
-    Returns:
-        BytesIO object containing the PDF
+    Styles and static flowables shared by every invoice.
+
+    Built once per process (per set of business details) by get_invoice_template();
+    generate_invoice_pdf only creates the per-booking paragraphs.
     """
-    try:
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
-        
-        elements = []
-        
-        # Styles
+
+    def __init__(self, business_name, business_address, business_email, business_phone):
         styles = getSampleStyleSheet()
         
-        title_style = ParagraphStyle(
+        self.title_style = ParagraphStyle(
             'Title',
             parent=styles['Heading1'],
             fontSize=24,
@@ -43,7 +38,7 @@ def generate_invoice_pdf(booking):
             alignment=TA_CENTER
         )
         
-        heading_style = ParagraphStyle(
+        self.heading_style = ParagraphStyle(
             'Heading',
             parent=styles['Heading2'],
             fontSize=12,
@@ -52,7 +47,7 @@ def generate_invoice_pdf(booking):
             fontName='Helvetica-Bold'
         )
         
-        normal_style = ParagraphStyle(
+        self.normal_style = ParagraphStyle(
             'Normal',
             parent=styles['Normal'],
             fontSize=10,
@@ -60,7 +55,7 @@ def generate_invoice_pdf(booking):
             alignment=TA_LEFT
         )
         
-        center_style = ParagraphStyle(
+        self.center_style = ParagraphStyle(
             'Center',
             parent=styles['Normal'],
             fontSize=9,
@@ -68,9 +63,104 @@ def generate_invoice_pdf(booking):
             spaceAfter=4
         )
         
+        self.total_style = ParagraphStyle(
+            'Total',
+            parent=styles['Normal'],
+            fontSize=12,
+            fontName='Helvetica-Bold',
+            textColor=colors.HexColor('#27ae60'),
+            spaceAfter=6,
+            alignment=TA_LEFT
+        )
+        
+        self.footer_style = ParagraphStyle(
+            'Footer',
+            parent=styles['Normal'],
+            fontSize=8,
+            textColor=colors.HexColor('#7f8c8d'),
+            alignment=TA_CENTER,
+            spaceAfter=4
+        )
+        
         # Title
-        elements.append(Paragraph(settings.BUSINESS_NAME, title_style))
-        elements.append(Spacer(1, 0.15*inch))
+        self.title = [
+            Paragraph(business_name, self.title_style),
+            Spacer(1, 0.15*inch),
+        ]
+        
+        # Business info
+        self.bill_from = [
+            Paragraph("<b>Bill From:</b>", self.heading_style),
+            Paragraph("Urban Oasis Apartment Rental", self.normal_style),
+            Paragraph(business_address, self.normal_style),
+            Paragraph(business_email, self.normal_style),
+            Paragraph(business_phone, self.normal_style),
+            Spacer(1, 0.15*inch),
+        ]
+        
+        # Static section headings and lines
+        self.bill_to_heading = Paragraph("<b>Bill To:</b>", self.heading_style)
+        self.details_heading = Paragraph("<b>Booking Details</b>", self.heading_style)
+        self.price_heading = Paragraph("<b>Price Summary</b>", self.heading_style)
+        self.zero_adjustments = [
+            Paragraph("<b>Tax:</b> $0.00", self.normal_style),
+            Paragraph("<b>Discount:</b> $0.00", self.normal_style),
+        ]
+        self.payment_heading = Paragraph("<b>Payment Information</b>", self.heading_style)
+        self.requests_heading = Paragraph("<b>Special Requests</b>", self.heading_style)
+        
+        # Footer
+        footer_text = f"Thank you for choosing Urban Oasis! For questions, contact {business_email} or {business_phone}"
+        self.footer = [
+            Spacer(1, 0.3*inch),
+            Paragraph(footer_text, self.footer_style),
+        ]
+
+    @staticmethod
+    def copy_of(flowables):
+        """
+        Shallow-copy prebuilt flowables for one document.
+
+        Copies share the parsed paragraph text but get their own layout state,
+        so concurrent builds never wrap the same Paragraph object.
+        """
+        return [copy.copy(flowable) for flowable in flowables]
+
+
+@lru_cache(maxsize=8)
+def _build_invoice_template(business_name, business_address, business_email, business_phone):
+    return InvoiceTemplate(business_name, business_address, business_email, business_phone)
+
+
+def get_invoice_template():
+    """Return the cached InvoiceTemplate for the current business settings"""
+    return _build_invoice_template(
+        settings.BUSINESS_NAME,
+        settings.BUSINESS_ADDRESS,
+        settings.BUSINESS_EMAIL,
+        settings.BUSINESS_PHONE,
+    )
+
+
+@metrics.timed('pdf')
+def generate_invoice_pdf(booking):
+    """
+    Generate a PDF invoice for a booking - simplified text-only approach.
+    
+    Args:
+        booking: Booking instance from models.py
+        
+    Returns:
+        BytesIO object containing the PDF
+    """
+    try:
+        buffer = BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
+        
+        template = get_invoice_template()
+        normal_style = template.normal_style
+        
+        elements = template.copy_of(template.title)
         
         # Invoice header
         elements.append(Paragraph(f"<b>Invoice Date:</b> {datetime.now().strftime('%B %d, %Y')}", normal_style))
@@ -79,22 +169,17 @@ def generate_invoice_pdf(booking):
         elements.append(Spacer(1, 0.2*inch))
         
         # Business info
-        elements.append(Paragraph("<b>Bill From:</b>", heading_style))
-        elements.append(Paragraph("Urban Oasis Apartment Rental", normal_style))
-        elements.append(Paragraph(settings.BUSINESS_ADDRESS, normal_style))
-        elements.append(Paragraph(settings.BUSINESS_EMAIL, normal_style))
-        elements.append(Paragraph(settings.BUSINESS_PHONE, normal_style))
-        elements.append(Spacer(1, 0.15*inch))
+        elements.extend(template.copy_of(template.bill_from))
         
         # Guest info
-        elements.append(Paragraph("<b>Bill To:</b>", heading_style))
+        elements.append(copy.copy(template.bill_to_heading))
         elements.append(Paragraph(f"{booking.first_name} {booking.last_name}", normal_style))
         elements.append(Paragraph(booking.email, normal_style))
         elements.append(Paragraph(booking.phone, normal_style))
         elements.append(Spacer(1, 0.2*inch))
         
         # Booking details
-        elements.append(Paragraph("<b>Booking Details</b>", heading_style))
+        elements.append(copy.copy(template.details_heading))
         elements.append(Paragraph(f"<b>Check-in:</b> {booking.check_in.strftime('%B %d, %Y')}", normal_style))
         elements.append(Paragraph(f"<b>Check-out:</b> {booking.check_out.strftime('%B %d, %Y')}", normal_style))
         
@@ -105,7 +190,7 @@ def generate_invoice_pdf(booking):
         elements.append(Spacer(1, 0.2*inch))
         
         # Price breakdown
-        elements.append(Paragraph("<b>Price Summary</b>", heading_style))
+        elements.append(copy.copy(template.price_heading))
         
         nightly_rate = 200.00
         subtotal = num_nights * nightly_rate
@@ -115,25 +200,15 @@ def generate_invoice_pdf(booking):
         elements.append(Paragraph(f"Nightly Rate: ${nightly_rate:.2f} x {num_nights} nights = ${subtotal:.2f}", normal_style))
         elements.append(Spacer(1, 0.1*inch))
         elements.append(Paragraph(f"<b>Subtotal:</b> ${subtotal:.2f}", normal_style))
-        elements.append(Paragraph("<b>Tax:</b> $0.00", normal_style))
-        elements.append(Paragraph("<b>Discount:</b> $0.00", normal_style))
+        elements.extend(template.copy_of(template.zero_adjustments))
         elements.append(Spacer(1, 0.1*inch))
         
         # Total due
-        total_style = ParagraphStyle(
-            'Total',
-            parent=styles['Normal'],
-            fontSize=12,
-            fontName='Helvetica-Bold',
-            textColor=colors.HexColor('#27ae60'),
-            spaceAfter=6,
-            alignment=TA_LEFT
-        )
-        elements.append(Paragraph(f"TOTAL DUE: ${total_amount:.2f}", total_style))
+        elements.append(Paragraph(f"TOTAL DUE: ${total_amount:.2f}", template.total_style))
         elements.append(Spacer(1, 0.2*inch))
         
         # Payment info
-        elements.append(Paragraph("<b>Payment Information</b>", heading_style))
+        elements.append(copy.copy(template.payment_heading))
         payment_method_text = {
             'debitcard': 'Debit Card',
             'zelle': 'Zelle Transfer',
@@ -150,22 +225,12 @@ def generate_invoice_pdf(booking):
         
         # Special requests
         if booking.special_requests:
-            elements.append(Paragraph("<b>Special Requests</b>", heading_style))
+            elements.append(copy.copy(template.requests_heading))
             elements.append(Paragraph(booking.special_requests, normal_style))
             elements.append(Spacer(1, 0.2*inch))
         
         # Footer
-        elements.append(Spacer(1, 0.3*inch))
-        footer_style = ParagraphStyle(
-            'Footer',
-            parent=styles['Normal'],
-            fontSize=8,
-            textColor=colors.HexColor('#7f8c8d'),
-            alignment=TA_CENTER,
-            spaceAfter=4
-        )
-        footer_text = f"Thank you for choosing Urban Oasis! For questions, contact {settings.BUSINESS_EMAIL} or {settings.BUSINESS_PHONE}"
-        elements.append(Paragraph(footer_text, footer_style))
+        elements.extend(template.copy_of(template.footer))
         
         # Build PDF
         doc.build(elements)
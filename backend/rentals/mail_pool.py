@@ -0,0 +1,171 @@
+"""
+Pooled, persistent email connections for Urban Oasis outbound mail.
+
+Opening an SMTP session (TCP connect, STARTTLS, AUTH) costs more than sending
+a message over it. The pool keeps authenticated sessions open between
+messages and across worker threads, checks them with NOOP before reuse and
+closes sessions that have sat idle for too long.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.smtp import EmailBackend as SMTPEmailBackend
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class EmailConnectionPool:
+    """
+    Thread-safe pool of open email backend connections.
+
+    Works with any configured EMAIL_BACKEND; only SMTP connections are
+    health-checked since the console/locmem backends have no session.
+    """
+
+    def __init__(self, max_size=None, idle_timeout=None, healthcheck_interval=None):
+        self.max_size = max_size or settings.EMAIL_POOL_SIZE
+        self.idle_timeout = idle_timeout if idle_timeout is not None else settings.EMAIL_POOL_IDLE_TIMEOUT
+        self.healthcheck_interval = (
+            healthcheck_interval if healthcheck_interval is not None
+            else settings.EMAIL_POOL_HEALTHCHECK_INTERVAL
+        )
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        self._idle = []  # [(connection, last_used), ...], most recently used last
+        self._backend = settings.EMAIL_BACKEND
+
+    def _open(self):
+        connection = get_connection(fail_silently=False)
+        connection.open()
+        logger.debug("Opened pooled email connection %r", connection)
+        return connection
+
+    def _close(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            logger.debug("Error closing pooled email connection", exc_info=True)
+
+    def _is_healthy(self, connection):
+        if not isinstance(connection, SMTPEmailBackend):
+            return True
+        if connection.connection is None:
+            return False
+        try:
+            return connection.connection.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _take_idle(self):
+        """Pop the most recently used idle connection, evicting expired ones"""
+        now = time.monotonic()
+        expired = []
+        connection = last_used = None
+
+        with self._lock:
+            if self._backend != settings.EMAIL_BACKEND:
+                # Backend was reconfigured (e.g. in tests); drop old sessions
+                expired = [conn for conn, _ in self._idle]
+                self._idle = []
+                self._backend = settings.EMAIL_BACKEND
+            fresh = []
+            for conn, used in self._idle:
+                if now - used > self.idle_timeout:
+                    expired.append(conn)
+                else:
+                    fresh.append((conn, used))
+            self._idle = fresh
+            if self._idle:
+                connection, last_used = self._idle.pop()
+
+        for conn in expired:
+            self._close(conn)
+
+        if connection is not None and now - last_used > self.healthcheck_interval:
+            if not self._is_healthy(connection):
+                logger.info("Discarding unhealthy pooled email connection")
+                self._close(connection)
+                connection = None
+        return connection
+
+    def acquire(self):
+        """Check out an open connection, blocking while the pool is exhausted"""
+        self._slots.acquire()
+        try:
+            return self._take_idle() or self._open()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, connection, discard=False):
+        """Return a connection to the pool, or close it if it errored"""
+        try:
+            if discard:
+                self._close(connection)
+            else:
+                with self._lock:
+                    self._idle.append((connection, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Context manager yielding a pooled connection"""
+        connection = self.acquire()
+        try:
+            yield connection
+        except Exception:
+            self.release(connection, discard=True)
+            raise
+        else:
+            self.release(connection)
+
+    def send_messages(self, messages):
+        """
+        Send a list of EmailMessage objects over a single pooled session.
+
+        Returns:
+            int: number of messages sent
+        """
+        messages = list(messages)
+        if not messages:
+            return 0
+        with metrics.span('smtp'), self.connection() as connection:
+            return connection.send_messages(messages) or 0
+
+    def close_idle(self, max_idle=None):
+        """Close idle connections older than `max_idle` seconds (all if 0)"""
+        max_idle = self.idle_timeout if max_idle is None else max_idle
+        now = time.monotonic()
+        with self._lock:
+            expired = [conn for conn, used in self._idle if now - used >= max_idle]
+            self._idle = [(conn, used) for conn, used in self._idle if now - used < max_idle]
+        for conn in expired:
+            self._close(conn)
+        return len(expired)
+
+    def close_all(self):
+        return self.close_idle(0)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide email connection pool"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = EmailConnectionPool()
+    return _pool
+
+
+def send_messages(messages):
+    """Send messages over one pooled connection (bulk-send API)"""
+    return get_pool().send_messages(messages)
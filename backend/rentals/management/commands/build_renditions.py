@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from rentals.images import refresh_renditions, rendition_formats
+from rentals.models import GalleryImage, PricingRule
+
+
+class Command(BaseCommand):
+    help = 'Generate responsive WebP/AVIF renditions for gallery and pricing images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild renditions that are already up to date')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Formats: {', '.join(rendition_formats())}")
+        for model in (GalleryImage, PricingRule):
+            built = 0
+            for instance in model.objects.exclude(image='').exclude(image__isnull=True).iterator():
+                if refresh_renditions(instance, force=options['force']):
+                    built += 1
+            self.stdout.write(self.style.SUCCESS(
+                f"{model._meta.verbose_name_plural}: built renditions for {built} image(s)"
+            ))
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from rentals.gallery_import import find_photos, import_gallery, infer_category
+from rentals.models import GalleryImage
+
+
+class Command(BaseCommand):
+    help = 'Import a directory or zip of photos into the gallery, with renditions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Directory or .zip of photos')
+        parser.add_argument('--workers', type=int, help='Processing processes (defaults to CPU count)')
+        parser.add_argument('--max-width', type=int, default=2560,
+                            help='Downscale stored originals wider than this (0 keeps them as uploaded)')
+        parser.add_argument('--category', choices=[c for c, _ in GalleryImage.CATEGORY_CHOICES],
+                            help='Category for every photo (default: inferred from the filename)')
+        parser.add_argument('--skip-existing', action='store_true',
+                            help='Skip photos whose title is already in the gallery')
+        parser.add_argument('--inactive', action='store_true', help='Import photos hidden from the site')
+        parser.add_argument('--dry-run', action='store_true', help='List photos and inferred categories only')
+
+    def handle(self, *args, **options):
+        try:
+            photos = find_photos(options['path'])
+        except OSError as e:
+            raise CommandError(str(e))
+        if not photos:
+            raise CommandError(f"No photos found in {options['path']}")
+
+        if options['dry_run']:
+            for _, name in photos:
+                category, title = infer_category(name)
+                self.stdout.write(f"{name}: {options['category'] or category} / {title}")
+            return
+
+        def report_error(name, message):
+            self.stderr.write(f"  {name}: {message}")
+
+        result = import_gallery(
+            options['path'],
+            workers=options['workers'],
+            max_width=options['max_width'] or None,
+            category=options['category'],
+            skip_existing=options['skip_existing'],
+            is_active=not options['inactive'],
+            on_error=report_error,
+        )
+
+        seconds = result['seconds']
+        rate = result['imported'] / seconds if seconds else 0
+        megabytes = result['bytes_read'] / (1024 * 1024)
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['imported']} photo(s) in {seconds:.1f}s "
+            f"({rate:.1f} photos/sec, {megabytes / seconds if seconds else 0:.1f} MB/sec); "
+            f"{result['skipped']} skipped, {result['failed']} failed"
+        ))
@@ -0,0 +1,32 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from rentals.mail_pool import get_pool
+from rentals.outbox import process_pending
+
+
+class Command(BaseCommand):
+    help = 'Send queued booking emails (confirmations, receipts) from the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process one batch and exit')
+        parser.add_argument('--batch-size', type=int, default=20, help='Jobs claimed per batch')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep when the outbox is empty')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Outbox worker started')
+        try:
+            while True:
+                close_old_connections()
+                sent, failed = process_pending(options['batch_size'])
+                if sent or failed:
+                    self.stdout.write(f"Sent {sent} email job(s), {failed} failed")
+                if options['once']:
+                    break
+                if not (sent or failed):
+                    get_pool().close_idle()
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Outbox worker stopped')
+        finally:
+            get_pool().close_all()
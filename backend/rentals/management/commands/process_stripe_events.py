@@ -0,0 +1,44 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from rentals.checkout import expire_holds
+from rentals.stripe_events import process_pending
+
+
+class Command(BaseCommand):
+    help = (
+        'Apply recorded Stripe webhook events (payments) to bookings in batches, '
+        'and cancel card checkouts left unpaid past their hold'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process until the queue is empty, then exit')
+        parser.add_argument('--batch-size', type=int, default=100, help='Events claimed per batch')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--hold-check-interval', type=float, default=60.0,
+                            help='Seconds between checks for expired checkout holds')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Stripe event worker started')
+        next_hold_check = 0
+        try:
+            while True:
+                close_old_connections()
+                processed, ignored, failed = process_pending(options['batch_size'])
+                if processed or ignored or failed:
+                    self.stdout.write(f"Applied {processed} event(s), ignored {ignored}, {failed} failed")
+                if processed or ignored:
+                    continue
+
+                # Only once the queue is drained, so a hold whose payment
+                # succeeded is confirmed before it is looked at
+                if time.monotonic() >= next_hold_check:
+                    expired = expire_holds()
+                    if expired:
+                        self.stdout.write(f"Cancelled {expired} unpaid checkout(s)")
+                    next_hold_check = time.monotonic() + options['hold_check_interval']
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stripe event worker stopped')
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from rentals import idempotency
+
+
+class Command(BaseCommand):
+    help = 'Delete stored Idempotency-Key responses older than IDEMPOTENCY_TTL'
+
+    def handle(self, *args, **options):
+        deleted = idempotency.prune_expired()
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} expired idempotency record(s)"))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from rentals import occupancy
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-night occupancy calendar from existing bookings'
+
+    def handle(self, *args, **options):
+        nights = occupancy.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Occupancy calendar rebuilt: {nights} night(s) occupied"))
@@ -0,0 +1,40 @@
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from rentals.invoice_batch import MAX_MERGED_INVOICES, bookings_for_period, render_invoices_to_path
+
+
+class Command(BaseCommand):
+    help = (
+        'Render invoices for a date range into a zip archive or a merged PDF. '
+        'The output file is replaced only when rendering succeeds. A merged PDF '
+        f'is built in memory and limited to {MAX_MERGED_INVOICES} invoices; use zip '
+        'output for larger ranges.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Output file (.zip or .pdf)')
+        parser.add_argument('--from', dest='start', type=date.fromisoformat, help='First check-in date (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='end', type=date.fromisoformat, help='Last check-in date (YYYY-MM-DD)')
+        parser.add_argument('--status', action='append', help='Only bookings with this status (repeatable)')
+        parser.add_argument('--format', dest='output_format', choices=['zip', 'pdf'],
+                            help='Output format (defaults to the output file extension); '
+                                 f'pdf is limited to {MAX_MERGED_INVOICES} invoices')
+        parser.add_argument('--workers', type=int, help='Rendering processes (defaults to CPU count)')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        output_format = options['output_format'] or ('pdf' if output.lower().endswith('.pdf') else 'zip')
+        bookings = bookings_for_period(options['start'], options['end'], options['status'])
+
+        started = time.perf_counter()
+        try:
+            count = render_invoices_to_path(bookings, output, output_format, workers=options['workers'])
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        rate = count / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered {count} invoice(s) to {output} in {elapsed:.1f}s ({rate:.1f}/sec)"
+        ))
@@ -0,0 +1,72 @@
+from datetime import datetime, time as dt_time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rentals.models import StripeEvent
+from rentals import stripe_events
+
+
+class Command(BaseCommand):
+    help = 'Requeue recorded Stripe events (or fetch missed ones from Stripe) for process_stripe_events'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_ids', nargs='*', help='Event ids to requeue (evt_...)')
+        parser.add_argument('--status', help='Only events in these ledger statuses (comma-separated, e.g. failed,ignored)')
+        parser.add_argument('--type', dest='event_types', help='Only these event types (comma-separated)')
+        parser.add_argument('--booking', type=int, help='Only events for this booking id')
+        parser.add_argument('--since', help='Only events received on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--from-stripe', action='store_true',
+                            help='First record events Stripe created since --since that the webhook missed')
+        parser.add_argument('--all', action='store_true', help='Requeue every recorded event')
+        parser.add_argument('--process', action='store_true', help='Apply the requeued events now')
+        parser.add_argument('--dry-run', action='store_true', help='Show how many events match and exit')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = timezone.make_aware(datetime.combine(datetime.strptime(options['since'], '%Y-%m-%d'), dt_time.min))
+            except ValueError:
+                raise CommandError('--since must be YYYY-MM-DD')
+        event_types = options['event_types'].split(',') if options['event_types'] else None
+
+        if options['from_stripe']:
+            if since is None:
+                raise CommandError('--from-stripe needs --since')
+            if options['dry_run']:
+                raise CommandError('--dry-run cannot be combined with --from-stripe')
+            seen, recorded = stripe_events.fetch_from_stripe(since, event_types)
+            self.stdout.write(f"Fetched {seen} event(s) from Stripe, {recorded} new")
+
+        filters = [options['event_ids'], options['status'], event_types, options['booking'], since]
+        if not any(filters) and not options['all']:
+            raise CommandError('Pass event ids or a filter (--status, --type, --booking, --since), or --all')
+
+        events = StripeEvent.objects.all()
+        if options['event_ids']:
+            events = events.filter(event_id__in=options['event_ids'])
+        if options['status']:
+            events = events.filter(status__in=options['status'].split(','))
+        if event_types:
+            events = events.filter(event_type__in=event_types)
+        if options['booking']:
+            events = events.filter(booking_id=options['booking'])
+        if since:
+            events = events.filter(received_at__gte=since)
+
+        if options['dry_run']:
+            self.stdout.write(f"{events.count()} event(s) would be requeued")
+            return
+
+        requeued = stripe_events.requeue(events)
+        self.stdout.write(f"Requeued {requeued} event(s)")
+
+        if options['process']:
+            totals = [0, 0, 0]
+            while True:
+                batch = stripe_events.process_pending()
+                totals = [total + count for total, count in zip(totals, batch)]
+                if not (batch[0] or batch[1]):
+                    break
+            self.stdout.write(self.style.SUCCESS(
+                f"Applied {totals[0]} event(s), ignored {totals[1]}, {totals[2]} failed"
+            ))
@@ -0,0 +1,31 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rentals.models import Booking
+from rentals.invoice_cache import get_invoice_pdf
+
+
+class Command(BaseCommand):
+    help = 'Pre-render and cache invoice PDFs for upcoming stays'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Warm stays checking in within this many days')
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        bookings = Booking.objects.filter(
+            status__in=['pending', 'confirmed'],
+            check_in__gte=today,
+            check_in__lte=today + timedelta(days=options['days']),
+        ).order_by('check_in')
+
+        warmed = failed = 0
+        for booking in bookings.iterator():
+            try:
+                get_invoice_pdf(booking)
+                warmed += 1
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"Booking #{booking.id}: {e}")
+
+        self.stdout.write(self.style.SUCCESS(f"Warmed {warmed} invoice(s), {failed} failed"))
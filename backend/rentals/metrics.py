@@ -0,0 +1,217 @@
+"""
+Per-request timing spans and Prometheus-style histograms.
+
+MetricsMiddleware starts a Recorder for each instrumented request. While it is
+active, span() blocks and the database query wrapper (installed on every
+connection, see signals.py) add their time to it. When the response is ready
+the recorder is written to a Server-Timing header and folded into the
+process-wide histograms that the /metrics view renders:
+
+    rentals_requests_total{view, method, status}
+    rentals_request_duration_seconds{view, method}     (histogram)
+    rentals_request_queries{view}                      (histogram of query count)
+    rentals_span_duration_seconds{view, span}          (histogram: db, pdf, smtp, stripe)
+
+Outside a request (outbox worker, management commands) spans cost one
+context variable lookup and record nothing. Histograms live in process
+memory, so each worker process reports its own series.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# The method label is client-controlled; anything else is reported as 'other'
+# so made-up methods cannot create new series
+METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'})
+
+_recorder = ContextVar('rentals_metrics_recorder', default=None)
+
+
+class Recorder:
+    """Time spent per span name during one request"""
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = {}  # name -> [seconds, count]
+
+    def add(self, name, seconds):
+        entry = self.spans.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total):
+        """Server-Timing header value, e.g. 'db;dur=3.1;desc="4 queries", total;dur=9.8'"""
+        parts = []
+        for name, (seconds, count) in self.spans.items():
+            unit = 'queries' if name == 'db' else 'calls'
+            parts.append(f'{name};dur={seconds * 1000:.1f};desc="{count} {unit}"')
+        parts.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(parts)
+
+
+def start_request():
+    """Begin recording for the current request; returns (recorder, token)"""
+    recorder = Recorder()
+    return recorder, _recorder.set(recorder)
+
+
+def end_request(token):
+    _recorder.reset(token)
+
+
+@contextmanager
+def span(name):
+    """Add the time spent in the block to span `name` of the current request"""
+    recorder = _recorder.get()
+    if recorder is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.add(name, time.perf_counter() - started)
+
+
+def timed(name):
+    """Decorator form of span()"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def query_timer(execute, sql, params, many, context):
+    """Database execute wrapper recording each query as a 'db' span"""
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recorder.add('db', time.perf_counter() - started)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series_items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in series_items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = _labels(self.labelnames, labels, [('le', _number(bound))])
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            lines.append(f'{self.name}_bucket{_labels(self.labelnames, labels, [("le", "+Inf")])} {series[-1]}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {_number(series[-2])}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, labels)} {series[-1]}')
+        return lines
+
+
+REQUESTS = Counter(
+    'rentals_requests_total', 'Requests handled, by view, method and status code',
+    ('view', 'method', 'status'),
+)
+REQUEST_DURATION = Histogram(
+    'rentals_request_duration_seconds', 'Time to produce the response, by view',
+    ('view', 'method'), DURATION_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    'rentals_request_queries', 'Database queries per request, by view',
+    ('view',), QUERY_BUCKETS,
+)
+SPAN_DURATION = Histogram(
+    'rentals_span_duration_seconds', 'Time per request spent in the database, PDF rendering, SMTP and Stripe',
+    ('view', 'span'), DURATION_BUCKETS,
+)
+
+REGISTRY = [REQUESTS, REQUEST_DURATION, REQUEST_QUERIES, SPAN_DURATION]
+
+
+def method_label(method):
+    return method if method in METHODS else 'other'
+
+
+def observe_request(recorder, view, method, status, duration):
+    """Fold a finished request into the histograms"""
+    method = method_label(method)
+    REQUESTS.inc((view, method, str(status)))
+    REQUEST_DURATION.observe((view, method), duration)
+    REQUEST_QUERIES.observe((view,), recorder.spans.get('db', (0.0, 0))[1])
+    for name, (seconds, _) in recorder.spans.items():
+        SPAN_DURATION.observe((view, name), seconds)
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,185 @@
+"""
+Middleware for the rentals app
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from . import idempotency, metrics, static_assets
+
+
+class MetricsMiddleware:
+    """
+    Time requests under METRICS_PATH_PREFIXES and record them in the
+    metrics histograms, adding a Server-Timing header when
+    METRICS_SERVER_TIMING is on. Works under WSGI and ASGI.
+
+    Streaming responses are timed until the response object is returned,
+    not until the last chunk is sent.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _instrumented(self, request):
+        return settings.METRICS_ENABLED and request.path.startswith(tuple(settings.METRICS_PATH_PREFIXES))
+
+    def _finish(self, request, response, recorder):
+        duration = recorder.elapsed()
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        metrics.observe_request(recorder, view, request.method, response.status_code, duration)
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = recorder.server_timing(duration)
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._instrumented(request):
+            return self.get_response(request)
+
+        recorder, token = metrics.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        return self._finish(request, response, recorder)
+
+    async def __acall__(self, request):
+        if not self._instrumented(request):
+            return await self.get_response(request)
+
+        recorder, token = metrics.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        return self._finish(request, response, recorder)
+
+
+class IdempotencyMiddleware:
+    """
+    Replay the stored response for POST requests retried with the same
+    Idempotency-Key header instead of running the view again (see
+    idempotency.py). Works under WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not idempotency.applies(request):
+            return self.get_response(request)
+
+        record, response = idempotency.begin(request)
+        if response is not None:
+            return response
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            idempotency.release(record)
+            raise
+        return idempotency.finish(record, response)
+
+    async def __acall__(self, request):
+        if not idempotency.applies(request):
+            return await self.get_response(request)
+
+        record, response = await sync_to_async(idempotency.begin)(request)
+        if response is not None:
+            return response
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            await sync_to_async(idempotency.release)(record)
+            raise
+        return await sync_to_async(idempotency.finish)(record, response)
+
+
+class PrecompressedStaticMiddleware:
+    """
+    Serve collected static files from STATIC_ROOT, picking the pre-built
+    Brotli or gzip variant the client accepts (see static_assets.py).
+
+    Fingerprinted names are sent with a one year immutable Cache-Control,
+    others with STATIC_MAX_AGE. Requests for files that were not collected
+    fall through to the rest of the stack. Under ASGI the file is read in a
+    worker thread and sent in one piece (the site's assets are small).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL if settings.STATIC_URL.startswith('/') else '/' + settings.STATIC_URL
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _lookup(self, request):
+        if request.method not in ('GET', 'HEAD') or not request.path.startswith(self.prefix):
+            return None
+        return static_assets.find(request.path[len(self.prefix):])
+
+    def _variant(self, request, static_file):
+        return static_assets.choose_variant(static_file, request.headers.get('Accept-Encoding', ''))
+
+    def _respond(self, request, static_file, variant, content=None):
+        """
+        Response for a found file; `content` is the variant's bytes (when
+        None the file is streamed)
+        """
+        encoding, path, size, mtime = variant
+        etag = quote_etag(f"{int(mtime):x}-{size:x}{'-' + encoding if encoding else ''}")
+        response = get_conditional_response(request, etag=etag, last_modified=int(mtime))
+        if response is None:
+            if request.method == 'HEAD':
+                response = HttpResponse()
+            elif content is not None:
+                response = HttpResponse(content)
+            else:
+                response = FileResponse(open(path, 'rb'))
+            response['Content-Length'] = size
+        response['Content-Type'] = static_file.content_type
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(mtime)
+        if encoding:
+            response['Content-Encoding'] = encoding
+        if len(static_file.variants) > 1:
+            patch_vary_headers(response, ['Accept-Encoding'])
+        response['Cache-Control'] = (
+            static_assets.IMMUTABLE_CACHE_CONTROL if static_file.immutable
+            else f'public, max-age={settings.STATIC_MAX_AGE}'
+        )
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        static_file = self._lookup(request)
+        if static_file is None:
+            return self.get_response(request)
+        return self._respond(request, static_file, self._variant(request, static_file))
+
+    async def __acall__(self, request):
+        static_file = await sync_to_async(self._lookup)(request)
+        if static_file is None:
+            return await self.get_response(request)
+
+        variant = self._variant(request, static_file)
+        content = b''
+        if request.method == 'GET':
+            with open(variant[1], 'rb') as f:
+                content = await sync_to_async(f.read)()
+        return self._respond(request, static_file, variant, content)
@@ -0,0 +1,48 @@
+# Generated by Django 5.0 on 2026-10-16 23:39
+
+import django.db.models.deletion
+from datetime import timedelta
+from django.db import migrations, models
+
+
+def build_occupancy(apps, schema_editor):
+    Booking = apps.get_model('rentals', 'Booking')
+    OccupiedNight = apps.get_model('rentals', 'OccupiedNight')
+    active = Booking.objects.filter(status__in=['pending', 'confirmed']).order_by('created_at', 'id')
+    for booking in active.iterator():
+        nights = (booking.check_out - booking.check_in).days
+        OccupiedNight.objects.bulk_create(
+            [OccupiedNight(night=booking.check_in + timedelta(days=n), booking_id=booking.id) for n in range(nights)],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rentals', '0005_emailjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OccupiedNight',
+            fields=[
+                ('night', models.DateField(primary_key=True, serialize=False)),
+            ],
+            options={
+                'verbose_name': 'Occupied Night',
+                'verbose_name_plural': 'Occupied Nights',
+                'ordering': ['night'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['status', 'check_in', 'check_out'], name='booking_status_dates_idx'),
+        ),
+        migrations.AddField(
+            model_name='occupiednight',
+            name='booking',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occupied_nights', to='rentals.booking'),
+        ),
+        migrations.RunPython(build_occupancy, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0 on 2026-10-16 23:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rentals', '0006_occupancy_calendar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='galleryimage',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Resized WebP/AVIF copies of the image (see images.py)'),
+        ),
+        migrations.AddField(
+            model_name='pricingrule',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Resized WebP/AVIF copies of the image (see images.py)'),
+        ),
+    ]
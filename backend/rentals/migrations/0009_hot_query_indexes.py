@@ -0,0 +1,21 @@
+# Generated by Django 5.0 on 2026-10-17 00:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rentals', '0008_booking_created_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='galleryimage',
+            index=models.Index(fields=['is_active', 'category', 'order'], name='gallery_active_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['is_approved', 'is_featured', '-created_at'], name='review_approved_idx'),
+        ),
+    ]
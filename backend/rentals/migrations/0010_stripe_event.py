@@ -0,0 +1,37 @@
+# Generated by Django 5.0 on 2026-10-17 00:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rentals', '0009_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StripeEvent',
+            fields=[
+                ('event_id', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('event_type', models.CharField(max_length=100)),
+                ('booking_id', models.PositiveIntegerField(blank=True, help_text="From the object's metadata.booking_id", null=True)),
+                ('payload', models.JSONField(default=dict)),
+                ('livemode', models.BooleanField(default=False)),
+                ('stripe_created', models.DateTimeField(blank=True, help_text='When Stripe created the event', null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('processed', 'Processed'), ('ignored', 'Ignored'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('claim', models.CharField(blank=True, help_text='Batch that is processing the event', max_length=32)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Stripe Event',
+                'verbose_name_plural': 'Stripe Events',
+                'ordering': ['received_at'],
+                'indexes': [models.Index(fields=['status', 'received_at'], name='stripe_event_status_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0 on 2026-10-17 00:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rentals', '0011_idempotency_record'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='hold_expires_at',
+            field=models.DateTimeField(blank=True, help_text='Unpaid card checkouts are cancelled after this time', null=True),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='payment_intent_id',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
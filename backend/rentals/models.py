@@ -1,6 +1,7 @@
 from django.db import models
 from django.core.validators import MinValueValidator
 from django.utils import timezone
+from . import caching
 
 
 class PricingRule(models.Model):
@@ -63,6 +64,7 @@ class PricingRule(models.Model):
     order = models.IntegerField(default=0, help_text="Controls ordering of pricing cards")
     is_featured = models.BooleanField(default=False, help_text="Highlight this pricing rule on the site")
     image = models.ImageField(upload_to='pricing/', null=True, blank=True, help_text="Optional image for the pricing card")
+    renditions = models.JSONField(default=dict, blank=True, editable=False, help_text="Resized WebP/AVIF copies of the image (see images.py)")
     
     # Display customization
     display_label = models.CharField(max_length=50, default='Per Night', help_text="e.g., 'Nightly Rate', 'Weekly Rate', 'Monthly Rate'")
@@ -118,6 +120,7 @@ class GalleryImage(models.Model):
     
     title = models.CharField(max_length=200)
     image = models.ImageField(upload_to='gallery/%Y/%m/')
+    renditions = models.JSONField(default=dict, blank=True, editable=False, help_text="Resized WebP/AVIF copies of the image (see images.py)")
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES, default='other')
     description = models.TextField(blank=True)
     alt_text = models.CharField(max_length=200, help_text="Alt text for accessibility")
@@ -134,6 +137,10 @@ class GalleryImage(models.Model):
         ordering = ['order', '-uploaded_at']
         verbose_name = 'Gallery Image'
         verbose_name_plural = 'Gallery Images'
+        indexes = [
+            # Public gallery: active images, optionally by category, in display order
+            models.Index(fields=['is_active', 'category', 'order'], name='gallery_active_category_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} ({self.category})"
@@ -208,6 +215,13 @@ class Booking(models.Model):
     payment_method = models.CharField(max_length=20, choices=PAYMENT_METHOD_CHOICES, null=True, blank=True)
     special_requests = models.TextField(blank=True)
     
+    # Card checkout (see checkout.py)
+    payment_intent_id = models.CharField(max_length=255, blank=True)
+    hold_expires_at = models.DateTimeField(
+        null=True, blank=True,
+        help_text="Unpaid card checkouts are cancelled after this time"
+    )
+    
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -216,6 +230,10 @@ class Booking(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Booking'
         verbose_name_plural = 'Bookings'
+        indexes = [
+            models.Index(fields=['status', 'check_in', 'check_out'], name='booking_status_dates_idx'),
+            models.Index(fields=['-created_at', '-id'], name='booking_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.first_name} {self.last_name} - {self.check_in} to {self.check_out}"
@@ -240,6 +258,23 @@ class Booking(models.Model):
         return f"{self.first_name} {self.last_name}"
 
 
+class OccupiedNight(models.Model):
+    """
+    Materialized occupancy calendar: one row per night held by a pending or
+    confirmed booking, kept in sync by the Booking signals (see occupancy.py)
+    """
+    night = models.DateField(primary_key=True)
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='occupied_nights')
+    
+    class Meta:
+        ordering = ['night']
+        verbose_name = 'Occupied Night'
+        verbose_name_plural = 'Occupied Nights'
+    
+    def __str__(self):
+        return f"{self.night} (booking #{self.booking_id})"
+
+
 class Review(models.Model):
     """
     Guest reviews
@@ -263,6 +298,10 @@ class Review(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Review'
         verbose_name_plural = 'Reviews'
+        indexes = [
+            # Public reviews: approved (optionally featured), newest first
+            models.Index(fields=['is_approved', 'is_featured', '-created_at'], name='review_approved_idx'),
+        ]
     
     def __str__(self):
         return f"{self.guest_name} - {self.rating} stars"
@@ -313,3 +352,145 @@ class SiteSettings(models.Model):
     def load(cls):
         obj, created = cls.objects.get_or_create(pk=1)
         return obj
+    
+    @classmethod
+    def cached(cls):
+        """
+        The settings row, memoized in process and in the shared cache.
+        
+        Refreshed in every process when the settings are saved (see
+        signals.py). The instance is shared, so treat it as read-only and use
+        load() to edit.
+        """
+        def build():
+            obj = cls.objects.filter(pk=1).first()
+            if obj is None:
+                # bulk_create skips post_save, which would retire the value
+                # being built; reloading also converts defaults like "15:00"
+                cls.objects.bulk_create([cls(pk=1)], ignore_conflicts=True)
+                obj = cls.objects.get(pk=1)
+            return obj
+        return caching.get_or_build(caching.model_namespace(cls), 'instance', build)
+
+
+class EmailJob(models.Model):
+    """
+    Outbound email queued for the background worker (see `process_outbox`)
+    """
+    KIND_CHOICES = [
+        ('booking_confirmation', 'Booking Confirmation'),
+        ('payment_receipt', 'Payment Receipt'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='email_jobs')
+    payload = models.JSONField(default=dict, blank=True)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now, help_text="Not picked up by the worker before this time")
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['run_after', 'id']
+        verbose_name = 'Email Job'
+        verbose_name_plural = 'Email Jobs'
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} for booking #{self.booking_id} ({self.status})"
+
+
+class StripeEvent(models.Model):
+    """
+    Ledger of Stripe webhook events, keyed by Stripe's event id.
+
+    The webhook only verifies and records events; `process_stripe_events`
+    applies them to bookings in batches (see stripe_events.py).
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('processed', 'Processed'),
+        ('ignored', 'Ignored'),
+        ('failed', 'Failed'),
+    ]
+
+    event_id = models.CharField(max_length=255, primary_key=True)
+    event_type = models.CharField(max_length=100)
+    booking_id = models.PositiveIntegerField(null=True, blank=True, help_text="From the object's metadata.booking_id")
+    payload = models.JSONField(default=dict)
+    livemode = models.BooleanField(default=False)
+    stripe_created = models.DateTimeField(null=True, blank=True, help_text="When Stripe created the event")
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    claim = models.CharField(max_length=32, blank=True, help_text="Batch that is processing the event")
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    received_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['received_at']
+        verbose_name = 'Stripe Event'
+        verbose_name_plural = 'Stripe Events'
+        indexes = [
+            models.Index(fields=['status', 'received_at'], name='stripe_event_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} {self.event_id} ({self.status})"
+
+
+class IdempotencyRecord(models.Model):
+    """
+    Stored outcome of a write request sent with an Idempotency-Key header.
+
+    Retries with the same key get the stored response instead of running the
+    view again (see idempotency.py). Rows expire after IDEMPOTENCY_TTL.
+    """
+    STATUS_CHOICES = [
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+    ]
+
+    key = models.CharField(max_length=255)
+    path = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64, help_text="SHA-256 of the request")
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='processing')
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_headers = models.JSONField(default=dict)
+    response_body = models.BinaryField(default=b'')
+
+    locked_at = models.DateTimeField(help_text="When the current request claimed the key")
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Idempotency Record'
+        verbose_name_plural = 'Idempotency Records'
+        constraints = [
+            models.UniqueConstraint(fields=['key', 'path'], name='idempotency_key_path_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='idempotency_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.path} {self.key} ({self.status})"
@@ -0,0 +1,189 @@
+"""
+Per-night occupancy calendar for availability checks.
+
+OccupiedNight holds one row per night (primary key = date) taken by a pending
+or confirmed booking. Availability becomes a primary-key range scan over at
+most a few dozen rows, however large the Booking table grows.
+
+The table is kept in sync by the Booking post_save/post_delete signals. Code
+that changes booking status with QuerySet.update() bypasses those signals and
+must call resync_bookings() afterwards.
+"""
+import time
+from datetime import timedelta
+from django.core.cache import cache
+from django.db import transaction
+from .models import Booking, OccupiedNight
+
+# Booking statuses that hold their nights
+BLOCKING_STATUSES = ('pending', 'confirmed')
+
+CHANGED_AT_CACHE_KEY = 'rentals:occupancy:changed_at'
+
+
+class DatesUnavailable(Exception):
+    """Raised when a stay includes nights already held by another booking"""
+
+
+def stay_nights(check_in, check_out):
+    """Dates of each night from check_in up to (not including) check_out"""
+    return [check_in + timedelta(days=n) for n in range((check_out - check_in).days)]
+
+
+def _claim(booking_id, nights):
+    """Insert nights for a booking, leaving nights already held by others alone"""
+    OccupiedNight.objects.bulk_create(
+        [OccupiedNight(night=night, booking_id=booking_id) for night in nights],
+        ignore_conflicts=True,
+    )
+
+
+def _rehome(nights, exclude_booking_id=None):
+    """
+    Hand freed nights to any other active booking that covers them.
+
+    Only matters for bookings that overlapped before the calendar existed
+    (or were forced through the admin); normally nothing matches.
+    """
+    nights = sorted(nights)
+    if not nights:
+        return
+    others = Booking.objects.filter(
+        status__in=BLOCKING_STATUSES,
+        check_in__lte=nights[-1],
+        check_out__gt=nights[0],
+    ).exclude(id=exclude_booking_id).order_by('created_at', 'id')
+
+    freed = set(nights)
+    for other in others:
+        covered = [night for night in stay_nights(other.check_in, other.check_out) if night in freed]
+        if covered:
+            _claim(other.id, covered)
+            freed.difference_update(covered)
+        if not freed:
+            break
+
+
+def mark_changed():
+    """Record when the calendar last changed (served as Last-Modified)"""
+    cache.set(CHANGED_AT_CACHE_KEY, time.time(), None)
+
+
+def last_changed():
+    """Unix timestamp of the last calendar change known to the cache"""
+    changed_at = cache.get(CHANGED_AT_CACHE_KEY)
+    if changed_at is None:
+        # Unknown (e.g. cache cleared): assume it changed now
+        changed_at = time.time()
+        cache.add(CHANGED_AT_CACHE_KEY, changed_at, None)
+    return changed_at
+
+
+def sync_booking(booking):
+    """Bring the calendar in line with a booking's dates and status"""
+    if booking.status in BLOCKING_STATUSES and booking.check_in and booking.check_out:
+        wanted = set(stay_nights(booking.check_in, booking.check_out))
+    else:
+        wanted = set()
+
+    with transaction.atomic():
+        held = set(OccupiedNight.objects.filter(booking=booking).values_list('night', flat=True))
+        released = held - wanted
+        if released:
+            OccupiedNight.objects.filter(booking=booking, night__in=released).delete()
+            _rehome(released, exclude_booking_id=booking.id)
+        if wanted - held:
+            _claim(booking.id, wanted - held)
+    if released or wanted - held:
+        mark_changed()
+
+
+def ensure_reserved(booking):
+    """
+    Verify that a just-saved booking holds every night of its stay.
+
+    Call inside the transaction that created the booking: the post_save signal
+    has already tried to claim the nights, and the night primary key lets only
+    one of several concurrent transactions hold each night. If any night went
+    to another booking, raise DatesUnavailable so the caller rolls back.
+    """
+    if booking.status not in BLOCKING_STATUSES:
+        return
+    held = OccupiedNight.objects.filter(booking=booking).count()
+    if held < booking.num_nights:
+        raise DatesUnavailable(
+            f"{booking.check_in} to {booking.check_out} overlaps an existing booking"
+        )
+
+
+def release_booking(booking):
+    """Free a deleted booking's nights (its rows are removed by the FK cascade)"""
+    if booking.check_in and booking.check_out:
+        _rehome(stay_nights(booking.check_in, booking.check_out), exclude_booking_id=booking.id)
+    mark_changed()
+
+
+def resync_bookings(bookings):
+    """Re-sync bookings whose status was changed without signals"""
+    for booking in bookings:
+        sync_booking(booking)
+
+
+def rebuild():
+    """
+    Rebuild the whole calendar from the Booking table.
+
+    Returns:
+        int: number of occupied nights
+    """
+    with transaction.atomic():
+        OccupiedNight.objects.all().delete()
+        active = Booking.objects.filter(status__in=BLOCKING_STATUSES).order_by('created_at', 'id')
+        for booking in active.iterator():
+            _claim(booking.id, stay_nights(booking.check_in, booking.check_out))
+    mark_changed()
+    return OccupiedNight.objects.count()
+
+
+def overlapping_booking_ids(check_in, check_out):
+    """IDs of bookings holding any night in [check_in, check_out)"""
+    return list(
+        OccupiedNight.objects.filter(night__gte=check_in, night__lt=check_out)
+        .order_by()
+        .values_list('booking_id', flat=True)
+        .distinct()
+    )
+
+
+async def aoverlapping_booking_ids(check_in, check_out):
+    """Async version of overlapping_booking_ids()"""
+    return [
+        booking_id async for booking_id in
+        OccupiedNight.objects.filter(night__gte=check_in, night__lt=check_out)
+        .order_by()
+        .values_list('booking_id', flat=True)
+        .distinct()
+    ]
+
+
+def is_available(check_in, check_out):
+    return not OccupiedNight.objects.filter(night__gte=check_in, night__lt=check_out).exists()
+
+
+def blocked_runs(start, end):
+    """
+    Run-length encoded blocked nights in [start, end).
+
+    Returns:
+        list: [[first_night, number_of_nights], ...] in date order
+    """
+    nights = OccupiedNight.objects.filter(night__gte=start, night__lt=end).values_list('night', flat=True)
+    runs = []
+    previous = None
+    for night in nights:
+        if previous is not None and night - previous == timedelta(days=1):
+            runs[-1][1] += 1
+        else:
+            runs.append([night, 1])
+        previous = night
+    return runs
@@ -0,0 +1,145 @@
+"""
+Database-backed outbox for booking emails.
+
+Views enqueue EmailJob rows and return immediately; the `process_outbox`
+management command renders invoices and sends the emails, retrying failed
+jobs with exponential backoff.
+"""
+import logging
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from .models import EmailJob
+from .email_service import send_booking_confirmation_email, send_payment_receipt_email
+
+logger = logging.getLogger(__name__)
+
+# Jobs stuck in 'processing' longer than this are assumed to belong to a dead worker
+STALE_AFTER = timedelta(minutes=10)
+
+
+class EmailJobError(Exception):
+    """Raised when a job handler reports that the email was not sent"""
+
+
+def _send_booking_confirmation(job):
+    return send_booking_confirmation_email(job.booking)
+
+
+def _send_payment_receipt(job):
+    return send_payment_receipt_email(job.booking, job.payload or None)
+
+
+HANDLERS = {
+    'booking_confirmation': _send_booking_confirmation,
+    'payment_receipt': _send_payment_receipt,
+}
+
+
+def enqueue(kind, booking, payload=None):
+    """Queue an email job for the worker and return it"""
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown email job kind: {kind}")
+    return EmailJob.objects.create(
+        kind=kind,
+        booking=booking,
+        payload=payload or {},
+        max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+    )
+
+
+def enqueue_booking_emails(booking):
+    """
+    Queue the confirmation email (and the payment receipt for confirmed
+    debit card bookings) for a new booking, or for a card checkout whose
+    payment just succeeded.
+
+    Returns:
+        EmailJob: the booking confirmation job
+    """
+    job = enqueue('booking_confirmation', booking)
+
+    if booking.payment_method == 'debitcard' and booking.status == 'confirmed':
+        enqueue('payment_receipt', booking, {
+            'payment_id': booking.payment_intent_id or f"ch_{booking.id:06d}",
+            'timestamp': datetime.now().strftime('%B %d, %Y at %I:%M %p'),
+        })
+
+    return job
+
+
+def retry_delay(attempts):
+    """Exponential backoff: base, 2*base, 4*base, ... capped at one hour"""
+    return timedelta(seconds=min(settings.OUTBOX_RETRY_BACKOFF * 2 ** (attempts - 1), 3600))
+
+
+def claim_jobs(limit=20):
+    """
+    Claim up to `limit` due jobs for this worker.
+
+    Each job is claimed with a conditional UPDATE so that several workers can
+    poll the same table without sending an email twice.
+    """
+    now = timezone.now()
+    due = (
+        Q(status='pending', run_after__lte=now)
+        | Q(status='processing', updated_at__lt=now - STALE_AFTER)
+    )
+    candidates = list(EmailJob.objects.filter(due).values_list('id', flat=True)[:limit])
+
+    claimed = []
+    for job_id in candidates:
+        if EmailJob.objects.filter(due, id=job_id).update(status='processing', updated_at=timezone.now()):
+            claimed.append(job_id)
+
+    return list(EmailJob.objects.filter(id__in=claimed).select_related('booking'))
+
+
+def run_job(job):
+    """
+    Send a single claimed job, recording success or scheduling a retry.
+
+    Returns:
+        bool: True if the email was sent
+    """
+    handler = HANDLERS[job.kind]
+    job.attempts += 1
+
+    try:
+        if not handler(job):
+            raise EmailJobError(f"{job.kind} handler reported failure")
+    except Exception as e:
+        job.last_error = str(e)
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+            logger.error("Email job %s failed permanently after %s attempts", job.id, job.attempts)
+        else:
+            job.status = 'pending'
+            job.run_after = timezone.now() + retry_delay(job.attempts)
+            logger.warning("Email job %s failed (attempt %s), retrying at %s", job.id, job.attempts, job.run_after)
+        job.save(update_fields=['status', 'attempts', 'run_after', 'last_error', 'updated_at'])
+        return False
+
+    job.status = 'sent'
+    job.sent_at = timezone.now()
+    job.last_error = ''
+    job.save(update_fields=['status', 'attempts', 'sent_at', 'last_error', 'updated_at'])
+    logger.info("Email job %s (%s) sent for booking id %s", job.id, job.kind, job.booking_id)
+    return True
+
+
+def process_pending(limit=20):
+    """
+    Claim and run one batch of due jobs.
+
+    Returns:
+        tuple: (sent, failed) counts for the batch
+    """
+    sent = failed = 0
+    for job in claim_jobs(limit):
+        if run_job(job):
+            sent += 1
+        else:
+            failed += 1
+    return sent, failed
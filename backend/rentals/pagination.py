@@ -0,0 +1,19 @@
+"""
+Pagination classes for the rentals API
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class BookingCursorPagination(CursorPagination):
+    """
+    Keyset pagination for bookings, newest first.
+
+    Each page is an indexed range scan from the cursor position on
+    (created_at, id) instead of COUNT(*) plus an OFFSET scan, so paging stays
+    constant-cost however long the booking history gets. Responses carry
+    `next`/`previous` cursor URLs and no `count`.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 500
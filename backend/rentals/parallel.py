@@ -0,0 +1,66 @@
+"""
+Ordered process-pool map for CPU-bound batch jobs (invoice reprints, gallery
+imports).
+
+Results come back in input order, and only a bounded window of items is in
+flight at once, so memory use does not grow with the number of items.
+"""
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Database connections a forked worker inherited from its parent. They share
+# the parent's sockets, so the worker never uses or closes them; they are only
+# kept referenced, since a finalizer closing one would end the parent's session
+_inherited_connections = []
+
+
+def _init_worker():
+    """
+    Prepare a worker process: configure Django in spawned workers, detach
+    the database connections forked workers inherit (a worker that needs the
+    database opens its own).
+    """
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+        return
+
+    from django.db import connections
+    for conn in connections.all(initialized_only=True):
+        if conn.connection is not None:
+            _inherited_connections.append(conn.connection)
+            conn.connection = None
+
+
+def iter_ordered(fn, items, workers=None, window=None):
+    """
+    Call `fn(item)` in worker processes, yielding (item, result) in order.
+
+    Safe to call inside transaction.atomic(): the caller's connections are
+    left alone (see _init_worker).
+
+    Args:
+        fn: picklable module-level callable (or functools.partial of one)
+        items: iterable of picklable items; a lazy iterable (e.g. a queryset
+            iterator) is consumed only as results are taken
+        workers: number of processes (defaults to the CPU count)
+        window: maximum items submitted but not yet yielded (defaults to
+            twice the number of workers)
+
+    Exceptions raised by `fn` propagate when their item's result is taken.
+    """
+    workers = workers or os.cpu_count() or 1
+    window = window or workers * 2
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        in_flight = deque()
+        for item in items:
+            in_flight.append((item, executor.submit(fn, item)))
+            if len(in_flight) >= window:
+                done, future = in_flight.popleft()
+                yield done, future.result()
+        while in_flight:
+            done, future = in_flight.popleft()
+            yield done, future.result()
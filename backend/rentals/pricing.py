@@ -0,0 +1,245 @@
+"""
+Batch pricing for quote grids and seasonal stays.
+
+PricingRule.calculate_total prices one (rule, nights) pair per call. The
+booking page wants a total for every rule and every stay length, so PriceGrid
+loads each rule's rates into flat float arrays once and prices a whole
+column of stay lengths per rule in a single pass.
+
+Totals are computed with the same float operations, in the same order, as
+calculate_total and rounded with round(x, 2), so every grid cell equals the
+scalar result exactly.
+
+RuleIndex splits a stay across seasonal rules (those with both start_date and
+end_date) without touching the database per night; see price_stay().
+"""
+from array import array
+from bisect import bisect_right
+from datetime import timedelta
+from .models import PricingRule
+from . import caching
+
+# Stay lengths at which the weekly and monthly discounts start
+WEEKLY_NIGHTS = 7
+MONTHLY_NIGHTS = 30
+
+# Longest stay priced by a quote grid
+MAX_GRID_NIGHTS = 365
+
+
+class PriceGrid:
+    """
+    Rates of several pricing rules laid out column by column.
+
+    Args:
+        rules: iterable of PricingRule instances
+    """
+
+    def __init__(self, rules):
+        rules = list(rules)
+        self.rule_ids = [rule.id for rule in rules]
+        self.base = array('d', (float(rule.base_price_per_night) for rule in rules))
+        self.weekly = array('d', (float(rule.weekly_discount_percent) / 100 for rule in rules))
+        self.monthly = array('d', (float(rule.monthly_discount_percent) / 100 for rule in rules))
+        self.cleaning = array('d', (float(rule.cleaning_fee) for rule in rules))
+        self.service = array('d', (float(rule.service_fee_percent) / 100 for rule in rules))
+
+    def __len__(self):
+        return len(self.rule_ids)
+
+    def totals(self, nights):
+        """
+        Price every stay length for every rule.
+
+        Args:
+            nights: sequence of stay lengths (ints)
+
+        Returns:
+            list: one list of totals per rule, in rule order, each aligned with `nights`
+        """
+        nights = array('l', nights)
+        # The discount tier only depends on the stay length, so split the
+        # column once and reuse the split for every rule
+        weekly = [i for i, n in enumerate(nights) if WEEKLY_NIGHTS <= n < MONTHLY_NIGHTS]
+        monthly = [i for i, n in enumerate(nights) if n >= MONTHLY_NIGHTS]
+
+        grid = []
+        for r in range(len(self)):
+            base = self.base[r]
+            base_totals = [base * n for n in nights]
+            for tier, rate in ((weekly, self.weekly[r]), (monthly, self.monthly[r])):
+                for i in tier:
+                    base_totals[i] -= base_totals[i] * rate
+            cleaning, service = self.cleaning[r], self.service[r]
+            grid.append([round(b + cleaning + b * service, 2) for b in base_totals])
+        return grid
+
+    def table(self, nights):
+        """
+        Returns:
+            dict: {rule_id: [total, ...]} aligned with `nights`
+        """
+        return dict(zip(self.rule_ids, self.totals(nights)))
+
+
+def quote_grid(rules, nights):
+    """Convenience wrapper: {rule_id: [total, ...]} for `rules` x `nights`"""
+    return PriceGrid(rules).table(nights)
+
+
+class PricingUnavailable(Exception):
+    """Raised when some night of a stay is not covered by any pricing rule"""
+
+
+class RuleIndex:
+    """
+    Interval index over the active pricing rules.
+
+    Seasonal rules cover start_date through end_date inclusive; rules without
+    both dates are year-round and only price nights no seasonal rule covers.
+    The season boundaries are flattened into sorted breakpoints, each mapped
+    to the rule that wins from that date until the next breakpoint. Where
+    seasons overlap the shortest one wins (then lower `order`, then id).
+
+    Args:
+        rules: iterable of PricingRule instances
+    """
+
+    def __init__(self, rules):
+        rules = list(rules)
+        self.year_round = sorted(
+            (rule for rule in rules if not (rule.start_date and rule.end_date)),
+            key=lambda rule: (rule.order, rule.id),
+        )
+        seasons = [
+            (rule.start_date, rule.end_date + timedelta(days=1), rule)
+            for rule in rules
+            if rule.start_date and rule.end_date and rule.start_date <= rule.end_date
+        ]
+
+        self.breakpoints = sorted({day for start, end, _ in seasons for day in (start, end)})
+        self.winners = []
+        for day in self.breakpoints:
+            covering = [
+                (end - start, rule.order, rule.id, rule)
+                for start, end, rule in seasons if start <= day < end
+            ]
+            self.winners.append(min(covering, key=lambda c: c[:3])[3] if covering else None)
+
+    def runs(self, check_in, check_out, default_rule=None):
+        """
+        Split the nights [check_in, check_out) into runs priced by one rule.
+
+        Args:
+            default_rule: rule for nights outside every season (defaults to
+                the first year-round rule)
+
+        Returns:
+            list: [(rule, first_night, nights), ...] in date order
+
+        Raises:
+            PricingUnavailable: if a night has no rule
+        """
+        fallback = default_rule or (self.year_round[0] if self.year_round else None)
+        runs = []
+        night = check_in
+        i = bisect_right(self.breakpoints, night) - 1
+        while night < check_out:
+            # The segment containing `night` ends at the next breakpoint
+            segment_end = self.breakpoints[i + 1] if i + 1 < len(self.breakpoints) else check_out
+            rule = (self.winners[i] if i >= 0 else None) or fallback
+            if rule is None:
+                raise PricingUnavailable(f"No pricing rule covers {night}")
+            nights = (min(segment_end, check_out) - night).days
+            if runs and runs[-1][0].id == rule.id:
+                runs[-1] = (rule, runs[-1][1], runs[-1][2] + nights)
+            else:
+                runs.append((rule, night, nights))
+            night += timedelta(days=nights)
+            i += 1
+        return runs
+
+
+# Cache namespace for everything derived from the active pricing rules
+CATALOG = 'pricing'
+
+
+def rules_changed():
+    """Invalidate the cached rules in every process (called by PricingRule signals)"""
+    caching.bump_version(CATALOG)
+
+
+def get_active_rules():
+    """Active PricingRule instances, cached until a rule is saved or deleted"""
+    return caching.get_or_build(
+        CATALOG, 'rules', lambda: list(PricingRule.objects.filter(is_active=True))
+    )
+
+
+def get_rule(rule_id):
+    """Active rule with the given id (int or numeric string), or None"""
+    for rule in get_active_rules():
+        if str(rule.id) == str(rule_id):
+            return rule
+    return None
+
+
+def get_rule_index():
+    """RuleIndex over the active rules, rebuilt after any rule changes"""
+    return caching.get_or_build(CATALOG, 'index', lambda: RuleIndex(get_active_rules()))
+
+
+def price_stay(check_in, check_out, default_rule=None):
+    """
+    Price a stay night by night across the seasonal rules covering it.
+
+    The weekly/monthly discount tier comes from the length of the whole stay
+    and is applied to each run at that run's rule's rate, as is the service
+    fee. The cleaning fee is charged once, from the rule of the first night.
+    A stay inside a single rule costs exactly PricingRule.calculate_total.
+
+    Args:
+        default_rule: rule for nights outside every season
+
+    Returns:
+        dict: total_price, num_nights, cleaning_fee, service_fee and the
+        per-rule `segments` of the stay
+
+    Raises:
+        PricingUnavailable: if a night has no rule
+    """
+    num_nights = (check_out - check_in).days
+    if num_nights < 1:
+        raise ValueError("check_out must be after check_in")
+
+    runs = get_rule_index().runs(check_in, check_out, default_rule)
+    subtotal = 0.0
+    service_fee = 0.0
+    segments = []
+    for rule, first_night, nights in runs:
+        base_total = float(rule.base_price_per_night) * nights
+        if num_nights >= MONTHLY_NIGHTS:
+            base_total -= base_total * (float(rule.monthly_discount_percent) / 100)
+        elif num_nights >= WEEKLY_NIGHTS:
+            base_total -= base_total * (float(rule.weekly_discount_percent) / 100)
+        subtotal += base_total
+        service_fee += base_total * (float(rule.service_fee_percent) / 100)
+        segments.append({
+            'pricing_rule_id': rule.id,
+            'name': rule.name,
+            'season': rule.season,
+            'first_night': first_night,
+            'nights': nights,
+            'nightly_rate': float(rule.base_price_per_night),
+            'subtotal': round(base_total, 2),
+        })
+
+    cleaning_fee = float(runs[0][0].cleaning_fee)
+    total = subtotal + cleaning_fee + service_fee
+    return {
+        'total_price': round(total, 2),
+        'num_nights': num_nights,
+        'cleaning_fee': cleaning_fee,
+        'service_fee': round(service_fee, 2),
+        'segments': segments,
+    }
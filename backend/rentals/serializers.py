@@ -3,10 +3,42 @@ from .models import (
     PricingRule, GalleryImage, Amenity, 
     Booking, Review, SiteSettings
 )
+from .images import srcset_for
 
 
-class PricingRuleSerializer(serializers.ModelSerializer):
+class SparseFieldsetMixin:
+    """
+    Limit output to the field names in context['fields'].
+    
+    The views fill that in from `?fields=a,b` on GET requests
+    (SparseFieldsetViewMixin); unknown names are ignored.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = set(self.context.get('fields') or ()) & set(self.fields)
+        # Only unknown names (or none at all): leave the output unfiltered
+        if requested:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
+
+class SrcsetMixin:
+    """Adds `srcset` built from the model's image renditions"""
+    
+    def get_srcset(self, obj):
+        request = self.context.get('request')
+        storage = obj.image.storage
+        
+        def url_for(name):
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request else url
+        return srcset_for(obj.renditions, url_for)
+
+
+class PricingRuleSerializer(SparseFieldsetMixin, SrcsetMixin, serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
     features_list = serializers.SerializerMethodField()
     
     class Meta:
@@ -16,7 +48,7 @@ class PricingRuleSerializer(serializers.ModelSerializer):
             'weekly_discount_percent', 'monthly_discount_percent',
             'cleaning_fee', 'service_fee_percent',
             'start_date', 'end_date', 'is_active',
-            'description', 'order', 'is_featured', 'image', 'image_url',
+            'description', 'order', 'is_featured', 'image', 'image_url', 'srcset',
             'display_label', 'display_price', 'display_price_unit', 'features', 'features_list'
         ]
 
@@ -35,13 +67,14 @@ class PricingRuleSerializer(serializers.ModelSerializer):
         return []
 
 
-class GalleryImageSerializer(serializers.ModelSerializer):
+class GalleryImageSerializer(SparseFieldsetMixin, SrcsetMixin, serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = GalleryImage
         fields = [
-            'id', 'title', 'image', 'image_url', 'category',
+            'id', 'title', 'image', 'image_url', 'srcset', 'category',
             'description', 'alt_text', 'order', 'is_featured'
         ]
     
@@ -54,7 +87,7 @@ class GalleryImageSerializer(serializers.ModelSerializer):
         return None
 
 
-class AmenitySerializer(serializers.ModelSerializer):
+class AmenitySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Amenity
         fields = [
@@ -63,7 +96,7 @@ class AmenitySerializer(serializers.ModelSerializer):
         ]
 
 
-class BookingSerializer(serializers.ModelSerializer):
+class BookingSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     num_nights = serializers.ReadOnlyField()
     full_name = serializers.ReadOnlyField()
     
@@ -94,7 +127,19 @@ class BookingSerializer(serializers.ModelSerializer):
         return data
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class CheckoutSerializer(BookingSerializer):
+    """
+    Booking fields accepted by the checkout endpoint. The price and payment
+    method are set by the server.
+    """
+    pricing_rule_id = serializers.IntegerField(required=False, allow_null=True, write_only=True)
+    
+    class Meta(BookingSerializer.Meta):
+        fields = BookingSerializer.Meta.fields + ['pricing_rule_id']
+        read_only_fields = ['total_price', 'status', 'payment_method', 'created_at']
+
+
+class ReviewSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Review
         fields = [
@@ -104,7 +149,7 @@ class ReviewSerializer(serializers.ModelSerializer):
         read_only_fields = ['is_approved', 'is_featured', 'created_at']
 
 
-class SiteSettingsSerializer(serializers.ModelSerializer):
+class SiteSettingsSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = SiteSettings
         fields = [
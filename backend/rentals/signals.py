@@ -0,0 +1,84 @@
+"""
+Model and database signal handlers for the rentals app (connected in
+RentalsConfig.ready)
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Booking, PricingRule, GalleryImage, Amenity, Review, SiteSettings
+from .invoice_cache import invoice_fingerprint, prune_invoices
+from . import caching, metrics, occupancy, pricing
+from .images import refresh_renditions, delete_renditions
+
+
+@receiver(post_save, sender=Booking)
+def invalidate_stale_invoices(sender, instance, created, **kwargs):
+    """Drop cached invoices that no longer match the booking"""
+    if not created:
+        prune_invoices(instance.id, keep=f"{invoice_fingerprint(instance)}.pdf")
+
+
+@receiver(post_delete, sender=Booking)
+def delete_cached_invoices(sender, instance, **kwargs):
+    prune_invoices(instance.id)
+
+
+@receiver(post_save, sender=Booking)
+def sync_occupied_nights(sender, instance, **kwargs):
+    occupancy.sync_booking(instance)
+
+
+@receiver(post_delete, sender=Booking)
+def release_occupied_nights(sender, instance, **kwargs):
+    occupancy.release_booking(instance)
+
+
+@receiver(post_save, sender=PricingRule)
+@receiver(post_delete, sender=PricingRule)
+def rebuild_rule_index(sender, **kwargs):
+    pricing.rules_changed()
+
+
+# Models whose API responses are cached by CachedResponseMixin
+CACHED_RESPONSE_MODELS = [PricingRule, GalleryImage, Amenity, Review, SiteSettings]
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def bump_response_cache_version(sender, **kwargs):
+    if sender in CACHED_RESPONSE_MODELS:
+        caching.bump_model_version(sender)
+
+
+@receiver(post_save, sender=GalleryImage)
+@receiver(post_save, sender=PricingRule)
+def build_image_renditions(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_renditions(instance)
+
+
+@receiver(post_delete, sender=GalleryImage)
+@receiver(post_delete, sender=PricingRule)
+def delete_image_renditions(sender, instance, **kwargs):
+    delete_renditions(instance.renditions, instance.image.storage)
+
+
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    """Time every query on the connection for the request metrics"""
+    if metrics.query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(metrics.query_timer)
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    Put SQLite databases in WAL mode so readers don't block the writer (and
+    vice versa); with WAL, synchronous=NORMAL is still safe against corruption
+    """
+    if connection.vendor != 'sqlite' or not settings.SQLITE_WAL:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
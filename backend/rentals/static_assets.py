@@ -0,0 +1,168 @@
+"""
+Fingerprinted, pre-compressed static assets.
+
+`collectstatic` is the build step. CompressedManifestStaticFilesStorage copies
+the frontend assets to STATIC_ROOT under content-hashed names (style.css ->
+style.3f9a1c2b7d4e.css, with url() references in CSS rewritten to match) and
+writes a .gz and, when the Brotli package is installed, a .br next to every
+compressible file. `{% static %}` in the templates resolves to the hashed
+names through the manifest.
+
+PrecompressedStaticMiddleware (middleware.py) serves STATIC_URL from
+STATIC_ROOT: the smallest variant the client accepts, `Vary: Accept-Encoding`,
+and `Cache-Control: immutable` with a one year max-age for hashed names (a
+changed file gets a new name, so browsers never need to revalidate).
+"""
+import gzip
+import mimetypes
+import os
+from collections import namedtuple
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip variants are always written
+    brotli = None
+
+# Text formats worth compressing; images and fonts are compressed already
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.mjs', '.map', '.html', '.svg', '.json', '.txt', '.xml', '.ico'}
+
+# Smaller files are not worth the extra request header and file
+MIN_COMPRESS_SIZE = 256
+
+# Keep a variant only if it saves at least this fraction of the original
+MIN_SAVING = 0.05
+
+# Encodings in order of preference: (Content-Encoding, file suffix)
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def compress(content):
+    """
+    Compressed variants of `content` that are worth keeping.
+
+    Returns:
+        dict: {suffix: bytes} for '.br' (if Brotli is installed) and '.gz'
+    """
+    variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(content, quality=11)
+    limit = len(content) * (1 - MIN_SAVING)
+    return {suffix: data for suffix, data in variants.items() if len(data) <= limit}
+
+
+def is_compressible(name):
+    return os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage that also writes .gz/.br variants of text
+    assets at collectstatic time.
+
+    Names missing from the manifest (collectstatic not run yet, or a template
+    referring to a file that does not exist) resolve to the plain name
+    instead of raising, so a stale build cannot take pages down.
+    """
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+
+        # Both the plain and the hashed copy are compressed, since the plain
+        # names stay reachable for anything that does not use {% static %}
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if not is_compressible(name) or not self.exists(name):
+                continue
+            with self.open(name) as original:
+                content = original.read()
+            if len(content) < MIN_COMPRESS_SIZE:
+                continue
+            for suffix, data in compress(content).items():
+                with open(self.path(name + suffix), 'wb') as variant:
+                    variant.write(data)
+
+
+StaticFile = namedtuple('StaticFile', 'content_type immutable variants')
+# variants: [(content_encoding or '', path, size, mtime), ...], preferred first
+
+
+_files = {}
+_immutable_names = None
+
+
+def immutable_names():
+    """Hashed names listed in the staticfiles manifest"""
+    global _immutable_names
+    if _immutable_names is None:
+        _immutable_names = frozenset(getattr(staticfiles_storage, 'hashed_files', {}).values())
+    return _immutable_names
+
+
+def find(name):
+    """
+    Look up a collected file by its name under STATIC_ROOT.
+
+    Returns:
+        StaticFile or None if the file was not collected
+    """
+    static_file = _files.get(name)
+    if static_file is not None:
+        return static_file
+
+    root = os.path.realpath(settings.STATIC_ROOT)
+    path = os.path.realpath(os.path.join(root, name))
+    if not path.startswith(root + os.sep) or not os.path.isfile(path):
+        return None
+
+    variants = []
+    for encoding, suffix in ENCODINGS:
+        try:
+            stat = os.stat(path + suffix)
+        except OSError:
+            continue
+        variants.append((encoding, path + suffix, stat.st_size, stat.st_mtime))
+    stat = os.stat(path)
+    variants.append(('', path, stat.st_size, stat.st_mtime))
+
+    content_type, _ = mimetypes.guess_type(name)
+    if content_type and (content_type.startswith('text/') or content_type == 'application/javascript'):
+        content_type += '; charset=utf-8'
+    static_file = StaticFile(
+        content_type=content_type or 'application/octet-stream',
+        immutable=name in immutable_names(),
+        variants=variants,
+    )
+    _files[name] = static_file
+    return static_file
+
+
+def choose_variant(static_file, accept_encoding):
+    """The first variant whose encoding the client accepts (or the original)"""
+    accepted = {
+        part.split(';')[0].strip().lower()
+        for part in accept_encoding.split(',')
+        if not part.strip().endswith(';q=0')
+    }
+    for variant in static_file.variants:
+        if not variant[0] or variant[0] in accepted:
+            return variant
+    return static_file.variants[-1]
+
+
+def clear_cache():
+    """Forget looked-up files (after collectstatic in a running process, or in tests)"""
+    global _immutable_names
+    _files.clear()
+    _immutable_names = None
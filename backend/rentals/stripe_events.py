@@ -0,0 +1,312 @@
+"""
+Stripe webhook event ledger.
+
+The webhook verifies each event's signature, records it with record_event()
+and returns 200 straight away. Stripe retries a delivery until it gets a 2xx,
+and the event id is the ledger's primary key, so a redelivered event is
+recorded once and applied once.
+
+The `process_stripe_events` worker claims pending events in batches and
+applies them with one UPDATE per transition (see TRANSITIONS), then marks the
+whole batch processed with another UPDATE. An event only moves a booking
+whose PaymentIntent (and, for a payment, amount) it matches. A succeeded
+payment queues the booking's confirmation email and payment receipt in the
+same transaction.
+
+If a batch fails, its events are applied again one at a time, so one bad
+event does not hold back the others; only the events that fail are charged
+an attempt and retried, up to MAX_ATTEMPTS times. `replay_stripe_events`
+puts recorded events (or events fetched from the Stripe API, for deliveries
+that never arrived) back in the queue.
+"""
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+import stripe
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .invoice_cache import invoice_fingerprint, prune_invoices
+from .models import Booking, StripeEvent
+from .outbox import enqueue_booking_emails
+from . import occupancy
+
+logger = logging.getLogger(__name__)
+
+# event type -> (booking statuses it applies to, new status)
+TRANSITIONS = {
+    'payment_intent.succeeded': (('pending',), 'confirmed'),
+    # Checkout intents that are cancelled (in the dashboard or by Stripe)
+    # free the booking's nights
+    'payment_intent.canceled': (('pending',), 'cancelled'),
+}
+
+MAX_ATTEMPTS = 5
+
+# Events stuck in 'processing' longer than this are assumed to belong to a dead worker
+STALE_AFTER = timedelta(minutes=10)
+
+
+def _booking_id(event):
+    metadata = ((event.get('data') or {}).get('object') or {}).get('metadata') or {}
+    try:
+        return int(metadata.get('booking_id'))
+    except (TypeError, ValueError):
+        return None
+
+
+def ledger_entry(event):
+    """Unsaved StripeEvent for a Stripe event given as a plain dict"""
+    created = event.get('created')
+    return StripeEvent(
+        event_id=event['id'],
+        event_type=event.get('type', ''),
+        booking_id=_booking_id(event),
+        payload=event,
+        livemode=bool(event.get('livemode')),
+        stripe_created=datetime.fromtimestamp(created, tz=dt_timezone.utc) if created else None,
+    )
+
+
+def record_event(event):
+    """
+    Add an event to the ledger unless it is already there. The insert
+    ignores conflicts, so concurrent deliveries of the same event are safe.
+
+    Returns:
+        bool: True if the event was new
+    """
+    return record_events([event]) == 1
+
+
+def record_events(events):
+    """
+    Add events to the ledger, skipping ids that are already recorded.
+
+    Returns:
+        int: number of new events
+    """
+    entries = [ledger_entry(event) for event in events]
+    if not entries:
+        return 0
+    known = set(
+        StripeEvent.objects.filter(event_id__in=[entry.event_id for entry in entries])
+        .values_list('event_id', flat=True)
+    )
+    StripeEvent.objects.bulk_create(entries, ignore_conflicts=True)
+    return len({entry.event_id for entry in entries} - known)
+
+
+def claim_events(limit=100):
+    """
+    Claim up to `limit` due events for this worker with one conditional UPDATE.
+
+    Returns:
+        list: the claimed StripeEvent rows, oldest first
+    """
+    now = timezone.now()
+    due = Q(status='pending') | Q(status='processing', updated_at__lt=now - STALE_AFTER)
+    candidates = list(StripeEvent.objects.filter(due).values_list('event_id', flat=True)[:limit])
+    if not candidates:
+        return []
+
+    claim = uuid.uuid4().hex
+    StripeEvent.objects.filter(due, event_id__in=candidates).update(
+        status='processing', claim=claim, updated_at=now
+    )
+    return list(StripeEvent.objects.filter(claim=claim, status='processing').order_by('received_at'))
+
+
+def _intent(event):
+    return ((event.payload or {}).get('data') or {}).get('object') or {}
+
+
+def _matches(event, booking):
+    """
+    Whether an event's PaymentIntent is the one checkout created for
+    `booking` and, for a payment, whether it paid the booking's full price.
+    The booking id in the metadata alone proves nothing: anyone can create an
+    intent and tag it with any booking id.
+    """
+    from .checkout import CURRENCY, amount_cents
+
+    intent = _intent(event)
+    if not booking.payment_intent_id or intent.get('id') != booking.payment_intent_id:
+        return False
+    if event.event_type == 'payment_intent.succeeded':
+        return (
+            intent.get('amount_received') == amount_cents(booking.total_price)
+            and intent.get('currency') == CURRENCY
+        )
+    return True
+
+
+def apply_events(events):
+    """
+    Apply a batch of claimed events to their bookings.
+
+    Events whose PaymentIntent does not match the booking (see _matches) are
+    logged and ignored.
+
+    Returns:
+        tuple: (processed, ignored) event ids
+    """
+    by_type = {}
+    ignored = []
+    for event in events:
+        if event.event_type in TRANSITIONS and event.booking_id:
+            by_type.setdefault(event.event_type, []).append(event)
+        else:
+            ignored.append(event.event_id)
+
+    now = timezone.now()
+    updated = []
+    with transaction.atomic():
+        for event_type, typed_events in by_type.items():
+            from_statuses, new_status = TRANSITIONS[event_type]
+            bookings = Booking.objects.select_for_update().in_bulk(
+                {event.booking_id for event in typed_events}, field_name='id'
+            )
+            changed = set()
+            for event in typed_events:
+                booking = bookings.get(event.booking_id)
+                if booking is None or booking.status not in from_statuses:
+                    continue
+                if _matches(event, booking):
+                    changed.add(booking.id)
+                else:
+                    logger.warning("Ignoring %s %s: %s does not match booking %s",
+                                   event_type, event.event_id, _intent(event).get('id'), booking.id)
+                    ignored.append(event.event_id)
+            if changed:
+                Booking.objects.filter(id__in=changed).update(status=new_status, updated_at=now)
+                # update() skips the Booking signals, so refresh the occupancy
+                # calendar here (and the cached invoices below)
+                occupancy.resync_bookings(Booking.objects.filter(id__in=changed))
+                changed_bookings = list(Booking.objects.filter(id__in=changed))
+                updated.extend(changed_bookings)
+                if event_type == 'payment_intent.succeeded':
+                    # The guest hears from us once the card has been charged
+                    for booking in changed_bookings:
+                        enqueue_booking_emails(booking)
+            logger.info("%s: %s of %s booking(s) moved to %s",
+                        event_type, len(changed), len(bookings), new_status)
+
+    for booking in updated:
+        prune_invoices(booking.id, keep=f"{invoice_fingerprint(booking)}.pdf")
+
+    skipped = set(ignored)
+    processed = [event.event_id for event in events if event.event_id not in skipped]
+    return processed, ignored
+
+
+def _apply_one_by_one(events):
+    """
+    Apply events separately after their batch failed.
+
+    Returns:
+        tuple: (processed ids, ignored ids, {event id: exception})
+    """
+    processed, ignored, errors = [], [], {}
+    for event in events:
+        try:
+            done, skipped = apply_events([event])
+        except Exception as e:
+            logger.exception("Could not apply Stripe event %s", event.event_id)
+            errors[event.event_id] = e
+            continue
+        processed.extend(done)
+        ignored.extend(skipped)
+    return processed, ignored, errors
+
+
+def process_pending(limit=100):
+    """
+    Claim and apply one batch of events.
+
+    Returns:
+        tuple: (processed, ignored, failed) counts for the batch, where failed
+        counts events that ran out of attempts
+    """
+    events = claim_events(limit)
+    if not events:
+        return 0, 0, 0
+
+    try:
+        processed, ignored = apply_events(events)
+        errors = {}
+    except Exception as e:
+        if len(events) == 1:
+            logger.exception("Could not apply Stripe event %s", events[0].event_id)
+            processed, ignored, errors = [], [], {events[0].event_id: e}
+        else:
+            logger.warning("Could not apply %s Stripe event(s) together, retrying one at a time",
+                           len(events), exc_info=True)
+            processed, ignored, errors = _apply_one_by_one(events)
+
+    now = timezone.now()
+    StripeEvent.objects.filter(event_id__in=processed).update(
+        status='processed', attempts=F('attempts') + 1, last_error='', claim='', processed_at=now, updated_at=now
+    )
+    StripeEvent.objects.filter(event_id__in=ignored).update(
+        status='ignored', attempts=F('attempts') + 1, claim='', processed_at=now, updated_at=now
+    )
+    failed = 0
+    for event_id, error in errors.items():
+        event = StripeEvent.objects.filter(event_id=event_id)
+        event.update(attempts=F('attempts') + 1, last_error=str(error), claim='', updated_at=now)
+        failed += event.filter(attempts__gte=MAX_ATTEMPTS).update(status='failed')
+        event.exclude(status='failed').update(status='pending')
+    return len(processed), len(ignored), failed
+
+
+def requeue(queryset):
+    """
+    Put recorded events back in the queue.
+
+    Returns:
+        int: number of events requeued
+    """
+    return queryset.update(status='pending', attempts=0, claim='', last_error='', updated_at=timezone.now())
+
+
+def stripe_client(http_client=None):
+    """
+    StripeClient for the configured key and API base.
+
+    Args:
+        http_client: stripe HTTP client (default: stripe's blocking one)
+    """
+    return stripe.StripeClient(
+        settings.STRIPE_SECRET_KEY,
+        base_addresses={'api': settings.STRIPE_API_BASE} if settings.STRIPE_API_BASE else None,
+        http_client=http_client,
+    )
+
+
+def fetch_from_stripe(since, event_types=None):
+    """
+    Record events Stripe created since `since` (a datetime) that are missing
+    from the ledger, e.g. deliveries lost during an outage. Stripe keeps
+    events for 30 days.
+
+    Returns:
+        tuple: (events seen, new events recorded)
+    """
+    client = stripe_client()
+    params = {'created': {'gte': int(since.timestamp())}, 'limit': 100}
+    if event_types:
+        params['types'] = list(event_types)
+
+    seen = recorded = 0
+    page = []
+    for event in client.v1.events.list(params=params).auto_paging_iter():
+        page.append(event.to_dict())
+        if len(page) == 100:
+            seen += len(page)
+            recorded += record_events(page)
+            page = []
+    seen += len(page)
+    recorded += record_events(page)
+    return seen, recorded
@@ -1,7 +1,17 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.utils import timezone
 from decimal import Decimal
 from .models import PricingRule, GalleryImage, Amenity, Booking, Review, SiteSettings
+from .serializers import PricingRuleSerializer
+
+# Rendered invoices and images are written here instead of MEDIA_ROOT
+TEST_MEDIA_ROOT = tempfile.mkdtemp(prefix='urban-oasis-tests-')
+
+
+def tearDownModule():
+    shutil.rmtree(TEST_MEDIA_ROOT, ignore_errors=True)
 
 
 class PricingRuleTestCase(TestCase):
@@ -108,3 +118,1672 @@ class SiteSettingsTestCase(TestCase):
         
         self.assertEqual(settings1.pk, settings2.pk)
         self.assertEqual(SiteSettings.objects.count(), 1)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class EmailOutboxTestCase(TestCase):
+    def setUp(self):
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+        self.payload = {
+            'first_name': 'Jane',
+            'last_name': 'Guest',
+            'email': 'jane@example.com',
+            'phone': '+1234567890',
+            'check_in': '2026-05-01',
+            'check_out': '2026-05-04',
+            'num_guests': 2,
+            'total_price': '600.00',
+        }
+    
+    def test_create_booking_enqueues_email(self):
+        """Booking creation queues the confirmation instead of sending it inline"""
+        from django.core import mail
+        from .models import EmailJob
+        response = self.client.post('/api/bookings/', self.payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('email_sent', response.data)
+        job = EmailJob.objects.get(id=response.data['email_job_id'])
+        self.assertEqual(job.kind, 'booking_confirmation')
+        self.assertEqual(job.status, 'pending')
+        self.assertEqual(len(mail.outbox), 0)
+    
+    def test_worker_sends_guest_and_admin_email(self):
+        """The worker sends the guest confirmation and the admin copy"""
+        from django.core import mail
+        from .models import EmailJob
+        from .outbox import process_pending
+        response = self.client.post('/api/bookings/', self.payload, format='json')
+        self.assertEqual(process_pending(), (1, 0))
+        self.assertEqual(len(mail.outbox), 2)
+        job = EmailJob.objects.get(id=response.data['email_job_id'])
+        self.assertEqual(job.status, 'sent')
+        self.assertEqual(process_pending(), (0, 0))
+    
+    def test_failed_job_is_retried_with_backoff(self):
+        """A failed send is rescheduled until max_attempts is reached"""
+        from unittest import mock
+        from .models import EmailJob
+        from .outbox import process_pending
+        response = self.client.post('/api/bookings/', self.payload, format='json')
+        job = EmailJob.objects.get(id=response.data['email_job_id'])
+        job.max_attempts = 2
+        job.save()
+        with mock.patch('rentals.outbox.send_booking_confirmation_email', return_value=False):
+            self.assertEqual(process_pending(), (0, 1))
+            job.refresh_from_db()
+            self.assertEqual(job.status, 'pending')
+            self.assertGreater(job.run_after, timezone.now())
+            # Not due yet
+            self.assertEqual(process_pending(), (0, 0))
+            EmailJob.objects.filter(id=job.id).update(run_after=timezone.now())
+            self.assertEqual(process_pending(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.attempts, 2)
+
+
+class EmailConnectionPoolTestCase(TestCase):
+    def _message(self, n):
+        from django.core.mail import EmailMessage
+        return EmailMessage(f"Subject {n}", "Body", "noreply@example.com", ["guest@example.com"])
+    
+    def test_connection_reused_across_sends(self):
+        """Sequential sends share one backend connection"""
+        from unittest import mock
+        from django.core import mail
+        from .mail_pool import EmailConnectionPool
+        pool = EmailConnectionPool(max_size=2, idle_timeout=60)
+        with mock.patch('rentals.mail_pool.get_connection', wraps=mail.get_connection) as opener:
+            pool.send_messages([self._message(1)])
+            pool.send_messages([self._message(2)])
+        self.assertEqual(opener.call_count, 1)
+        self.assertEqual(len(mail.outbox), 2)
+    
+    def test_bulk_send_uses_one_session(self):
+        """send_messages pushes all messages through a single connection"""
+        from django.core import mail
+        from .mail_pool import EmailConnectionPool
+        pool = EmailConnectionPool(max_size=1, idle_timeout=60)
+        sent = pool.send_messages([self._message(n) for n in range(5)])
+        self.assertEqual(sent, 5)
+        self.assertEqual(len(mail.outbox), 5)
+    
+    def test_idle_connections_evicted(self):
+        """Connections idle past the timeout are closed rather than reused"""
+        from unittest import mock
+        from django.core import mail
+        from .mail_pool import EmailConnectionPool
+        pool = EmailConnectionPool(max_size=1, idle_timeout=0)
+        with mock.patch('rentals.mail_pool.get_connection', wraps=mail.get_connection) as opener:
+            pool.send_messages([self._message(1)])
+            pool.send_messages([self._message(2)])
+        self.assertEqual(opener.call_count, 2)
+    
+    def test_failed_connection_discarded(self):
+        """A connection that raised while sending is not returned to the pool"""
+        from .mail_pool import EmailConnectionPool
+        pool = EmailConnectionPool(max_size=1, idle_timeout=60)
+        with self.assertRaises(RuntimeError):
+            with pool.connection():
+                raise RuntimeError("SMTP session dropped")
+        self.assertEqual(pool.close_all(), 0)
+        # The slot was released, so the pool is still usable
+        self.assertEqual(pool.send_messages([self._message(1)]), 1)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class InvoiceCacheTestCase(TestCase):
+    def setUp(self):
+        from datetime import date
+        self.booking = Booking.objects.create(
+            first_name="John",
+            last_name="Doe",
+            email="john@example.com",
+            phone="+1234567890",
+            check_in=date(2026, 3, 15),
+            check_out=date(2026, 3, 22),
+            num_guests=2,
+            total_price=Decimal("800.00"),
+            status="pending"
+        )
+    
+    def test_repeat_requests_served_from_cache(self):
+        """The PDF is rendered once and then served from storage"""
+        from unittest import mock
+        from .invoice_cache import get_invoice_pdf
+        from .invoice_generator import generate_invoice_pdf
+        with mock.patch('rentals.invoice_cache.generate_invoice_pdf', wraps=generate_invoice_pdf) as render:
+            first = get_invoice_pdf(self.booking).read()
+            second = get_invoice_pdf(self.booking).read()
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertTrue(first.startswith(b'%PDF'))
+    
+    def test_booking_change_invalidates_cache(self):
+        """Changing an invoice field changes the key and prunes the old file"""
+        from django.core.files.storage import default_storage
+        from .invoice_cache import get_invoice_pdf, invoice_path, invoice_dir
+        get_invoice_pdf(self.booking)
+        old_path = invoice_path(self.booking)
+        self.booking.status = 'confirmed'
+        self.booking.save()
+        self.assertNotEqual(invoice_path(self.booking), old_path)
+        self.assertFalse(default_storage.exists(old_path))
+        get_invoice_pdf(self.booking)
+        self.assertEqual(len(default_storage.listdir(invoice_dir(self.booking.id))[1]), 1)
+    
+    def test_delete_removes_cached_invoices(self):
+        from django.core.files.storage import default_storage
+        from .invoice_cache import get_invoice_pdf, invoice_path
+        get_invoice_pdf(self.booking)
+        path = invoice_path(self.booking)
+        self.booking.delete()
+        self.assertFalse(default_storage.exists(path))
+
+
+class InvoiceTemplateTestCase(TestCase):
+    def test_template_built_once_per_business_details(self):
+        """Styles and static flowables are reused until business details change"""
+        from .invoice_generator import get_invoice_template
+        template = get_invoice_template()
+        self.assertIs(get_invoice_template(), template)
+        with override_settings(BUSINESS_PHONE='+1 (555) 000-0000'):
+            self.assertIsNot(get_invoice_template(), template)
+    
+    def test_repeated_renders_are_identical(self):
+        """Reusing the template does not leak layout state between invoices"""
+        from datetime import date
+        from reportlab import rl_config
+        from .invoice_generator import generate_invoice_pdf
+        booking = Booking(
+            id=42, first_name="John", last_name="Doe", email="john@example.com",
+            phone="+1234567890", check_in=date(2026, 3, 15), check_out=date(2026, 3, 22),
+            num_guests=2, total_price=Decimal("800.00"), status="pending",
+        )
+        invariant = rl_config.invariant
+        rl_config.invariant = 1
+        try:
+            first = generate_invoice_pdf(booking).getvalue()
+            second = generate_invoice_pdf(booking).getvalue()
+        finally:
+            rl_config.invariant = invariant
+        self.assertEqual(first, second)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class InvoiceBatchTestCase(TestCase):
+    def setUp(self):
+        from datetime import date
+        for day in (1, 10, 20):
+            Booking.objects.create(
+                first_name="Guest",
+                last_name=str(day),
+                email=f"guest{day}@example.com",
+                phone="+1234567890",
+                check_in=date(2026, 4, day),
+                check_out=date(2026, 4, day + 2),
+                num_guests=2,
+                total_price=Decimal("400.00"),
+                status="confirmed"
+            )
+    
+    def test_render_zip_for_date_range(self):
+        """Invoices for the range are rendered in worker processes into a zip"""
+        import zipfile
+        from datetime import date
+        from io import BytesIO
+        from .invoice_batch import bookings_for_period, render_invoices
+        bookings = bookings_for_period(date(2026, 4, 1), date(2026, 4, 15))
+        expected = [f"invoice_URB{b.id:06d}.pdf" for b in bookings]
+        output = BytesIO()
+        self.assertEqual(render_invoices(bookings, output, 'zip', workers=2), 2)
+        with zipfile.ZipFile(output) as archive:
+            self.assertEqual(archive.namelist(), expected)
+            self.assertTrue(archive.read(expected[0]).startswith(b'%PDF'))
+    
+    def test_render_merged_pdf(self):
+        """All invoices are merged into a single PDF"""
+        from io import BytesIO
+        from .invoice_batch import bookings_for_period, render_invoices
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            self.skipTest("pypdf not installed")
+        output = BytesIO()
+        self.assertEqual(render_invoices(bookings_for_period(), output, 'pdf', workers=2), 3)
+        output.seek(0)
+        merged = PdfReader(output)
+        self.assertEqual([item.title for item in merged.outline], [f"URB{b.id:06d}" for b in bookings_for_period()])
+
+    def test_merged_pdf_is_capped(self):
+        """Too many invoices for one merged PDF fail before anything is rendered"""
+        from io import BytesIO
+        from .invoice_batch import bookings_for_period, render_invoices_pdf
+        output = BytesIO()
+        with self.assertRaisesMessage(RuntimeError, "limited to 2 invoices (3 requested)"):
+            render_invoices_pdf(bookings_for_period(), output, workers=1, limit=2)
+        self.assertEqual(output.getvalue(), b'')
+
+    def test_workers_leave_the_callers_transaction_open(self):
+        """Rendering inside transaction.atomic() keeps the caller's connection usable"""
+        from io import BytesIO
+        from django.db import connection, transaction
+        from .invoice_batch import bookings_for_period, render_invoices
+        with transaction.atomic():
+            Booking.objects.filter(last_name="1").update(status="cancelled")
+            self.assertEqual(render_invoices(bookings_for_period(), BytesIO(), 'zip', workers=2), 3)
+            self.assertTrue(connection.in_atomic_block)
+            self.assertEqual(Booking.objects.filter(status="cancelled").count(), 1)
+
+    def test_failed_run_keeps_previous_output(self):
+        import os
+        from unittest import mock
+        from .invoice_batch import bookings_for_period, render_invoices_to_path
+        path = os.path.join(TEST_MEDIA_ROOT, 'reprint.zip')
+        self.assertEqual(render_invoices_to_path(bookings_for_period(), path, 'zip', workers=1), 3)
+        with open(path, 'rb') as f:
+            previous = f.read()
+        
+        def interrupted(bookings, fileobj, output_format, workers=None):
+            fileobj.write(b'PK partial')
+            raise RuntimeError("worker died")
+        with mock.patch('rentals.invoice_batch.render_invoices', side_effect=interrupted):
+            with self.assertRaises(RuntimeError):
+                render_invoices_to_path(bookings_for_period(), path, 'zip')
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), previous)
+        self.assertEqual([name for name in os.listdir(TEST_MEDIA_ROOT) if name.endswith('.part')], [])
+
+
+class OccupancyCalendarTestCase(TestCase):
+    def _book(self, check_in, check_out, status="pending"):
+        return Booking.objects.create(
+            first_name="Guest",
+            last_name="Night",
+            email="guest@example.com",
+            phone="+1234567890",
+            check_in=check_in,
+            check_out=check_out,
+            num_guests=2,
+            total_price=Decimal("400.00"),
+            status=status
+        )
+    
+    def test_nights_follow_booking_lifecycle(self):
+        """Nights are claimed on save, moved on date change and freed on cancel/delete"""
+        from datetime import date
+        from .models import OccupiedNight
+        booking = self._book(date(2026, 7, 1), date(2026, 7, 4))
+        self.assertEqual(
+            list(OccupiedNight.objects.values_list('night', flat=True)),
+            [date(2026, 7, 1), date(2026, 7, 2), date(2026, 7, 3)]
+        )
+        booking.check_out = date(2026, 7, 3)
+        booking.save()
+        self.assertEqual(OccupiedNight.objects.count(), 2)
+        booking.status = 'cancelled'
+        booking.save()
+        self.assertEqual(OccupiedNight.objects.count(), 0)
+        booking.status = 'confirmed'
+        booking.save()
+        booking.delete()
+        self.assertEqual(OccupiedNight.objects.count(), 0)
+    
+    def test_freed_nights_go_to_overlapping_booking(self):
+        """Legacy overlapping bookings pick up nights released by another"""
+        from datetime import date
+        from .models import OccupiedNight
+        first = self._book(date(2026, 7, 1), date(2026, 7, 4))
+        second = self._book(date(2026, 7, 3), date(2026, 7, 5))
+        self.assertEqual(OccupiedNight.objects.get(night=date(2026, 7, 3)).booking, first)
+        first.delete()
+        self.assertEqual(
+            list(OccupiedNight.objects.filter(booking=second).values_list('night', flat=True)),
+            [date(2026, 7, 3), date(2026, 7, 4)]
+        )
+    
+    def test_availability_endpoint(self):
+        from datetime import date
+        from rest_framework.test import APIClient
+        self._book(date(2026, 7, 1), date(2026, 7, 4), status="confirmed")
+        self._book(date(2026, 7, 10), date(2026, 7, 12), status="cancelled")
+        client = APIClient()
+        url = '/api/bookings/availability/'
+        response = client.get(url, {'check_in': '2026-06-28', 'check_out': '2026-07-02'})
+        self.assertEqual(response.json(), {'available': False, 'overlapping_bookings': 1})
+        # Check-out day is free for the next guest
+        response = client.get(url, {'check_in': '2026-07-04', 'check_out': '2026-07-12'})
+        self.assertEqual(response.json(), {'available': True, 'overlapping_bookings': 0})
+        self.assertEqual(client.get(url, {'check_in': 'soon', 'check_out': 'later'}).status_code, 400)
+    
+    def test_admin_status_action_resyncs(self):
+        """Admin bulk actions use update() and must refresh the calendar"""
+        from datetime import date
+        from django.contrib.admin.sites import site
+        from .models import OccupiedNight
+        booking = self._book(date(2026, 7, 1), date(2026, 7, 4))
+        site._registry[Booking].mark_cancelled(None, Booking.objects.filter(id=booking.id))
+        self.assertEqual(OccupiedNight.objects.count(), 0)
+
+    @override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+    def test_admin_confirm_queues_emails_and_prunes_invoices(self):
+        """Confirming in the admin sends the payment emails and retires stale invoices"""
+        from datetime import date
+        from django.contrib.admin.sites import site
+        from django.core.files.storage import default_storage
+        from .invoice_cache import get_invoice_pdf, invoice_path
+        from .models import EmailJob
+        booking = self._book(date(2026, 7, 1), date(2026, 7, 4))
+        Booking.objects.filter(id=booking.id).update(payment_method='debitcard', payment_intent_id='pi_admin')
+        booking.refresh_from_db()
+        get_invoice_pdf(booking)
+        stale = invoice_path(booking)
+
+        # As from the changelist filtered on the status being changed
+        site._registry[Booking].mark_confirmed(None, Booking.objects.filter(status='pending'))
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, 'confirmed')
+        self.assertFalse(default_storage.exists(stale))
+        self.assertEqual(sorted(EmailJob.objects.filter(booking=booking).values_list('kind', flat=True)),
+                         ['booking_confirmation', 'payment_receipt'])
+
+        # Bookings already in that status are left alone
+        site._registry[Booking].mark_confirmed(None, Booking.objects.filter(id=booking.id))
+        self.assertEqual(EmailJob.objects.filter(booking=booking).count(), 2)
+
+
+class BookingCalendarTestCase(TestCase):
+    def setUp(self):
+        from datetime import date
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+        for check_in, check_out in [(date(2026, 8, 1), date(2026, 8, 4)), (date(2026, 8, 4), date(2026, 8, 6)),
+                                    (date(2026, 8, 20), date(2026, 8, 21))]:
+            Booking.objects.create(
+                first_name="Guest", last_name="Calendar", email="guest@example.com",
+                phone="+1234567890", check_in=check_in, check_out=check_out,
+                num_guests=2, total_price=Decimal("400.00"), status="confirmed"
+            )
+    
+    def test_blocked_nights_run_length_encoded(self):
+        """Back-to-back stays merge into one run"""
+        response = self.client.get('/api/bookings/calendar/', {'from': '2026-08-01', 'to': '2026-09-01'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['blocked'], [['2026-08-01', 5], ['2026-08-20', 1]])
+        self.assertIn('Last-Modified', response)
+    
+    def test_conditional_get_returns_304(self):
+        url = '/api/bookings/calendar/?from=2026-08-01&to=2026-09-01'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Booking.objects.filter(last_name="Calendar").first().delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+    
+    def test_range_limited_to_24_months(self):
+        response = self.client.get('/api/bookings/calendar/', {'from': '2026-01-01', 'to': '2028-06-01'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ConcurrentBookingTestCase(TransactionTestCase):
+    """Load test: many threads race to book the same nights"""
+    
+    THREADS = 12
+    
+    def _payload(self, n):
+        return {
+            'first_name': 'Racer',
+            'last_name': str(n),
+            'email': f'racer{n}@example.com',
+            'phone': '+1234567890',
+            'check_in': '2026-09-10',
+            'check_out': '2026-09-14',
+            'num_guests': 2,
+            'total_price': '800.00',
+        }
+    
+    def test_no_double_booking_under_concurrency(self):
+        import threading
+        from django.db import connection
+        from rest_framework.test import APIClient
+        from .models import OccupiedNight
+        
+        barrier = threading.Barrier(self.THREADS)
+        results = []
+        
+        def book(n):
+            # The test client re-raises any request exception signalled while
+            # its request runs, including other threads' ones; take responses
+            # instead so each thread sees only its own outcome
+            client = APIClient(raise_request_exception=False)
+            barrier.wait()
+            try:
+                # SQLite reports lock contention as an error (500) instead of
+                # waiting; a real client would retry, so do the same here
+                for _ in range(50):
+                    response = client.post('/api/bookings/', self._payload(n), format='json')
+                    if response.status_code != 500:
+                        results.append(response.status_code)
+                        break
+            finally:
+                connection.close()
+        
+        threads = [threading.Thread(target=book, args=(n,)) for n in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        # Exactly one request wins, and its booking alone holds the nights
+        self.assertEqual(len(results), self.THREADS)
+        self.assertTrue(set(results) <= {201, 409}, results)
+        self.assertEqual(results.count(201), 1, results)
+        active = Booking.objects.filter(status__in=['pending', 'confirmed'])
+        self.assertEqual(active.count(), 1)
+        self.assertEqual(OccupiedNight.objects.filter(booking=active.get()).count(), 4)
+        self.assertEqual(OccupiedNight.objects.exclude(booking=active.get()).count(), 0)
+    
+    def test_overlapping_request_rejected(self):
+        from rest_framework.test import APIClient
+        client = APIClient()
+        self.assertEqual(client.post('/api/bookings/', self._payload(1), format='json').status_code, 201)
+        overlapping = dict(self._payload(2), check_in='2026-09-13', check_out='2026-09-16')
+        self.assertEqual(client.post('/api/bookings/', overlapping, format='json').status_code, 409)
+        adjacent = dict(self._payload(3), check_in='2026-09-14', check_out='2026-09-16')
+        self.assertEqual(client.post('/api/bookings/', adjacent, format='json').status_code, 201)
+        self.assertEqual(Booking.objects.count(), 2)
+
+
+class PriceGridTestCase(TestCase):
+    def setUp(self):
+        self.rules = [
+            PricingRule.objects.create(
+                name="Odd Rates",
+                base_price_per_night=Decimal("133.37"),
+                weekly_discount_percent=Decimal("7.25"),
+                monthly_discount_percent=Decimal("18.75"),
+                cleaning_fee=Decimal("49.99"),
+                service_fee_percent=Decimal("3.33"),
+                display_price=Decimal("133.37"),
+            ),
+            PricingRule.objects.create(
+                name="Flat",
+                base_price_per_night=Decimal("100.00"),
+                display_price=Decimal("100.00"),
+            ),
+            PricingRule.objects.create(
+                name="Retired",
+                base_price_per_night=Decimal("80.00"),
+                display_price=Decimal("80.00"),
+                is_active=False,
+            ),
+        ]
+    
+    def test_grid_matches_calculate_total(self):
+        """Every grid cell equals the scalar calculation, rounding included"""
+        from .pricing import PriceGrid
+        nights = list(range(1, 366))
+        grid = PriceGrid(self.rules).table(nights)
+        for rule in self.rules:
+            self.assertEqual(grid[rule.id], [rule.calculate_total(n) for n in nights])
+    
+    def test_quotes_endpoint(self):
+        from rest_framework.test import APIClient
+        response = APIClient().get('/api/pricing/quotes/', {'nights': '3,7,30'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['nights'], [3, 7, 30])
+        rows = {row['id']: row['totals'] for row in response.data['rules']}
+        self.assertEqual(set(rows), {self.rules[0].id, self.rules[1].id})
+        self.assertEqual(rows[self.rules[1].id], [300.0, 700.0, 3000.0])
+    
+    def test_quotes_rejects_bad_lengths(self):
+        from rest_framework.test import APIClient
+        client = APIClient()
+        self.assertEqual(client.get('/api/pricing/quotes/', {'nights': 'abc'}).status_code, 400)
+        self.assertEqual(client.get('/api/pricing/quotes/', {'max_nights': '0'}).status_code, 400)
+        self.assertEqual(client.get('/api/pricing/quotes/', {'nights': '400'}).status_code, 400)
+
+
+class SeasonalPricingTestCase(TestCase):
+    def setUp(self):
+        from datetime import date
+        self.regular = PricingRule.objects.create(
+            name="Regular",
+            base_price_per_night=Decimal("100.00"),
+            weekly_discount_percent=Decimal("10.00"),
+            cleaning_fee=Decimal("50.00"),
+            service_fee_percent=Decimal("5.00"),
+            display_price=Decimal("100.00"),
+        )
+        self.summer = PricingRule.objects.create(
+            name="Summer",
+            season="peak",
+            base_price_per_night=Decimal("200.00"),
+            weekly_discount_percent=Decimal("10.00"),
+            cleaning_fee=Decimal("80.00"),
+            service_fee_percent=Decimal("5.00"),
+            display_price=Decimal("200.00"),
+            start_date=date(2026, 6, 1),
+            end_date=date(2026, 8, 31),
+        )
+        self.july_fourth = PricingRule.objects.create(
+            name="Fourth of July",
+            season="peak",
+            base_price_per_night=Decimal("300.00"),
+            display_price=Decimal("300.00"),
+            start_date=date(2026, 7, 3),
+            end_date=date(2026, 7, 5),
+        )
+    
+    def test_single_season_matches_calculate_total(self):
+        from datetime import date
+        from .pricing import price_stay
+        quote = price_stay(date(2026, 3, 1), date(2026, 3, 8))
+        self.assertEqual(quote['total_price'], self.regular.calculate_total(7))
+        quote = price_stay(date(2026, 6, 10), date(2026, 6, 13))
+        self.assertEqual(quote['total_price'], self.summer.calculate_total(3))
+    
+    def test_stay_split_across_seasons(self):
+        from datetime import date
+        from .pricing import price_stay
+        quote = price_stay(date(2026, 5, 29), date(2026, 6, 2))
+        self.assertEqual(
+            [(s['pricing_rule_id'], s['first_night'], s['nights']) for s in quote['segments']],
+            [(self.regular.id, date(2026, 5, 29), 3), (self.summer.id, date(2026, 6, 1), 1)],
+        )
+        # 3 x 100 + 1 x 200, regular cleaning fee, 5% service on both runs
+        self.assertEqual(quote['total_price'], 300 + 200 + 50 + 25)
+    
+    def test_shorter_season_wins_overlap(self):
+        from datetime import date
+        from .pricing import get_rule_index
+        runs = get_rule_index().runs(date(2026, 7, 1), date(2026, 7, 8))
+        self.assertEqual(
+            [(rule.id, nights) for rule, _, nights in runs],
+            [(self.summer.id, 2), (self.july_fourth.id, 3), (self.summer.id, 2)],
+        )
+    
+    def test_index_rebuilt_when_rule_saved(self):
+        from datetime import date
+        from .pricing import price_stay
+        before = price_stay(date(2026, 6, 10), date(2026, 6, 11))['total_price']
+        self.summer.base_price_per_night = Decimal("250.00")
+        self.summer.save()
+        after = price_stay(date(2026, 6, 10), date(2026, 6, 11))['total_price']
+        self.assertEqual(before, 290.0)
+        self.assertEqual(after, 342.5)
+    
+    def test_long_stay_prices_without_query_per_night(self):
+        from datetime import date
+        from .pricing import get_rule_index, price_stay
+        get_rule_index()
+        with self.assertNumQueries(0):
+            quote = price_stay(date(2026, 1, 1), date(2027, 1, 1))
+        self.assertEqual(quote['num_nights'], 365)
+        self.assertEqual(sum(s['nights'] for s in quote['segments']), 365)
+    
+    def test_booking_priced_by_season(self):
+        from rest_framework.test import APIClient
+        response = APIClient().post('/api/bookings/', {
+            'first_name': 'Sun',
+            'last_name': 'Seeker',
+            'email': 'sun@example.com',
+            'phone': '+1234567890',
+            'check_in': '2026-05-31',
+            'check_out': '2026-06-02',
+            'num_guests': 2,
+            'total_price': '1.00',
+            'pricing_rule_id': self.regular.id,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Decimal(response.data['total_price']), Decimal('365.00'))
+    
+    def test_stay_endpoint(self):
+        from rest_framework.test import APIClient
+        client = APIClient()
+        response = client.get('/api/pricing/stay/', {'check_in': '2026-08-30', 'check_out': '2026-09-02'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([s['nights'] for s in response.data['segments']], [2, 1])
+        self.assertEqual(client.get('/api/pricing/stay/', {'check_in': '2026-08-30', 'check_out': '2026-08-30'}).status_code, 400)
+        self.assertEqual(client.get('/api/pricing/stay/', {'check_in': 'x', 'check_out': '2026-08-30'}).status_code, 400)
+
+
+class PricingCatalogCacheTestCase(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from rest_framework.test import APIClient
+        cache.clear()
+        self.client = APIClient()
+        self.rule = PricingRule.objects.create(
+            name="Nightly",
+            base_price_per_night=Decimal("120.00"),
+            cleaning_fee=Decimal("40.00"),
+            display_price=Decimal("120.00"),
+            features="Wifi\nParking\n",
+        )
+    
+    def test_warm_catalog_makes_no_queries(self):
+        self.client.get('/api/pricing/')
+        with self.assertNumQueries(0):
+            listing = self.client.get('/api/pricing/')
+            detail = self.client.get(f'/api/pricing/{self.rule.id}/')
+            quote = self.client.post('/api/pricing/calculate/', {'pricing_rule_id': self.rule.id, 'num_nights': 2}, format='json')
+            grid = self.client.get('/api/pricing/quotes/', {'nights': '2'})
+        self.assertEqual(listing.json()['count'], 1)
+        self.assertEqual(listing.json()['results'][0]['features_list'], ['Wifi', 'Parking'])
+        self.assertEqual(detail.json()['name'], "Nightly")
+        self.assertEqual(quote.json()['total_price'], 280.0)
+        self.assertEqual(grid.data['rules'][0]['totals'], [280.0])
+    
+    def test_catalog_invalidated_on_save_and_delete(self):
+        self.client.get('/api/pricing/')
+        self.rule.name = "Nightly Saver"
+        self.rule.save()
+        self.assertEqual(self.client.get('/api/pricing/').json()['results'][0]['name'], "Nightly Saver")
+        
+        self.rule.delete()
+        self.assertEqual(self.client.get('/api/pricing/').json()['count'], 0)
+        self.assertEqual(self.client.get(f'/api/pricing/{self.rule.id}/').status_code, 404)
+    
+    def test_one_cached_copy_serves_every_host(self):
+        PricingRule.objects.bulk_create(
+            PricingRule(name=f"Rule {i}", base_price_per_night=Decimal("100.00"), display_price=Decimal("100.00"))
+            for i in range(20)
+        )
+        first = self.client.get('/api/pricing/', HTTP_HOST='one.example.com')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/pricing/', HTTP_HOST='two.example.com')
+        self.assertTrue(first.json()['next'].startswith('http://one.example.com/api/pricing/'))
+        self.assertTrue(second.json()['next'].startswith('http://two.example.com/api/pricing/'))
+        self.assertNotEqual(first['ETag'], second['ETag'])
+    
+    def test_inactive_rule_not_served(self):
+        self.client.get('/api/pricing/')
+        self.rule.is_active = False
+        self.rule.save()
+        response = self.client.post('/api/pricing/calculate/', {'pricing_rule_id': self.rule.id, 'num_nights': 2}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+class ResponseCacheTestCase(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from rest_framework.test import APIClient
+        cache.clear()
+        self.client = APIClient()
+        self.amenity = Amenity.objects.create(name="Free WiFi", amenity_type="popular", icon_name="fa-wifi")
+        self.review = Review.objects.create(guest_name="Ada", rating=5, comment="Lovely", is_approved=True)
+    
+    def test_cached_response_has_etag_and_cache_control(self):
+        first = self.client.get('/api/amenities/')
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first['ETag'].startswith('"'))
+        self.assertIn('max-age=60', first['Cache-Control'])
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/amenities/')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+    
+    def test_conditional_get_returns_304_without_queries(self):
+        etag = self.client.get('/api/amenities/')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/amenities/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+    
+    def test_query_params_cached_separately(self):
+        Amenity.objects.create(name="Pool", amenity_type="facility", icon_name="fa-swimmer")
+        everything = self.client.get('/api/amenities/').json()
+        facilities = self.client.get('/api/amenities/', {'type': 'facility'}).json()
+        self.assertEqual(everything['count'], 2)
+        self.assertEqual([a['name'] for a in facilities['results']], ["Pool"])
+    
+    def test_save_retires_cached_response(self):
+        etag = self.client.get('/api/amenities/')['ETag']
+        self.amenity.name = "Fast WiFi"
+        self.amenity.save()
+        response = self.client.get('/api/amenities/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['name'], "Fast WiFi")
+    
+    def test_admin_bulk_update_retires_cached_response(self):
+        from .admin import ReviewAdmin
+        from django.contrib.admin.sites import site
+        self.assertEqual(self.client.get('/api/reviews/').json()['count'], 1)
+        ReviewAdmin(Review, site).unapprove_reviews(None, Review.objects.all())
+        self.assertEqual(self.client.get('/api/reviews/').json()['count'], 0)
+    
+    def test_site_settings_cached(self):
+        SiteSettings.load()
+        first = self.client.get('/api/settings/')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/settings/', HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        settings = SiteSettings.load()
+        settings.site_name = "Urban Oasis Killeen"
+        settings.save()
+        self.assertEqual(self.client.get('/api/settings/').json()['site_name'], "Urban Oasis Killeen")
+    
+    def test_browsable_api_not_cached(self):
+        response = self.client.get('/api/amenities/', HTTP_ACCEPT='text/html')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+
+class SiteSettingsCacheTestCase(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+    
+    def test_cached_settings_skip_database(self):
+        SiteSettings.cached()
+        with self.assertNumQueries(0):
+            settings = SiteSettings.cached()
+        self.assertEqual(settings.site_name, "Urban Oasis")
+        self.assertEqual(settings.check_in_time.hour, 15)
+    
+    def test_refreshed_on_save(self):
+        SiteSettings.cached()
+        settings = SiteSettings.load()
+        settings.phone = "+1 (555) 010-0000"
+        settings.save()
+        self.assertEqual(SiteSettings.cached().phone, "+1 (555) 010-0000")
+    
+    def test_context_processor(self):
+        from django.test import RequestFactory
+        from .context_processors import site_settings
+        context = site_settings(RequestFactory().get('/'))
+        self.assertEqual(context['site_settings'].site_name, "Urban Oasis")
+    
+    def test_confirmation_email_uses_site_times(self):
+        from datetime import time
+        from django.core import mail
+        from .email_service import send_booking_confirmation_email
+        settings = SiteSettings.load()
+        settings.check_in_time = time(16, 0)
+        settings.save()
+        booking = Booking.objects.create(
+            first_name="Tess", last_name="Times", email="tess@example.com", phone="555-0100",
+            check_in=timezone.now().date(), check_out=timezone.now().date() + timezone.timedelta(days=2),
+            num_guests=1, total_price=Decimal("200.00"),
+        )
+        with override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT):
+            self.assertTrue(send_booking_confirmation_email(booking))
+        self.assertIn("Please arrive between 4:00 PM - 9:00 PM", mail.outbox[0].body)
+        self.assertIn("Check-out time is 11:00 AM", mail.outbox[0].body)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class ImageRenditionTestCase(TestCase):
+    def _upload(self, name='living.jpg', size=(1000, 600)):
+        from io import BytesIO
+        from PIL import Image
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        buffer = BytesIO()
+        Image.new('RGB', size, (200, 120, 40)).save(buffer, 'JPEG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+    
+    def test_renditions_built_on_upload(self):
+        from django.core.files.storage import default_storage
+        from .images import rendition_formats
+        image = GalleryImage.objects.create(title="Living", image=self._upload(), alt_text="Living room")
+        image.refresh_from_db()
+        renditions = image.renditions
+        self.assertEqual(renditions['source'], image.image.name)
+        self.assertEqual((renditions['width'], renditions['height']), (1000, 600))
+        self.assertTrue(renditions['placeholder'].startswith('data:image/webp;base64,'))
+        self.assertEqual(set(renditions['sources']), set(rendition_formats()))
+        # Never upscaled: widths below the original only
+        self.assertEqual([w for _, w in renditions['sources']['webp']], [320, 640, 960])
+        for name, _ in renditions['sources']['webp']:
+            self.assertTrue(default_storage.exists(name))
+            self.assertTrue(name.endswith('.webp'))
+    
+    def test_small_image_keeps_its_width(self):
+        image = GalleryImage.objects.create(title="Tiny", image=self._upload('tiny.jpg', (200, 100)), alt_text="Tiny")
+        self.assertEqual([w for _, w in image.renditions['sources']['webp']], [200])
+    
+    def test_serializer_exposes_srcset(self):
+        from rest_framework.test import APIClient
+        GalleryImage.objects.create(title="Living", image=self._upload(), alt_text="Living room")
+        item = APIClient().get('/api/gallery/').json()['results'][0]
+        self.assertIn('-320w.webp 320w', item['srcset']['webp'])
+        self.assertTrue(item['srcset']['webp'].startswith('http://testserver/media/'))
+        self.assertEqual(item['srcset']['width'], 1000)
+    
+    def test_replaced_image_rebuilds_and_deletes_old_renditions(self):
+        from django.core.files.storage import default_storage
+        image = GalleryImage.objects.create(title="Living", image=self._upload(), alt_text="Living room")
+        old_names = [name for name, _ in image.renditions['sources']['webp']]
+        image.image = self._upload('kitchen.jpg', (700, 700))
+        image.save()
+        self.assertIn('kitchen', image.renditions['source'])
+        self.assertEqual([w for _, w in image.renditions['sources']['webp']], [320, 640])
+        for name in old_names:
+            self.assertFalse(default_storage.exists(name))
+        
+        new_names = [name for name, _ in image.renditions['sources']['webp']]
+        image.delete()
+        for name in new_names:
+            self.assertFalse(default_storage.exists(name))
+    
+    def test_forced_rebuild_keeps_files(self):
+        from django.core.files.storage import default_storage
+        from .images import refresh_renditions
+        image = GalleryImage.objects.create(title="Living", image=self._upload(), alt_text="Living room")
+        self.assertTrue(refresh_renditions(image, force=True))
+        for name, _ in image.renditions['sources']['webp']:
+            self.assertTrue(default_storage.exists(name))
+    
+    def test_pricing_rule_without_image(self):
+        rule = PricingRule.objects.create(name="Plain", base_price_per_night=Decimal("90.00"), display_price=Decimal("90.00"))
+        self.assertEqual(rule.renditions, {})
+        self.assertIsNone(PricingRuleSerializer(rule).data['srcset'])
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class GalleryImportTestCase(TestCase):
+    def _photo(self, size=(800, 500)):
+        from io import BytesIO
+        from PIL import Image
+        buffer = BytesIO()
+        Image.new('RGB', size, (90, 140, 200)).save(buffer, 'JPEG')
+        return buffer.getvalue()
+    
+    def test_infer_category(self):
+        from .gallery_import import infer_category
+        self.assertEqual(infer_category('shoot/BEDROOM1B.jpg'), ('bedroom', 'Bedroom 1B'))
+        self.assertEqual(infer_category('KITCHEN2.jpg'), ('kitchen', 'Kitchen 2'))
+        self.assertEqual(infer_category('LR3.jpeg'), ('living', 'Living Room 3'))
+        self.assertEqual(infer_category('pool_deck.png'), ('amenities', 'Pool deck'))
+        self.assertEqual(infer_category('IMG-2026.jpg'), ('other', 'IMG 2026'))
+    
+    def test_find_photos_collapses_formats_within_a_folder(self):
+        import os
+        from .gallery_import import find_photos
+        root = os.path.join(TEST_MEDIA_ROOT, 'find-photos')
+        for name in ('unit-a/LR1.jpg', 'unit-a/LR1.avif', 'unit-b/LR1.webp', 'unit-b/.hidden.jpg'):
+            os.makedirs(os.path.dirname(os.path.join(root, name)), exist_ok=True)
+            with open(os.path.join(root, name), 'wb') as f:
+                f.write(b'')
+        found = sorted(os.path.relpath(name, root) for _, name in find_photos(root))
+        self.assertEqual(found, ['unit-a/LR1.jpg', 'unit-b/LR1.webp'])
+    
+    def test_import_zip(self):
+        import os
+        import zipfile
+        from django.core.management import call_command
+        from io import StringIO
+        archive_path = os.path.join(TEST_MEDIA_ROOT, 'shoot.zip')
+        with zipfile.ZipFile(archive_path, 'w') as archive:
+            archive.writestr('shoot/BEDROOM1A.jpg', self._photo())
+            archive.writestr('shoot/BEDROOM1A.avif', b'duplicate in another format')
+            archive.writestr('shoot/KITCHEN2.jpg', self._photo((3000, 2000)))
+            archive.writestr('shoot/broken.jpg', b'not an image')
+            archive.writestr('shoot/notes.txt', b'ignored')
+        
+        out, err = StringIO(), StringIO()
+        with self.assertLogs('rentals.gallery_import', 'WARNING'):
+            call_command('import_gallery', archive_path, workers=1, max_width=1200, stdout=out, stderr=err)
+        self.assertIn('Imported 2 photo(s)', out.getvalue())
+        self.assertIn('1 failed', out.getvalue())
+        self.assertIn('broken.jpg', err.getvalue())
+        
+        bedroom, kitchen = GalleryImage.objects.order_by('order')
+        self.assertEqual((bedroom.title, bedroom.category), ('Bedroom 1A', 'bedroom'))
+        self.assertEqual((kitchen.title, kitchen.category), ('Kitchen 2', 'kitchen'))
+        self.assertEqual(kitchen.order, bedroom.order + 1)
+        # Oversized originals are downscaled before storing
+        self.assertEqual(kitchen.renditions['width'], 1200)
+        self.assertEqual(kitchen.image.width, 1200)
+        self.assertEqual(kitchen.renditions['source'], kitchen.image.name)
+        
+        with self.assertLogs('rentals.gallery_import', 'WARNING'):
+            call_command('import_gallery', archive_path, workers=1, skip_existing=True, stdout=out, stderr=StringIO())
+        self.assertEqual(GalleryImage.objects.count(), 2)
+
+
+class BookingPaginationTestCase(TestCase):
+    def setUp(self):
+        from datetime import date, timedelta
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+        self.bookings = [
+            Booking.objects.create(
+                first_name="Page", last_name=str(n), email=f"page{n}@example.com", phone="555-0100",
+                check_in=date(2027, 1, 1) + timedelta(days=3 * n),
+                check_out=date(2027, 1, 3) + timedelta(days=3 * n),
+                num_guests=1, total_price=Decimal("200.00"),
+            )
+            for n in range(5)
+        ]
+    
+    def test_cursor_pages_newest_first(self):
+        seen = []
+        url = '/api/bookings/?page_size=2'
+        while url:
+            with self.assertNumQueries(1):
+                page = self.client.get(url).json()
+            self.assertNotIn('count', page)
+            self.assertLessEqual(len(page['results']), 2)
+            seen.extend(item['id'] for item in page['results'])
+            url = page['next']
+        self.assertEqual(seen, [b.id for b in reversed(self.bookings)])
+    
+    def test_sparse_fieldset(self):
+        page = self.client.get('/api/bookings/', {'fields': 'id,check_in,bogus'}).json()
+        self.assertEqual(set(page['results'][0]), {'id', 'check_in'})
+        detail = self.client.get(f'/api/bookings/{self.bookings[0].id}/', {'fields': 'status'}).json()
+        self.assertEqual(detail, {'status': 'pending'})
+    
+    def test_unknown_fields_only_leave_output_unfiltered(self):
+        page = self.client.get('/api/bookings/', {'fields': 'bogus'}).json()
+        self.assertIn('check_in', page['results'][0])
+        self.assertIn('email', page['results'][0])
+    
+    def test_fields_ignored_on_write(self):
+        response = self.client.post('/api/bookings/?fields=id', {
+            'first_name': 'Write', 'last_name': 'Through', 'email': 'w@example.com', 'phone': '555-0100',
+            'check_in': '2027-03-01', 'check_out': '2027-03-03', 'num_guests': 1, 'total_price': '200.00',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['first_name'], 'Write')
+    
+    def test_sparse_fieldset_on_cached_catalogs(self):
+        from django.core.cache import cache
+        cache.clear()
+        rule = PricingRule.objects.create(name="Nightly", base_price_per_night=Decimal("99.00"), display_price=Decimal("99.00"))
+        Amenity.objects.create(name="Free WiFi", amenity_type="popular", icon_name="fa-wifi")
+        self.client.get('/api/pricing/')
+        pricing = self.client.get('/api/pricing/', {'fields': 'id,name'}).json()
+        self.assertEqual(pricing['results'], [{'id': rule.id, 'name': 'Nightly'}])
+        self.assertEqual(self.client.get(f'/api/pricing/{rule.id}/', {'fields': 'name'}).json(), {'name': 'Nightly'})
+        self.assertIn('base_price_per_night', self.client.get('/api/pricing/').json()['results'][0])
+        amenities = self.client.get('/api/amenities/', {'fields': 'name'}).json()
+        self.assertEqual(amenities['results'], [{'name': 'Free WiFi'}])
+
+
+class BookingExportTestCase(TestCase):
+    def setUp(self):
+        from datetime import date
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        for n, (booking_status, check_in, check_out, total) in enumerate([
+            ('confirmed', date(2027, 1, 1), date(2027, 1, 5), '400.00'),
+            ('cancelled', date(2027, 2, 1), date(2027, 2, 3), '200.00'),
+            ('confirmed', date(2027, 3, 1), date(2027, 3, 4), '330.00'),
+        ]):
+            Booking.objects.create(
+                first_name="Export", last_name=str(n), email=f"export{n}@example.com", phone="555-0100",
+                check_in=check_in, check_out=check_out, num_guests=2,
+                total_price=Decimal(total), status=booking_status,
+            )
+    
+    def _export(self, fmt, **params):
+        response = self.client.get(f'/api/bookings/export/{fmt}/', params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+    
+    def test_requires_staff(self):
+        self.assertIn(self.client.get('/api/bookings/export/csv/').status_code, (401, 403))
+    
+    def test_csv_export_with_filters_and_totals(self):
+        import csv
+        import io
+        self.client.force_authenticate(self.admin)
+        rows = list(csv.DictReader(io.StringIO(self._export('csv', status='confirmed', to='2027-02-28'))))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['num_nights'], '4')
+        self.assertEqual(rows[0]['nightly_rate'], '100.00')
+        self.assertEqual(rows[-1]['id'], 'TOTAL')
+        self.assertEqual(rows[-1]['total_price'], '400.00')
+    
+    def test_csv_export_neutralises_formulas(self):
+        import csv
+        import io
+        Booking.objects.filter(last_name='0').update(
+            first_name='=HYPERLINK("http://evil.example","x")', last_name='@SUM(A1)', phone='+1 555 0100',
+        )
+        self.client.force_authenticate(self.admin)
+        row = next(csv.DictReader(io.StringIO(self._export('csv'))))
+        self.assertEqual(row['first_name'], '\'=HYPERLINK("http://evil.example","x")')
+        self.assertEqual(row['last_name'], "'@SUM(A1)")
+        self.assertEqual(row['phone'], "'+1 555 0100")
+        self.assertEqual(row['email'], 'export0@example.com')
+    
+    def test_ndjson_export(self):
+        import json
+        self.client.force_authenticate(self.admin)
+        lines = [json.loads(line) for line in self._export('ndjson', status='confirmed').splitlines()]
+        self.assertEqual([line['num_nights'] for line in lines[:-1]], [4, 3])
+        self.assertEqual(lines[-1]['summary'], {
+            'bookings': 2, 'num_nights': 7, 'total_price': '730.00', 'average_nightly_rate': '104.29',
+        })
+    
+    def test_invalid_filters(self):
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get('/api/bookings/export/csv/', {'status': 'lost'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/bookings/export/csv/', {'from': 'soon'}).status_code, 400)
+    
+    def test_admin_action(self):
+        self.client.force_login(self.admin)
+        response = self.client.post('/admin/rentals/booking/', {
+            'action': 'export_csv',
+            '_selected_action': list(Booking.objects.values_list('id', flat=True)),
+        })
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 5)
+
+
+class SQLiteJournalModeTestCase(TestCase):
+    def _journal_mode(self):
+        from django.db import connections
+        from django.db.backends.sqlite3.base import DatabaseWrapper
+        path = tempfile.mktemp(suffix='.sqlite3', dir=TEST_MEDIA_ROOT)
+        wrapper = DatabaseWrapper({**connections['default'].settings_dict, 'NAME': path}, alias='journal_test')
+        try:
+            with wrapper.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                return cursor.fetchone()[0]
+        finally:
+            wrapper.close()
+    
+    def test_file_databases_use_wal(self):
+        self.assertEqual(self._journal_mode(), 'wal')
+    
+    @override_settings(SQLITE_WAL=False)
+    def test_wal_can_be_disabled(self):
+        self.assertEqual(self._journal_mode(), 'delete')
+
+
+class RequestMetricsTestCase(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        Amenity.objects.create(name="Free WiFi", amenity_type="popular", icon_name="fa-wifi")
+    
+    def test_server_timing_header(self):
+        response = self.client.get('/api/amenities/')
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertRegex(timing, r'total;dur=[\d.]+$')
+        self.assertNotIn('Server-Timing', self.client.get('/').headers)
+    
+    def test_spans_record_only_inside_requests(self):
+        from . import metrics
+        with metrics.span('pdf'):
+            pass
+        recorder, token = metrics.start_request()
+        try:
+            with metrics.span('pdf'):
+                pass
+            with metrics.span('pdf'):
+                pass
+        finally:
+            metrics.end_request(token)
+        self.assertEqual(recorder.spans['pdf'][1], 2)
+    
+    @override_settings(METRICS_TOKEN='scrape-me')
+    def test_metrics_endpoint(self):
+        self.client.get('/api/amenities/')
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        body = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-me').content.decode()
+        self.assertIn('# TYPE rentals_request_duration_seconds histogram', body)
+        self.assertIn('rentals_request_duration_seconds_bucket{view="amenities-list",method="GET",le="+Inf"}', body)
+        self.assertRegex(body, r'rentals_requests_total\{view="amenities-list",method="GET",status="200"\} \d+')
+        self.assertIn('rentals_span_duration_seconds_count{view="amenities-list",span="db"}', body)
+
+    
+    @override_settings(METRICS_TOKEN='scrape-me')
+    def test_unknown_methods_share_one_label(self):
+        self.client.generic('FROBNICATE', '/api/amenities/')
+        self.client.generic('PROPFIND', '/api/amenities/')
+        body = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-me').content.decode()
+        self.assertNotIn('FROBNICATE', body)
+        self.assertNotIn('PROPFIND', body)
+        self.assertRegex(body, r'rentals_requests_total\{view="amenities-list",method="other",status="405"\} \d+')
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET='whsec_test')
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class StripeWebhookTestCase(TestCase):
+    def setUp(self):
+        from datetime import date
+        self.booking = Booking.objects.create(
+            first_name="Hook", last_name="Guest", email="hook@example.com", phone="555-0100",
+            check_in=date(2027, 5, 1), check_out=date(2027, 5, 3), num_guests=1, total_price=Decimal("300.00"),
+            payment_method='debitcard', payment_intent_id='pi_test',
+        )
+    
+    def _deliver(self, event_id, event_type='payment_intent.succeeded', booking_id=None,
+                 intent_id='pi_test', amount_received=30000):
+        import hashlib
+        import hmac
+        import json
+        import time
+        payload = json.dumps({
+            'id': event_id, 'object': 'event', 'type': event_type, 'created': 1790000000,
+            'data': {'object': {'id': intent_id, 'object': 'payment_intent',
+                                'amount_received': amount_received, 'currency': 'usd',
+                                'metadata': {'booking_id': str(booking_id or self.booking.id)}}},
+        })
+        timestamp = int(time.time())
+        signature = hmac.new(b'whsec_test', f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+        return self.client.post(
+            '/api/stripe-webhook/', payload, content_type='application/json',
+            HTTP_STRIPE_SIGNATURE=f"t={timestamp},v1={signature}",
+        )
+    
+    def test_webhook_records_and_worker_confirms(self):
+        from .models import StripeEvent
+        from . import stripe_events
+        with self.assertNumQueries(2):
+            self.assertEqual(self._deliver('evt_1').status_code, 200)
+        # Stripe retries: acknowledged again, recorded once
+        self.assertEqual(self._deliver('evt_1').status_code, 200)
+        self.assertEqual(StripeEvent.objects.get().status, 'pending')
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, 'pending')
+        
+        self._deliver('evt_2', event_type='charge.updated')
+        self.assertEqual(stripe_events.process_pending(), (1, 1, 0))
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, 'confirmed')
+        self.assertEqual(StripeEvent.objects.get(event_id='evt_1').status, 'processed')
+        self.assertEqual(StripeEvent.objects.get(event_id='evt_2').status, 'ignored')
+        self.assertEqual(stripe_events.process_pending(), (0, 0, 0))
+    
+    def test_succeeded_payment_queues_confirmation_and_receipt(self):
+        from .models import EmailJob
+        from . import stripe_events
+        Booking.objects.filter(id=self.booking.id).update(payment_method='debitcard', payment_intent_id='pi_test')
+        self._deliver('evt_paid')
+        self.assertFalse(EmailJob.objects.exists())
+        stripe_events.process_pending()
+        jobs = {job.kind: job for job in EmailJob.objects.filter(booking=self.booking)}
+        self.assertEqual(set(jobs), {'booking_confirmation', 'payment_receipt'})
+        self.assertEqual(jobs['payment_receipt'].payload['payment_id'], 'pi_test')
+        
+        # A replayed event finds the booking confirmed already and sends nothing
+        stripe_events.requeue(stripe_events.StripeEvent.objects.all())
+        stripe_events.process_pending()
+        self.assertEqual(EmailJob.objects.count(), 2)
+    
+    def test_failing_event_does_not_hold_back_its_batch(self):
+        from datetime import date
+        from unittest import mock
+        from .models import StripeEvent
+        from . import stripe_events
+        other = Booking.objects.create(
+            first_name="Other", last_name="Guest", email="other@example.com", phone="555-0101",
+            check_in=date(2027, 6, 1), check_out=date(2027, 6, 3), num_guests=1, total_price=Decimal("300.00"),
+            payment_method='debitcard', payment_intent_id='pi_other',
+        )
+        self._deliver('evt_good')
+        self._deliver('evt_bad', booking_id=other.id, intent_id='pi_other')
+        
+        def enqueue(booking):
+            if booking.id == other.id:
+                raise RuntimeError("mail queue down")
+        with mock.patch('rentals.stripe_events.enqueue_booking_emails', side_effect=enqueue), \
+                self.assertLogs('rentals.stripe_events', 'WARNING'):
+            self.assertEqual(stripe_events.process_pending(), (1, 0, 0))
+        
+        self.booking.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.booking.status, other.status), ('confirmed', 'pending'))
+        good, bad = StripeEvent.objects.get(event_id='evt_good'), StripeEvent.objects.get(event_id='evt_bad')
+        self.assertEqual((good.status, good.attempts), ('processed', 1))
+        self.assertEqual((bad.status, bad.attempts, bad.last_error), ('pending', 1, 'mail queue down'))
+        
+        self.assertEqual(stripe_events.process_pending(), (1, 0, 0))
+        other.refresh_from_db()
+        self.assertEqual(other.status, 'confirmed')
+    
+    def test_transition_prunes_stale_invoices(self):
+        from django.core.files.storage import default_storage
+        from .invoice_cache import get_invoice_pdf, invoice_path
+        from . import stripe_events
+        get_invoice_pdf(self.booking)
+        stale = invoice_path(self.booking)
+        self._deliver('evt_invoice')
+        stripe_events.process_pending()
+        self.assertFalse(default_storage.exists(stale))
+    
+    def test_intent_must_belong_to_the_booking(self):
+        from .models import EmailJob, StripeEvent
+        from . import stripe_events
+        # Someone else's intent tagged with this booking's id
+        self._deliver('evt_forged', intent_id='pi_other')
+        with self.assertLogs('rentals.stripe_events', 'WARNING'):
+            self.assertEqual(stripe_events.process_pending(), (0, 1, 0))
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, 'pending')
+        self.assertEqual(StripeEvent.objects.get().status, 'ignored')
+        self.assertFalse(EmailJob.objects.exists())
+    
+    def test_short_payment_leaves_booking_pending(self):
+        from . import stripe_events
+        self._deliver('evt_short', amount_received=50)
+        with self.assertLogs('rentals.stripe_events', 'WARNING'):
+            stripe_events.process_pending()
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, 'pending')
+    
+    def test_bookings_without_intent_are_not_confirmed(self):
+        from . import stripe_events
+        Booking.objects.filter(id=self.booking.id).update(payment_method='zelle', payment_intent_id='')
+        self._deliver('evt_zelle', intent_id='')
+        with self.assertLogs('rentals.stripe_events', 'WARNING'):
+            stripe_events.process_pending()
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, 'pending')
+    
+    def test_transitions_only_from_pending(self):
+        from . import stripe_events
+        self.booking.status = 'cancelled'
+        self.booking.save()
+        self._deliver('evt_late')
+        stripe_events.process_pending()
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, 'cancelled')
+    
+    def test_replay_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from .models import StripeEvent
+        self._deliver('evt_replay')
+        call_command('process_stripe_events', '--once', stdout=StringIO())
+        Booking.objects.filter(id=self.booking.id).update(status='pending')
+        out = StringIO()
+        call_command('replay_stripe_events', 'evt_replay', '--process', stdout=out)
+        self.assertIn('Requeued 1 event(s)', out.getvalue())
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, 'confirmed')
+        self.assertEqual(StripeEvent.objects.get().attempts, 1)
+    
+    def test_bad_signature(self):
+        response = self.client.post('/api/stripe-webhook/', '{}', content_type='application/json',
+                                    HTTP_STRIPE_SIGNATURE='t=1,v1=bad')
+        self.assertEqual(response.status_code, 400)
+
+
+class AsyncStripeEndpointsTestCase(TestCase):
+    """Checkout intents against benchmarks/stripe_stub.py, with 200ms of simulated latency"""
+    
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from benchmarks import stripe_stub
+        cls.stub = stripe_stub.start(latency=0.2)
+        cls.settings_override = override_settings(
+            STRIPE_SECRET_KEY='sk_test_stub',
+            STRIPE_PUBLISHABLE_KEY='pk_test_stub',
+            STRIPE_API_BASE=f"http://127.0.0.1:{cls.stub.server_address[1]}",
+        )
+        cls.settings_override.enable()
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.stub.shutdown()
+        super().tearDownClass()
+    
+    def setUp(self):
+        PricingRule.objects.create(
+            name="Async Rate", season="regular", base_price_per_night=Decimal("100.00"),
+            cleaning_fee=Decimal("50.00"), display_price=Decimal("100.00"), is_active=True,
+        )
+    
+    def _checkout_payload(self, n=0):
+        from datetime import date, timedelta
+        check_in = date(2027, 9, 1) + timedelta(days=3 * n)
+        return {
+            'first_name': 'Async', 'last_name': f'Guest {n}', 'email': f'async{n}@example.com', 'phone': '555-0100',
+            'check_in': check_in.isoformat(), 'check_out': (check_in + timedelta(days=2)).isoformat(), 'num_guests': 1,
+        }
+    
+    async def test_checkouts_overlap(self):
+        import asyncio
+        import time
+        from django.test import AsyncClient
+        client = AsyncClient()
+        started = time.perf_counter()
+        responses = await asyncio.gather(*[
+            client.post('/api/checkout/', self._checkout_payload(n), content_type='application/json')
+            for n in range(20)
+        ])
+        elapsed = time.perf_counter() - started
+        self.assertEqual({response.status_code for response in responses}, {201})
+        self.assertTrue(all(response.json()['payment']['client_secret'].startswith('pi_stub_') for response in responses))
+        # Twenty sequential Stripe calls would take at least 4s
+        self.assertLess(elapsed, 2.0)
+    
+    def test_wsgi_requests_use_blocking_client(self):
+        from . import async_views
+        async_views._async_clients.clear()
+        response = self.client.post('/api/checkout/', self._checkout_payload(), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.json()['payment']['client_secret'].startswith('pi_stub_'))
+        # No httpx pool left behind in the request's throwaway event loop
+        self.assertEqual(len(async_views._async_clients), 0)
+    
+    async def test_asgi_requests_share_the_loop_client(self):
+        from django.test import AsyncClient
+        from . import async_views
+        client = AsyncClient()
+        stripe_clients = []
+        for n in range(2):
+            response = await client.post('/api/checkout/', self._checkout_payload(n), content_type='application/json')
+            self.assertEqual(response.status_code, 201)
+            stripe_clients.append(async_views.get_async_stripe_client())
+        self.assertIs(stripe_clients[0], stripe_clients[1])
+    
+    def test_client_priced_intents_removed(self):
+        response = self.client.post('/api/create-payment-intent/', {'amount_cents': 50}, content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+    
+    def test_stripe_config(self):
+        self.assertEqual(self.client.get('/api/stripe-config/').json(), {'publishableKey': 'pk_test_stub'})
+    
+    async def test_async_availability(self):
+        from datetime import date
+        from django.test import AsyncClient
+        await Booking.objects.acreate(
+            first_name="Async", last_name="Guest", email="async@example.com", phone="555-0100",
+            check_in=date(2027, 8, 1), check_out=date(2027, 8, 4), num_guests=1, total_price=Decimal("300.00"),
+        )
+        response = await AsyncClient().get('/api/bookings/availability/', {'check_in': '2027-08-03', 'check_out': '2027-08-05'})
+        self.assertEqual(response.json(), {'available': False, 'overlapping_bookings': 1})
+
+
+class CheckoutTestCase(TestCase):
+    """POST /api/checkout/ against benchmarks/stripe_stub.py"""
+    
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from benchmarks import stripe_stub
+        cls.stub = stripe_stub.start()
+        cls.stub_base = f"http://127.0.0.1:{cls.stub.server_address[1]}"
+        cls.settings_override = override_settings(
+            STRIPE_SECRET_KEY='sk_test_stub',
+            STRIPE_PUBLISHABLE_KEY='pk_test_stub',
+            STRIPE_API_BASE=cls.stub_base,
+        )
+        cls.settings_override.enable()
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.stub.shutdown()
+        super().tearDownClass()
+    
+    def setUp(self):
+        self.rule = PricingRule.objects.create(
+            name="Checkout Rate", season="regular", base_price_per_night=Decimal("100.00"),
+            weekly_discount_percent=Decimal("10.00"), monthly_discount_percent=Decimal("20.00"),
+            cleaning_fee=Decimal("50.00"), service_fee_percent=Decimal("5.00"),
+            display_price=Decimal("100.00"), is_active=True,
+        )
+        self.payload = {
+            'first_name': 'Card', 'last_name': 'Guest', 'email': 'card@example.com', 'phone': '555-0100',
+            'check_in': '2027-09-01', 'check_out': '2027-09-04', 'num_guests': 2,
+            'pricing_rule_id': self.rule.id,
+            # Ignored: the price is computed by the server
+            'total_price': '1.00', 'status': 'confirmed',
+        }
+    
+    def _checkout(self, **overrides):
+        return self.client.post('/api/checkout/', {**self.payload, **overrides}, content_type='application/json')
+    
+    def test_checkout_prices_reserves_and_creates_intent(self):
+        from .models import EmailJob
+        response = self._checkout()
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        
+        booking = Booking.objects.get(id=data['booking']['id'])
+        # 3 nights x 100 + 50 cleaning + 5% service
+        self.assertEqual(booking.total_price, Decimal('365.00'))
+        self.assertEqual((booking.status, booking.payment_method), ('pending', 'debitcard'))
+        self.assertEqual(booking.pricing_rule, self.rule)
+        self.assertEqual(data['payment']['amount_cents'], 36500)
+        self.assertTrue(data['payment']['client_secret'].startswith('pi_stub_'))
+        self.assertEqual(data['publishableKey'], 'pk_test_stub')
+        self.assertEqual(data['pricing']['total_price'], 365.0)
+        self.assertEqual(booking.payment_intent_id, data['payment']['payment_intent_id'])
+        self.assertIsNotNone(data['payment']['hold_expires_at'])
+        # Emails wait for the payment_intent.succeeded webhook
+        self.assertFalse(EmailJob.objects.exists())
+        
+        # The nights are held: a second checkout for the same dates is refused
+        response = self._checkout(email='other@example.com')
+        self.assertEqual(response.status_code, 409)
+    
+    def test_validation_errors(self):
+        response = self._checkout(check_out='2027-09-01')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fields', response.json())
+        self.assertEqual(self._checkout(pricing_rule_id=999999).status_code, 404)
+        self.assertFalse(Booking.objects.exists())
+    
+    async def test_retry_with_idempotency_key_creates_one_intent(self):
+        from django.test import AsyncClient
+        client = AsyncClient()
+        responses = [
+            await client.post('/api/checkout/', self.payload, content_type='application/json',
+                              headers={'Idempotency-Key': 'checkout-retry'})
+            for _ in range(2)
+        ]
+        self.assertEqual([response.status_code for response in responses], [201, 201])
+        self.assertEqual(responses[1]['Idempotent-Replayed'], 'true')
+        self.assertEqual(responses[0].json()['payment'], responses[1].json()['payment'])
+        self.assertEqual(await Booking.objects.acount(), 1)
+    
+    def test_stripe_failure_releases_dates(self):
+        from .models import EmailJob
+        with override_settings(STRIPE_API_BASE=f"{self.stub_base}/missing"):
+            response = self._checkout()
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(Booking.objects.get().status, 'cancelled')
+        self.assertFalse(EmailJob.objects.exists())
+        self.assertEqual(self._checkout().status_code, 201)
+
+
+    def test_unpaid_hold_expires(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .checkout import expire_holds
+        booking = Booking.objects.get(id=self._checkout().json()['booking']['id'])
+        self.assertEqual(expire_holds(), 0)
+        
+        Booking.objects.filter(id=booking.id).update(hold_expires_at=timezone.now() - timedelta(minutes=1))
+        # Stripe unreachable: the intent may still be paid, so the hold stays
+        with override_settings(STRIPE_API_BASE=f"{self.stub_base}/missing"):
+            self.assertEqual(expire_holds(), 0)
+        self.assertEqual(Booking.objects.get(id=booking.id).status, 'pending')
+        
+        self.assertEqual(expire_holds(), 1)
+        self.assertEqual(Booking.objects.get(id=booking.id).status, 'cancelled')
+        self.assertIn(booking.payment_intent_id, self.stub.cancelled_intents)
+        self.assertEqual(self._checkout().status_code, 201)
+    
+    def test_worker_expires_holds(self):
+        from datetime import timedelta
+        from io import StringIO
+        from django.core.management import call_command
+        from django.utils import timezone
+        self._checkout()
+        Booking.objects.update(hold_expires_at=timezone.now() - timedelta(minutes=1))
+        out = StringIO()
+        call_command('process_stripe_events', '--once', stdout=out)
+        self.assertIn('Cancelled 1 unpaid checkout(s)', out.getvalue())
+        self.assertEqual(Booking.objects.get().status, 'cancelled')
+
+
+class IdempotencyTestCase(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.payload = {
+            'first_name': 'Retry', 'last_name': 'Guest', 'email': 'retry@example.com', 'phone': '555-0100',
+            'check_in': '2027-10-01', 'check_out': '2027-10-03', 'num_guests': 1, 'total_price': '250.00',
+        }
+    
+    def _post(self, key='key-1', **overrides):
+        return self.client.post('/api/bookings/', {**self.payload, **overrides}, content_type='application/json',
+                                HTTP_IDEMPOTENCY_KEY=key)
+    
+    def test_retry_replays_stored_response(self):
+        from .models import EmailJob
+        first = self._post()
+        self.assertEqual(first.status_code, 201)
+        self.assertFalse(first.has_header('Idempotent-Replayed'))
+        
+        # A retry is answered from the cache without touching the database
+        with self.assertNumQueries(0):
+            retry = self._post()
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(EmailJob.objects.filter(kind='booking_confirmation').count(), 1)
+    
+    def test_replay_from_database_when_cache_is_cold(self):
+        from django.core.cache import cache
+        first = self._post()
+        cache.clear()
+        retry = self._post()
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json()['id'], first.json()['id'])
+    
+    def test_key_reused_for_different_request(self):
+        self._post()
+        response = self._post(email='someone-else@example.com')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Booking.objects.count(), 1)
+    
+    def test_concurrent_duplicate_gets_conflict(self):
+        from datetime import timedelta
+        from django.test import RequestFactory
+        from .models import IdempotencyRecord
+        from . import idempotency
+        # Same request, first attempt still running
+        request = RequestFactory().post('/api/bookings/', self.payload, content_type='application/json')
+        IdempotencyRecord.objects.create(
+            key='key-1', path='/api/bookings/', fingerprint=idempotency.fingerprint(request),
+            locked_at=timezone.now(), expires_at=timezone.now() + timedelta(hours=1),
+        )
+        response = self._post()
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertFalse(Booking.objects.exists())
+    
+    def test_expired_key_runs_again(self):
+        from django.core.cache import cache
+        from .models import IdempotencyRecord
+        self._post()
+        cache.clear()
+        IdempotencyRecord.objects.update(expires_at=timezone.now())
+        response = self._post(check_in='2027-11-01', check_out='2027-11-03')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Booking.objects.count(), 2)
+        self.assertEqual(IdempotencyRecord.objects.get().status, 'completed')
+    
+    def test_errors_are_not_stored(self):
+        response = self._post(check_out='2027-10-01')
+        self.assertEqual(response.status_code, 400)
+        # The corrected request can reuse the key
+        self.assertEqual(self._post().status_code, 201)
+    
+    def test_requests_without_key_are_untouched(self):
+        from .models import IdempotencyRecord
+        self.client.post('/api/bookings/', self.payload, content_type='application/json')
+        self.client.post('/api/bookings/', {**self.payload, 'check_in': '2027-12-01', 'check_out': '2027-12-02'},
+                         content_type='application/json')
+        self.assertEqual(Booking.objects.count(), 2)
+        self.assertFalse(IdempotencyRecord.objects.exists())
+
+
+class StaticAssetsTestCase(TestCase):
+    """collectstatic output served by PrecompressedStaticMiddleware"""
+    
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from io import StringIO
+        from django.core.management import call_command
+        cls.static_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(STATIC_ROOT=cls.static_root)
+        cls.settings_override.enable()
+        # Only the site's own assets; the admin and DRF files just slow this down
+        call_command('collectstatic', '--noinput', '--ignore', 'admin', '--ignore', 'rest_framework', stdout=StringIO())
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.static_root, ignore_errors=True)
+        super().tearDownClass()
+    
+    def setUp(self):
+        from django.contrib.staticfiles.storage import staticfiles_storage
+        from . import static_assets
+        static_assets.clear_cache()
+        self.addCleanup(static_assets.clear_cache)
+        self.style_url = staticfiles_storage.url('static/style.css')
+    
+    def test_pages_link_fingerprinted_assets(self):
+        import re
+        self.assertRegex(self.style_url, r'^/static/static/style\.[0-9a-f]{12}\.css$')
+        html = self.client.get('/').content.decode()
+        self.assertIn(self.style_url, html)
+        self.assertTrue(re.search(r'/static/images/urban_oasis\.[0-9a-f]{12}\.png', html))
+    
+    def test_serves_best_precompressed_variant(self):
+        import gzip
+        import brotli
+        with open(f"{self.static_root}/{self.style_url[len('/static/'):]}", 'rb') as f:
+            original = f.read()
+        
+        response = self.client.get(self.style_url, HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(b''.join(response.streaming_content)), original)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['Content-Type'], 'text/css; charset=utf-8')
+        
+        response = self.client.get(self.style_url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), original)
+        
+        response = self.client.get(self.style_url)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(int(response['Content-Length']), len(original))
+    
+    def test_revalidation_and_unhashed_names(self):
+        response = self.client.get(self.style_url, HTTP_ACCEPT_ENCODING='br')
+        response = self.client.get(self.style_url, HTTP_ACCEPT_ENCODING='br', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        
+        response = self.client.get('/static/static/style.css')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+        
+        # Images are not compressed again
+        image = self.client.get('/static/images/favicon.png', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertFalse(image.has_header('Content-Encoding'))
+        self.assertFalse(image.has_header('Vary'))
+    
+    def test_missing_files_fall_through(self):
+        self.assertEqual(self.client.get('/static/static/missing.css').status_code, 404)
+        self.assertEqual(self.client.get('/static/../manage.py').status_code, 404)
+    
+    async def test_async_serving(self):
+        from django.test import AsyncClient
+        response = await AsyncClient().get(self.style_url, headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(response.content), int(response['Content-Length']))
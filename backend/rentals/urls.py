@@ -4,7 +4,8 @@ from .views import (
     PricingRuleViewSet, GalleryImageViewSet, AmenityViewSet,
     BookingViewSet, ReviewViewSet, SiteSettingsViewSet
 )
-from .views import StripeConfigView, CreatePaymentIntentView, stripe_webhook
+from .views import stripe_webhook
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'pricing', PricingRuleViewSet, basename='pricing')
@@ -15,8 +16,12 @@ router.register(r'reviews', ReviewViewSet, basename='reviews')
 router.register(r'settings', SiteSettingsViewSet, basename='settings')
 
 urlpatterns = [
+    # Async endpoints (see async_views.py); listed before the router so they
+    # take the bookings/ and pricing/ sub-paths
+    path('bookings/availability/', async_views.availability, name='bookings-availability'),
+    path('pricing/calculate/', async_views.calculate_price, name='pricing-calculate'),
     path('', include(router.urls)),
-    path('stripe-config/', StripeConfigView.as_view(), name='stripe-config'),
-    path('create-payment-intent/', CreatePaymentIntentView.as_view(), name='create-payment-intent'),
+    path('stripe-config/', async_views.stripe_config, name='stripe-config'),
+    path('checkout/', async_views.checkout, name='checkout'),
     path('stripe-webhook/', stripe_webhook, name='stripe-webhook'),
 ]
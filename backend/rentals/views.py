@@ -1,7 +1,7 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser, SAFE_METHODS
 from django.utils import timezone
 from .models import (
     PricingRule, GalleryImage, Amenity, 
@@ -11,72 +11,183 @@ from .serializers import (
     PricingRuleSerializer, GalleryImageSerializer, AmenitySerializer,
     BookingSerializer, ReviewSerializer, SiteSettingsSerializer
 )
-from .email_service import send_booking_confirmation_email, send_payment_receipt_email
+from .outbox import enqueue_booking_emails
+from . import exports, metrics, occupancy, stripe_events
+from .pricing import (
+    PriceGrid, MAX_GRID_NIGHTS, PricingUnavailable,
+    get_active_rules, get_rule, price_stay
+)
+from . import caching, pricing
+from .caching import CachedResponseMixin
+from .pagination import BookingCursorPagination
 from django.conf import settings
-from rest_framework.views import APIView
+from django.db import transaction
 from django.views.decorators.csrf import csrf_exempt
-from django.utils.decorators import method_decorator
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 import stripe
+import hashlib
+import hmac
 import json
-from datetime import datetime
-import logging
+from datetime import date, timedelta
+
+# Longest range served by the bookings calendar endpoint
+MAX_CALENDAR_RANGE = timedelta(days=731)
 
 
-class PricingRuleViewSet(viewsets.ReadOnlyModelViewSet):
+class SparseFieldsetViewMixin:
+    """
+    Pass `?fields=a,b` on GET requests to the serializer (see
+    SparseFieldsetMixin) so responses only carry the named fields.
+    """
+    
+    def sparse_fields(self):
+        request = getattr(self, 'request', None)
+        if request is None or request.method not in SAFE_METHODS:
+            return None
+        fields = [name.strip() for name in request.query_params.get('fields', '').split(',') if name.strip()]
+        return fields or None
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        fields = self.sparse_fields()
+        if fields:
+            context['fields'] = fields
+        return context
+
+
+class PricingRuleViewSet(SparseFieldsetViewMixin, CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for pricing rules
     """
     queryset = PricingRule.objects.filter(is_active=True)
     serializer_class = PricingRuleSerializer
     permission_classes = [AllowAny]
+    cache_models = [PricingRule]
+    
+    def get_catalog(self):
+        """Serialized active rules, cached until a rule is saved or deleted"""
+        # image_url and srcset are absolute: cache them with the origin
+        # swapped out, so one copy serves every host
+        origin = caching.request_origin(self.request)
+        catalog = caching.get_or_build(
+            pricing.CATALOG, 'catalog',
+            lambda: caching.without_origin([
+                dict(item) for item in
+                PricingRuleSerializer(get_active_rules(), many=True, context={'request': self.request}).data
+            ], origin)
+        )
+        return caching.with_origin(catalog, origin)
+    
+    def sparse_catalog(self):
+        """The cached catalog, limited to the ?fields= requested"""
+        catalog = self.get_catalog()
+        fields = self.sparse_fields()
+        if fields:
+            catalog = [{name: item[name] for name in fields if name in item} for item in catalog]
+        return catalog
     
-    @action(detail=False, methods=['post'])
-    def calculate(self, request):
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, self._list_catalog)
+    
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, self._retrieve_from_catalog)
+    
+    def _list_catalog(self):
+        catalog = self.sparse_catalog()
+        page = self.paginate_queryset(catalog)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(catalog)
+    
+    def _retrieve_from_catalog(self):
+        fields = self.sparse_fields()
+        for item in self.get_catalog():
+            if str(item['id']) == str(self.kwargs.get('pk')):
+                if fields:
+                    item = {name: item[name] for name in fields if name in item}
+                return Response(item)
+        return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+    
+    @action(detail=False, methods=['get'])
+    def quotes(self, request):
         """
-        Calculate total price for a stay
-        Expected payload: {
-            "pricing_rule_id": 1,
-            "num_nights": 7,
-            "num_guests": 2
-        }
+        Total price for every active rule and stay length
+        Query params: nights=1,2,7 or max_nights=30 (default: 1 to 30 nights)
         """
-        pricing_rule_id = request.data.get('pricing_rule_id')
-        num_nights = request.data.get('num_nights')
-        num_guests = request.data.get('num_guests', 1)
-        
         try:
-            pricing_rule = PricingRule.objects.get(id=pricing_rule_id, is_active=True)
-            total = pricing_rule.calculate_total(num_nights, num_guests)
-            
-            return Response({
-                'pricing_rule': PricingRuleSerializer(pricing_rule).data,
-                'num_nights': num_nights,
-                'num_guests': num_guests,
-                'base_total': float(pricing_rule.base_price_per_night) * num_nights,
-                'cleaning_fee': float(pricing_rule.cleaning_fee),
-                'service_fee': float(pricing_rule.service_fee_percent),
-                'total_price': total
-            })
-        except PricingRule.DoesNotExist:
+            if request.query_params.get('nights'):
+                nights = [int(n) for n in request.query_params['nights'].split(',')]
+            else:
+                nights = list(range(1, int(request.query_params.get('max_nights', 30)) + 1))
+        except ValueError:
             return Response(
-                {'error': 'Pricing rule not found'},
-                status=status.HTTP_404_NOT_FOUND
+                {'error': 'nights and max_nights must be whole numbers'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-        except Exception as e:
+        if not nights or min(nights) < 1 or max(nights) > MAX_GRID_NIGHTS:
             return Response(
-                {'error': str(e)},
+                {'error': f'Stay lengths must be between 1 and {MAX_GRID_NIGHTS} nights'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        rules = get_active_rules()
+        totals = PriceGrid(rules).totals(nights)
+        return Response({
+            'nights': nights,
+            'rules': [
+                {'id': rule.id, 'name': rule.name, 'totals': row}
+                for rule, row in zip(rules, totals)
+            ],
+        })
 
-class GalleryImageViewSet(viewsets.ReadOnlyModelViewSet):
+    @action(detail=False, methods=['get'])
+    def stay(self, request):
+        """
+        Price a stay across the seasonal rules covering its nights
+        Query params: check_in, check_out (YYYY-MM-DD), optional pricing_rule_id
+        for nights outside every season
+        """
+        try:
+            check_in = date.fromisoformat(request.query_params.get('check_in', ''))
+            check_out = date.fromisoformat(request.query_params.get('check_out', ''))
+        except ValueError:
+            return Response(
+                {'error': 'check_in and check_out must be YYYY-MM-DD dates'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if check_out <= check_in:
+            return Response(
+                {'error': 'check_out must be after check_in'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        default_rule = None
+        pricing_rule_id = request.query_params.get('pricing_rule_id')
+        if pricing_rule_id:
+            default_rule = get_rule(pricing_rule_id)
+            if default_rule is None:
+                return Response(
+                    {'error': 'Pricing rule not found'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+
+        try:
+            quote = price_stay(check_in, check_out, default_rule=default_rule)
+        except PricingUnavailable as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(dict(quote, check_in=check_in, check_out=check_out))
+
+
+class GalleryImageViewSet(SparseFieldsetViewMixin, CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for gallery images
     """
     queryset = GalleryImage.objects.filter(is_active=True)
     serializer_class = GalleryImageSerializer
     permission_classes = [AllowAny]
+    cache_models = [GalleryImage]
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -91,13 +202,14 @@ class GalleryImageViewSet(viewsets.ReadOnlyModelViewSet):
         return queryset
 
 
-class AmenityViewSet(viewsets.ReadOnlyModelViewSet):
+class AmenityViewSet(SparseFieldsetViewMixin, CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for amenities
     """
     queryset = Amenity.objects.filter(is_active=True)
     serializer_class = AmenitySerializer
     permission_classes = [AllowAny]
+    cache_models = [Amenity]
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -109,13 +221,14 @@ class AmenityViewSet(viewsets.ReadOnlyModelViewSet):
         return queryset
 
 
-class BookingViewSet(viewsets.ModelViewSet):
+class BookingViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """
     API endpoint for bookings
     """
     queryset = Booking.objects.all()
     serializer_class = BookingSerializer
     permission_classes = [AllowAny]
+    pagination_class = BookingCursorPagination
     
     def dispatch(self, request, *args, **kwargs):
         """Override dispatch to exempt from CSRF for booking API"""
@@ -129,48 +242,37 @@ class BookingViewSet(viewsets.ModelViewSet):
         
         # Calculate total price if pricing rule is provided
         pricing_rule_id = request.data.get('pricing_rule_id')
-        if pricing_rule_id:
-            try:
-                pricing_rule = PricingRule.objects.get(id=pricing_rule_id, is_active=True)
-                num_nights = (serializer.validated_data['check_out'] - 
-                            serializer.validated_data['check_in']).days
-                total_price = pricing_rule.calculate_total(
-                    num_nights, 
-                    serializer.validated_data['num_guests']
-                )
-                serializer.validated_data['total_price'] = total_price
-                serializer.validated_data['pricing_rule'] = pricing_rule
-            except PricingRule.DoesNotExist:
-                pass
-        
-        self.perform_create(serializer)
-        booking = serializer.instance
+        pricing_rule = get_rule(pricing_rule_id) if pricing_rule_id else None
+        if pricing_rule:
+            # Nights inside a seasonal rule are priced at that season's
+            # rate; the chosen rule covers the rest of the stay
+            quote = price_stay(
+                serializer.validated_data['check_in'],
+                serializer.validated_data['check_out'],
+                default_rule=pricing_rule
+            )
+            serializer.validated_data['total_price'] = quote['total_price']
+            serializer.validated_data['pricing_rule'] = pricing_rule
         
-        # Send confirmation email with invoice
-        logger = logging.getLogger(__name__)
+        # Save the booking, claim its nights and queue the confirmation email
+        # (and receipt) in one transaction; concurrent requests for the same
+        # nights are serialized by the occupancy table's primary key
         try:
-            email_sent = send_booking_confirmation_email(booking)
-            if not email_sent:
-                logger.warning("send_booking_confirmation_email returned False for booking id %s", booking.id)
-        except Exception as e:
-            logger.exception("Failed to send booking confirmation email for booking id %s", booking.id)
-            email_sent = False
-        
-        # Send payment receipt email if payment method is debit card
-        if booking.payment_method == 'debitcard' and booking.status == 'confirmed':
-            try:
-                payment_details = {
-                    'payment_id': f"ch_{booking.id:06d}",
-                    'timestamp': datetime.now().strftime('%B %d, %Y at %I:%M %p')
-                }
-                send_payment_receipt_email(booking, payment_details)
-            except Exception as e:
-                print(f"Failed to send payment receipt email: {str(e)}")
+            with transaction.atomic():
+                self.perform_create(serializer)
+                booking = serializer.instance
+                occupancy.ensure_reserved(booking)
+                email_job = enqueue_booking_emails(booking)
+        except occupancy.DatesUnavailable:
+            return Response(
+                {'error': 'The selected dates are no longer available'},
+                status=status.HTTP_409_CONFLICT
+            )
         
         headers = self.get_success_headers(serializer.data)
         response_data = dict(serializer.data)
-        # Include email send status for debugging/clients
-        response_data['email_sent'] = bool(email_sent)
+        # Clients can track delivery through the queued job
+        response_data['email_job_id'] = email_job.id
 
         return Response(
             response_data,
@@ -178,41 +280,82 @@ class BookingViewSet(viewsets.ModelViewSet):
             headers=headers
         )
     
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser],
+            url_path=r'export/(?P<fmt>csv|ndjson)')
+    def export(self, request, fmt):
+        """
+        Stream bookings as CSV or NDJSON, oldest first, with a totals row
+        Query params: status (comma-separated), from, to (check-in dates,
+        YYYY-MM-DD, both inclusive)
+        """
+        try:
+            queryset = exports.export_queryset(
+                status=request.query_params.get('status'),
+                start=request.query_params.get('from'),
+                end=request.query_params.get('to'),
+            )
+        except exports.ExportError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return exports.export_response(queryset, fmt)
+
     @action(detail=False, methods=['get'])
-    def availability(self, request):
+    def calendar(self, request):
         """
-        Check availability for given date range
-        Query params: check_in, check_out
+        Blocked nights for a date range, run-length encoded
+        Query params: from, to (YYYY-MM-DD, to is exclusive; defaults to
+        today and 12 months ahead; at most 24 months)
         """
-        check_in = request.query_params.get('check_in')
-        check_out = request.query_params.get('check_out')
+        today = timezone.localdate()
+        try:
+            start = date.fromisoformat(request.query_params.get('from') or today.isoformat())
+            end_param = request.query_params.get('to')
+            end = date.fromisoformat(end_param) if end_param else start + timedelta(days=365)
+        except ValueError:
+            return Response(
+                {'error': 'Dates must be in YYYY-MM-DD format'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        if not check_in or not check_out:
+        if end <= start:
+            return Response(
+                {'error': '"to" must be after "from"'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if end - start > MAX_CALENDAR_RANGE:
             return Response(
-                {'error': 'Both check_in and check_out dates are required'},
+                {'error': 'Calendar range is limited to 24 months'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Check for overlapping bookings
-        overlapping = Booking.objects.filter(
-            status__in=['pending', 'confirmed'],
-            check_in__lt=check_out,
-            check_out__gt=check_in
-        )
+        data = {
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'blocked': [
+                [night.isoformat(), nights]
+                for night, nights in occupancy.blocked_runs(start, end)
+            ],
+        }
         
-        return Response({
-            'available': not overlapping.exists(),
-            'overlapping_bookings': overlapping.count()
-        })
+        etag = quote_etag(hashlib.sha1(json.dumps(data).encode()).hexdigest())
+        last_modified = int(occupancy.last_changed())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = Response(data)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, public=True, max_age=60)
+        return response
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(SparseFieldsetViewMixin, CachedResponseMixin, viewsets.ModelViewSet):
     """
     API endpoint for reviews
     """
     queryset = Review.objects.filter(is_approved=True)
     serializer_class = ReviewSerializer
     permission_classes = [AllowAny]
+    cache_models = [Review]
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -224,63 +367,38 @@ class ReviewViewSet(viewsets.ModelViewSet):
         return queryset
 
 
-class SiteSettingsViewSet(viewsets.ReadOnlyModelViewSet):
+class SiteSettingsViewSet(SparseFieldsetViewMixin, CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for site settings
     """
     queryset = SiteSettings.objects.all()
     serializer_class = SiteSettingsSerializer
     permission_classes = [AllowAny]
+    cache_models = [SiteSettings]
     
     def list(self, request, *args, **kwargs):
         """Return the single site settings instance"""
-        settings = SiteSettings.load()
+        return self.cached_response(request, self._settings_response)
+    
+    def _settings_response(self):
+        settings = SiteSettings.cached()
         serializer = self.get_serializer(settings)
         return Response(serializer.data)
 
 
-class StripeConfigView(APIView):
-    """Return Stripe publishable key to the frontend"""
-    permission_classes = [AllowAny]
-
-    def get(self, request):
-        return Response({'publishableKey': settings.STRIPE_PUBLISHABLE_KEY})
-
-
-class CreatePaymentIntentView(APIView):
-    """Create a Stripe PaymentIntent and return client_secret"""
-    permission_classes = [AllowAny]
-
-    def post(self, request):
-        try:
-            stripe.api_key = settings.STRIPE_SECRET_KEY
-            data = request.data
-            amount = int(data.get('amount_cents', 0))
-            currency = data.get('currency', 'usd')
-            metadata = data.get('metadata', {})
-
-            if amount <= 0:
-                return Response({'error': 'Invalid amount'}, status=400)
-
-            intent = stripe.PaymentIntent.create(
-                amount=amount,
-                currency=currency,
-                metadata=metadata,
-            )
-
-            return Response({'client_secret': intent.client_secret})
-        except Exception as e:
-            return Response({'error': str(e)}, status=500)
-
-
 @csrf_exempt
 def stripe_webhook(request):
+    """
+    Verify a Stripe event and record it in the ledger; the
+    process_stripe_events worker applies it (see stripe_events.py)
+    """
     payload = request.body
     sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
     endpoint_secret = settings.STRIPE_WEBHOOK_SECRET
 
     try:
-        event = stripe.Webhook.construct_event(
+        # Local HMAC check, not a Stripe API call, so no 'stripe' span
+        stripe.Webhook.construct_event(
             payload, sig_header, endpoint_secret
         )
     except ValueError:
@@ -290,17 +408,24 @@ def stripe_webhook(request):
         # Invalid signature
         return HttpResponse(status=400)
 
-    # Handle the event
-    if event['type'] == 'payment_intent.succeeded':
-        intent = event['data']['object']
-        # You can use metadata to link to a booking and mark it paid
-        booking_id = intent.get('metadata', {}).get('booking_id')
-        if booking_id:
-            try:
-                booking = Booking.objects.get(id=booking_id)
-                booking.status = 'confirmed'
-                booking.save()
-            except Booking.DoesNotExist:
-                pass
-
+    # Redelivered events are already in the ledger and are acknowledged as is
+    stripe_events.record_event(json.loads(payload))
     return HttpResponse(status=200)
+
+
+def metrics_view(request):
+    """
+    Request metrics in the Prometheus text format, for staff users or
+    scrapers sending "Authorization: Bearer <METRICS_TOKEN>"
+    """
+    token = settings.METRICS_TOKEN
+    authorization = request.headers.get('Authorization', '')
+    authorized = request.user.is_staff or (
+        token and hmac.compare_digest(authorization, f'Bearer {token}')
+    )
+    if not authorized:
+        return HttpResponse(status=403)
+    
+    response = HttpResponse(metrics.render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    response['Cache-Control'] = 'no-store'
+    return response
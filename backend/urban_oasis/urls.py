@@ -6,6 +6,7 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import TemplateView
+from rentals.views import metrics_view
 
 urlpatterns = [
     path('', TemplateView.as_view(template_name='index.html'), name='index'),
@@ -18,6 +19,7 @@ urlpatterns = [
     path('terms/', TemplateView.as_view(template_name='terms.html'), name='terms'),
     path('admin/', admin.site.urls),
     path('api/', include('rentals.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 # Serve media files in development
@@ -77,6 +77,36 @@ async function checkAvailability(checkInDate, checkOutDate) {
   }
 }
 
+/**
+ * Load booked nights for the date pickers in a single request.
+ * Returns flatpickr "disable" ranges ({from, to} inclusive).
+ */
+async function loadBlockedDates(fromDate, toDate) {
+  try {
+    const params = new URLSearchParams();
+    if (fromDate) params.set('from', fromDate);
+    if (toDate) params.set('to', toDate);
+    
+    const response = await fetch(`${API_BASE_URL}/bookings/calendar/?${params}`);
+    if (!response.ok) {
+      throw new Error(`API error: ${response.status}`);
+    }
+    
+    const data = await response.json();
+    return data.blocked.map(([start, nights]) => {
+      // Date arithmetic in UTC throughout, so the browser's timezone
+      // cannot shift the last night by a day
+      const [year, month, day] = start.split('-').map(Number);
+      const last = new Date(Date.UTC(year, month - 1, day + nights - 1));
+      return {from: start, to: last.toISOString().split('T')[0]};
+    });
+    
+  } catch (error) {
+    console.error('Error loading booked dates:', error);
+    return [];
+  }
+}
+
 async function submitBooking(bookingData) {
   try {
     const response = await fetch(`${API_BASE_URL}/bookings/`, {
@@ -17,6 +17,31 @@ const categoryMap = {
   'neighborhood': 'neighborhood'
 };
 
+/**
+ * Build a <picture> for an API image, using its AVIF/WebP renditions when
+ * available and falling back to the original upload.
+ * The blurred placeholder is shown as a background until the image loads.
+ */
+function pictureHtml(image, alt, sizes) {
+  const fallback = image.image_url || image.image;
+  const srcset = image.srcset;
+  if (!srcset) {
+    return `<img src="${fallback}" alt="${alt}" loading="lazy" decoding="async">`;
+  }
+  const sources = ['avif', 'webp']
+    .filter(format => srcset[format])
+    .map(format => `<source type="image/${format}" srcset="${srcset[format]}" sizes="${sizes}">`)
+    .join('');
+  return `
+    <picture>
+      ${sources}
+      <img src="${fallback}" alt="${alt}" width="${srcset.width}" height="${srcset.height}"
+           loading="lazy" decoding="async"
+           style="background-size: cover; background-image: url('${srcset.placeholder}')">
+    </picture>
+  `;
+}
+
 async function loadGalleryImages() {
   try {
     const response = await fetch(`${API_BASE_URL}/gallery/`);
@@ -47,12 +72,11 @@ function renderGalleryCards(images) {
   // Add new cards from API
   images.forEach(image => {
     const filterClass = categoryMap[image.category] || 'rooms';
-    const imageUrl = image.image_url || image.image;
     
     const card = document.createElement('div');
     card.className = `gallery-card ${filterClass}`;
     card.innerHTML = `
-      <img src="${imageUrl}" alt="${image.alt_text || image.title}">
+      ${pictureHtml(image, image.alt_text || image.title, '(max-width: 768px) 100vw, 33vw')}
       <div class="gallery-overlay">
         <span>${image.title}</span>
       </div>
@@ -72,12 +96,11 @@ function renderCarouselItems(images) {
   // Add new items from API
   images.forEach(image => {
     const filterClass = categoryMap[image.category] || 'rooms';
-    const imageUrl = image.image_url || image.image;
     
     const item = document.createElement('div');
     item.className = `carousel-item ${filterClass}`;
     item.innerHTML = `
-      <img src="${imageUrl}" alt="${image.alt_text || image.title}">
+      ${pictureHtml(image, image.alt_text || image.title, '100vw')}
       <div class="carousel-label">${image.title}</div>
     `;
     
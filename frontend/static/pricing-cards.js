@@ -57,6 +57,23 @@ async function loadPricingCards(containerId = 'pricingCards', options = {}) {
   }
 }
 
+/**
+ * Card image using the rule's AVIF/WebP renditions when available
+ * @param {object} rule - Pricing rule object from API
+ * @returns {string} <picture> or <img> markup
+ */
+function pricingImageHtml(rule) {
+  const srcset = rule.srcset;
+  if (!srcset) {
+    return `<img src="${rule.image_url}" alt="${rule.name}" loading="lazy" decoding="async">`;
+  }
+  const sources = ['avif', 'webp']
+    .filter(format => srcset[format])
+    .map(format => `<source type="image/${format}" srcset="${srcset[format]}" sizes="(max-width: 768px) 100vw, 400px">`)
+    .join('');
+  return `<picture>${sources}<img src="${rule.image_url}" alt="${rule.name}" width="${srcset.width}" height="${srcset.height}" loading="lazy" decoding="async" style="background-size: cover; background-image: url('${srcset.placeholder}')"></picture>`;
+}
+
 /**
  * Create a pricing card element
  * @param {object} rule - Pricing rule object from API
@@ -66,7 +83,7 @@ function createPricingCard(rule) {
   const card = document.createElement('div');
   card.className = `pricing-card ${rule.is_featured ? 'featured' : ''}`;
   
-  const imageHtml = rule.image_url ? `<div class="pricing-card-image"><img src="${rule.image_url}" alt="${rule.name}"></div>` : '';
+  const imageHtml = rule.image_url ? `<div class="pricing-card-image">${pricingImageHtml(rule)}</div>` : '';
   
   const descriptionHtml = rule.description ? `<p class="pricing-description">${escapeHtml(rule.description)}</p>` : '';
   